@@ -3,6 +3,7 @@ Serviço de Áudio para ChatBot WhatsApp
 - Speech-to-Text (STT) usando OpenAI Whisper
 - Text-to-Speech (TTS) usando OpenAI TTS
 """
+import importlib.util
 import os
 import base64
 import tempfile
@@ -10,16 +11,25 @@ import uuid
 from typing import Optional, Tuple
 from dotenv import load_dotenv
 
+from metrics import track_external_call
+from startup_profile import lazy_import
+
 load_dotenv()
 
-# Importar integrações de áudio
+# Integrações de áudio: o pacote é importado no primeiro uso (_openai_audio)
 try:
-    from emergentintegrations.llm.openai import OpenAISpeechToText, OpenAITextToSpeech
-    AUDIO_AVAILABLE = True
-except ImportError:
+    AUDIO_AVAILABLE = importlib.util.find_spec("emergentintegrations") is not None
+except Exception:
     AUDIO_AVAILABLE = False
+if not AUDIO_AVAILABLE:
     print("[AUDIO SERVICE] emergentintegrations não disponível para áudio")
 
+
+def _openai_audio():
+    """Módulo com OpenAISpeechToText/OpenAITextToSpeech"""
+    return lazy_import("emergentintegrations.llm.openai")
+
+
 # Configuração
 EMERGENT_LLM_KEY = os.environ.get("EMERGENT_LLM_KEY", "")
 
@@ -72,10 +82,10 @@ async def transcribe_audio(audio_data: bytes, file_extension: str = "ogg") -> Tu
                 print(f"[AUDIO SERVICE] Erro na conversão: {conv_err}")
         
         # Inicializar STT
-        stt = OpenAISpeechToText(api_key=EMERGENT_LLM_KEY)
+        stt = _openai_audio().OpenAISpeechToText(api_key=EMERGENT_LLM_KEY)
         
         # Transcrever
-        with open(final_path, "rb") as audio_file:
+        with open(final_path, "rb") as audio_file, track_external_call("transcricao"):
             response = await stt.transcribe(
                 file=audio_file,
                 model="whisper-1",
@@ -452,16 +462,17 @@ async def generate_speech(text: str, voice: str = "nova") -> Tuple[bool, Optiona
     
     try:
         # Inicializar TTS
-        tts = OpenAITextToSpeech(api_key=EMERGENT_LLM_KEY)
+        tts = _openai_audio().OpenAITextToSpeech(api_key=EMERGENT_LLM_KEY)
         
         # Gerar áudio
-        audio_bytes = await tts.generate_speech(
-            text=text,
-            model="tts-1",  # Modelo mais rápido para respostas em tempo real
-            voice=voice,
-            response_format="mp3",
-            speed=1.0
-        )
+        with track_external_call("tts"):
+            audio_bytes = await tts.generate_speech(
+                text=text,
+                model="tts-1",  # Modelo mais rápido para respostas em tempo real
+                voice=voice,
+                response_format="mp3",
+                speed=1.0
+            )
         
         return True, audio_bytes, "Áudio gerado com sucesso"
         
@@ -5,7 +5,16 @@ import queue
 import threading
 import time
 import json
+import os
+import gzip
+import shutil
+import atexit
 import traceback
+import re
+import hashlib
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from collections import deque
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Callable, Any, Optional
@@ -13,11 +22,20 @@ from enum import IntEnum
 from dataclasses import dataclass, asdict
 import uuid
 
+from state_store import file_lock, get_worker_count
+
 # Caminho do arquivo de logs
 LOGS_DIR = Path(__file__).parent / "data_backup"
-BUGS_LOG_FILE = LOGS_DIR / "system_bugs.txt"
+BUGS_LOG_FILE = LOGS_DIR / "system_bugs.txt"  # Formato antigo (migrado para BUGS_DB_FILE)
+BUGS_DB_FILE = LOGS_DIR / "system_bugs.db"
 REQUESTS_LOG_FILE = LOGS_DIR / "requests_log.txt"
 
+# Rotação do log de requisições (tamanho máximo, intervalo e retenção dos arquivos .gz)
+REQUESTS_LOG_MAX_BYTES = int(float(os.environ.get("NUCLEO_REQUEST_LOG_MAX_MB", "10")) * 1024 * 1024)
+REQUESTS_LOG_BACKUPS = int(os.environ.get("NUCLEO_REQUEST_LOG_BACKUPS", "5"))
+REQUESTS_LOG_ROTATE_SECONDS = float(os.environ.get("NUCLEO_REQUEST_LOG_ROTATE_HOURS", "24")) * 3600
+REQUESTS_LOG_RETENTION_SECONDS = float(os.environ.get("NUCLEO_REQUEST_LOG_RETENTION_DAYS", "30")) * 86400
+
 class Priority(IntEnum):
     """Prioridades das requisições (menor = mais prioritário)"""
     CRITICAL = 1    # Login, autenticação
@@ -38,6 +56,9 @@ class BugReport:
     stack_trace: str
     request_data: Optional[str]
     status: str  # 'new', 'investigating', 'fixed', 'ignored'
+    fingerprint: Optional[str] = None
+    occurrences: int = 1
+    first_seen: Optional[str] = None
     
     def to_dict(self):
         return asdict(self)
@@ -145,12 +166,270 @@ class RequestQueue:
 # Instância global da fila
 request_queue = RequestQueue()
 
+
+class BufferedRequestLogger:
+    """
+    Log de requisições sem I/O no caminho da requisição.
+    As linhas vão para um buffer circular em memória; uma thread de fundo
+    grava em lote no arquivo e faz a rotação por tamanho ou por tempo,
+    compactando os arquivos antigos (requests_log.1.txt.gz, .2, ...).
+    Backups além de backup_count ou mais velhos que retention_seconds são apagados.
+    Se a gravação não acompanhar, as linhas mais antigas do buffer são
+    descartadas (contadas em `dropped`) em vez de bloquear a requisição.
+    
+    Com vários workers todos gravam no mesmo arquivo: gravação e rotação
+    ficam sob um lock de arquivo entre processos (<log>.lock), e a decisão de
+    rotacionar é refeita dentro dele, então só um worker rotaciona.
+    """
+    
+    def __init__(self, path: Path, max_bytes: int, backup_count: int,
+                 rotate_seconds: float = 0, retention_seconds: float = 0,
+                 buffer_size: int = 50000, flush_interval: float = 1.0, batch_size: int = 500):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate_seconds = rotate_seconds
+        self.retention_seconds = retention_seconds
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._buffer = deque(maxlen=buffer_size)
+        self._wakeup = threading.Event()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.running = False
+        self.dropped = 0
+        self.written = 0
+        self.rotations = 0
+    
+    def start(self):
+        """Inicia a thread de gravação (chamado automaticamente no primeiro log)"""
+        with self._start_lock:
+            if self.running:
+                return
+            self.running = True
+            self._thread = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Para a thread e grava o que restou no buffer"""
+        self.running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush()
+    
+    def append(self, line: str):
+        """Enfileira uma linha (não bloqueia)"""
+        if not self.running:
+            self.start()
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(line)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+    
+    def _run(self):
+        while self.running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def _drain(self) -> list:
+        lines = []
+        try:
+            while True:
+                lines.append(self._buffer.popleft())
+        except IndexError:
+            pass
+        return lines
+    
+    def flush(self):
+        """Grava imediatamente o conteúdo do buffer (usado também pelos leitores)"""
+        with self._write_lock:
+            lines = self._drain()
+            if not lines:
+                return
+            saved = False
+            try:
+                ensure_logs_dir()
+                with self._process_lock():
+                    if self._rotation_due():
+                        self._rotate()
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write("".join(lines))
+                    saved = True
+                    self.written += len(lines)
+                    if self.path.stat().st_size >= self.max_bytes:
+                        self._rotate()
+            except Exception as e:
+                print(f"[REQUEST_LOG] Erro ao salvar log: {e}")
+                if not saved:
+                    # Devolver ao buffer para a próxima tentativa
+                    self._buffer.extendleft(reversed(lines))
+    
+    def _process_lock(self):
+        """Lock entre processos só quando há vários workers no mesmo arquivo"""
+        if get_worker_count() > 1:
+            return file_lock(self.path.with_name(self.path.name + ".lock"))
+        return nullcontext()
+    
+    def _backup_path(self, index: int) -> Path:
+        return self.path.with_name(f"{self.path.stem}.{index}{self.path.suffix}.gz")
+    
+    def _file_start_time(self) -> float:
+        """Início do período do arquivo atual (timestamp da primeira linha)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                first = f.readline()
+            return datetime.fromisoformat(first.split(' | ', 1)[0]).timestamp()
+        except (OSError, ValueError):
+            return time.time()
+    
+    def _rotation_due(self) -> bool:
+        """
+        Rotação por tempo: o arquivo atual já cobre mais que rotate_seconds.
+        Lê a primeira linha a cada vez (outro worker pode ter rotacionado).
+        """
+        if not self.rotate_seconds or not self.path.exists():
+            return False
+        return time.time() - self._file_start_time() >= self.rotate_seconds
+    
+    def _rotate(self):
+        """Desloca os backups e compacta o arquivo atual como .1.gz"""
+        oldest = self._backup_path(self.backup_count)
+        if oldest.exists():
+            oldest.unlink()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = self._backup_path(i)
+            if src.exists():
+                src.rename(self._backup_path(i + 1))
+        rotating = self.path.with_name(self.path.name + ".rotating")
+        self.path.rename(rotating)
+        if self.backup_count > 0:
+            with open(rotating, 'rb') as src, gzip.open(self._backup_path(1), 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        rotating.unlink()
+        self.rotations += 1
+        self._apply_retention()
+    
+    def _apply_retention(self):
+        """Apaga backups mais antigos que retention_seconds"""
+        if not self.retention_seconds:
+            return
+        cutoff = time.time() - self.retention_seconds
+        for i in range(1, self.backup_count + 1):
+            backup = self._backup_path(i)
+            try:
+                if backup.exists() and backup.stat().st_mtime < cutoff:
+                    backup.unlink()
+            except OSError:
+                pass
+    
+    def get_stats(self) -> dict:
+        return {
+            'buffered': len(self._buffer),
+            'written': self.written,
+            'dropped': self.dropped,
+            'rotations': self.rotations,
+            'max_bytes': self.max_bytes,
+            'backup_count': self.backup_count,
+            'rotate_seconds': self.rotate_seconds,
+            'retention_seconds': self.retention_seconds
+        }
+
+
+# Instância global do log de requisições
+request_logger = BufferedRequestLogger(
+    REQUESTS_LOG_FILE, REQUESTS_LOG_MAX_BYTES, REQUESTS_LOG_BACKUPS,
+    rotate_seconds=REQUESTS_LOG_ROTATE_SECONDS,
+    retention_seconds=REQUESTS_LOG_RETENTION_SECONDS
+)
+atexit.register(request_logger.stop)
+
 # ==================== FUNÇÕES DE LOG DE BUGS ====================
 
 def ensure_logs_dir():
     """Garante que o diretório de logs existe"""
     LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
+
+class BugStore:
+    """
+    Banco SQLite dos bugs (arquivo próprio, separado do banco principal, para
+    que erros do banco principal continuem sendo registrados).
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        ensure_logs_dir()
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10.0)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS bugs (
+                id TEXT PRIMARY KEY,
+                fingerprint TEXT UNIQUE NOT NULL,
+                error_type TEXT,
+                message TEXT,
+                endpoint TEXT,
+                user_id TEXT,
+                stack_trace TEXT,
+                request_data TEXT,
+                status TEXT DEFAULT 'new',
+                occurrences INTEGER DEFAULT 1,
+                first_seen TEXT,
+                last_seen TEXT
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bugs_last_seen ON bugs(last_seen DESC)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bugs_status ON bugs(status, last_seen DESC)")
+        conn.execute("CREATE TABLE IF NOT EXISTS bug_store_meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.commit()
+        _migrate_legacy_bugs(conn)
+        return conn
+    
+    @contextmanager
+    def cursor(self):
+        """Cursor com commit automático, serializado por lock"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            cursor = self._conn.cursor()
+            try:
+                yield cursor
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+
+# Instância global do banco de bugs
+bug_store = BugStore(BUGS_DB_FILE)
+
+def _top_frame(stack_trace: str) -> str:
+    """Frame mais interno do traceback ('arquivo:função'), sem número de linha"""
+    frames = re.findall(r'File "([^"]+)", line \d+, in (\S+)', stack_trace or "")
+    if not frames:
+        return ""
+    path, func = frames[-1]
+    return f"{Path(path).name}:{func}"
+
+
+def bug_fingerprint(error_type: str, endpoint: str, stack_trace: str = "", message: str = "") -> str:
+    """
+    Identidade de um bug: tipo do erro + endpoint + frame mais interno.
+    Sem traceback (relatos manuais), a mensagem entra no lugar do frame.
+    """
+    frame = _top_frame(stack_trace) or message
+    raw = f"{error_type}|{endpoint}|{frame}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
 def log_bug(
     error_type: str,
     message: str,
@@ -159,37 +438,50 @@ def log_bug(
     stack_trace: str = "",
     request_data: str = None
 ) -> BugReport:
-    """Registra um bug no arquivo de logs"""
-    ensure_logs_dir()
-    
+    """
+    Registra um bug no banco de bugs.
+    Ocorrências repetidas (mesmo fingerprint) incrementam o contador do bug
+    existente; um bug marcado como 'fixed' que volta a ocorrer é reaberto.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    fingerprint = bug_fingerprint(error_type, endpoint, stack_trace, message)
     bug = BugReport(
         id=str(uuid.uuid4()),
-        timestamp=datetime.now(timezone.utc).isoformat(),
+        timestamp=now,
         error_type=error_type,
         message=message,
         endpoint=endpoint,
         user_id=user_id,
         stack_trace=stack_trace,
         request_data=request_data,
-        status='new'
+        status='new',
+        fingerprint=fingerprint,
+        first_seen=now
     )
     
-    # Salvar no arquivo
     try:
-        with open(BUGS_LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(f"\n{'='*80}\n")
-            f.write(f"BUG ID: {bug.id}\n")
-            f.write(f"TIMESTAMP: {bug.timestamp}\n")
-            f.write(f"TYPE: {bug.error_type}\n")
-            f.write(f"ENDPOINT: {bug.endpoint}\n")
-            f.write(f"USER: {bug.user_id or 'N/A'}\n")
-            f.write(f"STATUS: {bug.status}\n")
-            f.write(f"MESSAGE: {bug.message}\n")
-            if bug.request_data:
-                f.write(f"REQUEST DATA: {bug.request_data}\n")
-            if bug.stack_trace:
-                f.write(f"STACK TRACE:\n{bug.stack_trace}\n")
-            f.write(f"{'='*80}\n")
+        with bug_store.cursor() as cursor:
+            cursor.execute('''
+                INSERT INTO bugs (id, fingerprint, error_type, message, endpoint, user_id,
+                                  stack_trace, request_data, status, occurrences, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'new', 1, ?, ?)
+                ON CONFLICT(fingerprint) DO UPDATE SET
+                    occurrences = occurrences + 1,
+                    last_seen = excluded.last_seen,
+                    message = excluded.message,
+                    user_id = COALESCE(excluded.user_id, user_id),
+                    stack_trace = excluded.stack_trace,
+                    request_data = COALESCE(excluded.request_data, request_data),
+                    status = CASE WHEN status = 'fixed' THEN 'new' ELSE status END
+            ''', (bug.id, fingerprint, error_type, message, endpoint, user_id,
+                  stack_trace, request_data, now, now))
+            cursor.execute(
+                "SELECT id, status, occurrences, first_seen FROM bugs WHERE fingerprint = ?",
+                (fingerprint,)
+            )
+            row = cursor.fetchone()
+            if row:
+                bug.id, bug.status, bug.occurrences, bug.first_seen = row
     except Exception as e:
         print(f"[BUG_LOG] Erro ao salvar bug: {e}")
     
@@ -203,115 +495,218 @@ def log_request(
     status: str,
     error_message: str = None
 ):
-    """Registra uma requisição no log"""
-    ensure_logs_dir()
-    
-    log = RequestLog(
-        id=str(uuid.uuid4())[:8],
-        timestamp=datetime.now(timezone.utc).isoformat(),
-        endpoint=endpoint,
-        method=method,
-        priority=priority,
-        duration_ms=round(duration_ms, 2),
-        status=status,
-        error_message=error_message
-    )
-    
+    """Registra uma requisição no log (bufferizado, gravado em segundo plano)"""
+    line = f"{datetime.now(timezone.utc).isoformat()} | {method} {endpoint} | P{priority} | {round(duration_ms, 2)}ms | {status}"
+    if error_message:
+        line += f" | ERROR: {error_message}"
+    request_logger.append(line + "\n")
+
+def _row_to_bug(row) -> dict:
+    bug = dict(row)
+    # 'timestamp' é a última ocorrência (compatível com o formato antigo)
+    bug['timestamp'] = bug.pop('last_seen')
+    return bug
+
+
+def get_all_bugs(limit: int = 100, offset: int = 0, status: Optional[str] = None) -> list:
+    """Retorna uma página de bugs, mais recentes (última ocorrência) primeiro"""
+    query = '''
+        SELECT id, fingerprint, error_type, message, endpoint, user_id, stack_trace,
+               request_data, status, occurrences, first_seen, last_seen
+        FROM bugs
+    '''
+    params = []
+    if status:
+        query += " WHERE status = ?"
+        params.append(status)
+    query += " ORDER BY last_seen DESC LIMIT ? OFFSET ?"
+    params.extend([limit, offset])
+    try:
+        with bug_store.cursor() as cursor:
+            cursor.execute(query, params)
+            return [_row_to_bug(row) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"[BUG_LOG] Erro ao ler bugs: {e}")
+        return []
+
+
+def count_bugs(status: Optional[str] = None) -> int:
+    """Total de bugs distintos (opcionalmente por status)"""
     try:
-        with open(REQUESTS_LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(f"{log.timestamp} | {log.method} {log.endpoint} | P{log.priority} | {log.duration_ms}ms | {log.status}")
-            if log.error_message:
-                f.write(f" | ERROR: {log.error_message}")
-            f.write("\n")
+        with bug_store.cursor() as cursor:
+            if status:
+                cursor.execute("SELECT COUNT(*) FROM bugs WHERE status = ?", (status,))
+            else:
+                cursor.execute("SELECT COUNT(*) FROM bugs")
+            return cursor.fetchone()[0]
     except Exception as e:
-        print(f"[REQUEST_LOG] Erro ao salvar log: {e}")
+        print(f"[BUG_LOG] Erro ao contar bugs: {e}")
+        return 0
 
-def get_all_bugs(limit: int = 100) -> list:
-    """Retorna todos os bugs registrados"""
-    ensure_logs_dir()
+
+def _parse_legacy_bugs_file(path: Path) -> list:
+    """Lê o formato antigo de system_bugs.txt (blocos separados por '=' * 80)"""
     bugs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
     
-    if not BUGS_LOG_FILE.exists():
-        return bugs
+    for block in content.split('='*80):
+        if 'BUG ID:' not in block:
+            continue
+        
+        bug_data = {}
+        stack_trace_lines = []
+        in_stack_trace = False
+        for line in block.strip().split('\n'):
+            if in_stack_trace:
+                stack_trace_lines.append(line)
+            elif line.startswith('BUG ID:'):
+                bug_data['id'] = line.replace('BUG ID:', '').strip()
+            elif line.startswith('TIMESTAMP:'):
+                bug_data['timestamp'] = line.replace('TIMESTAMP:', '').strip()
+            elif line.startswith('TYPE:'):
+                bug_data['error_type'] = line.replace('TYPE:', '').strip()
+            elif line.startswith('ENDPOINT:'):
+                bug_data['endpoint'] = line.replace('ENDPOINT:', '').strip()
+            elif line.startswith('USER:'):
+                user = line.replace('USER:', '').strip()
+                bug_data['user_id'] = None if user == 'N/A' else user
+            elif line.startswith('STATUS:'):
+                bug_data['status'] = line.replace('STATUS:', '').strip()
+            elif line.startswith('MESSAGE:'):
+                bug_data['message'] = line.replace('MESSAGE:', '').strip()
+            elif line.startswith('REQUEST DATA:'):
+                bug_data['request_data'] = line.replace('REQUEST DATA:', '').strip()
+            elif line.startswith('STACK TRACE:'):
+                in_stack_trace = True
+        
+        if bug_data.get('id'):
+            bug_data['stack_trace'] = '\n'.join(stack_trace_lines)
+            bugs.append(bug_data)
+    return bugs
+
+
+def _migrate_legacy_bugs(conn: sqlite3.Connection):
+    """Importa (uma única vez) os bugs do arquivo texto antigo"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM bug_store_meta WHERE key = 'legacy_migrated'")
+    if cursor.fetchone() or not BUGS_LOG_FILE.exists():
+        return
     
+    imported = 0
     try:
-        with open(BUGS_LOG_FILE, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Parse dos bugs do arquivo
-        bug_blocks = content.split('='*80)
-        for block in bug_blocks:
-            if 'BUG ID:' not in block:
+        for bug in _parse_legacy_bugs_file(BUGS_LOG_FILE):
+            # Registros antigos de mudança de status não eram bugs de verdade
+            if bug.get('error_type') == 'STATUS_UPDATE':
                 continue
-            
-            lines = block.strip().split('\n')
-            bug_data = {}
-            current_field = None
-            stack_trace_lines = []
-            in_stack_trace = False
-            
-            for line in lines:
-                if line.startswith('BUG ID:'):
-                    bug_data['id'] = line.replace('BUG ID:', '').strip()
-                elif line.startswith('TIMESTAMP:'):
-                    bug_data['timestamp'] = line.replace('TIMESTAMP:', '').strip()
-                elif line.startswith('TYPE:'):
-                    bug_data['error_type'] = line.replace('TYPE:', '').strip()
-                elif line.startswith('ENDPOINT:'):
-                    bug_data['endpoint'] = line.replace('ENDPOINT:', '').strip()
-                elif line.startswith('USER:'):
-                    bug_data['user_id'] = line.replace('USER:', '').strip()
-                elif line.startswith('STATUS:'):
-                    bug_data['status'] = line.replace('STATUS:', '').strip()
-                elif line.startswith('MESSAGE:'):
-                    bug_data['message'] = line.replace('MESSAGE:', '').strip()
-                elif line.startswith('STACK TRACE:'):
-                    in_stack_trace = True
-                elif in_stack_trace:
-                    stack_trace_lines.append(line)
-            
-            if bug_data.get('id'):
-                bug_data['stack_trace'] = '\n'.join(stack_trace_lines)
-                bug_data['request_data'] = None
-                bugs.append(bug_data)
+            error_type = bug.get('error_type', 'Unknown')
+            endpoint = bug.get('endpoint', 'unknown')
+            timestamp = bug.get('timestamp') or datetime.now(timezone.utc).isoformat()
+            fingerprint = bug_fingerprint(error_type, endpoint, bug.get('stack_trace', ''), bug.get('message', ''))
+            cursor.execute('''
+                INSERT INTO bugs (id, fingerprint, error_type, message, endpoint, user_id,
+                                  stack_trace, request_data, status, occurrences, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+                ON CONFLICT(fingerprint) DO UPDATE SET
+                    occurrences = occurrences + 1,
+                    first_seen = MIN(first_seen, excluded.first_seen),
+                    last_seen = MAX(last_seen, excluded.last_seen)
+            ''', (bug['id'], fingerprint, error_type, bug.get('message', ''), endpoint,
+                  bug.get('user_id'), bug.get('stack_trace', ''), bug.get('request_data'),
+                  bug.get('status') or 'new', timestamp, timestamp))
+            imported += 1
     except Exception as e:
-        print(f"[BUG_LOG] Erro ao ler bugs: {e}")
+        print(f"[BUG_LOG] Erro ao migrar bugs antigos: {e}")
     
-    # Retorna os mais recentes primeiro
-    bugs.reverse()
-    return bugs[:limit]
+    cursor.execute(
+        "INSERT OR REPLACE INTO bug_store_meta (key, value) VALUES ('legacy_migrated', ?)",
+        (datetime.now(timezone.utc).isoformat(),)
+    )
+    conn.commit()
+    if imported:
+        print(f"[BUG_LOG] {imported} registros migrados de {BUGS_LOG_FILE.name}")
+
+def _tail_lines(path: Path, block_size: int = 64 * 1024):
+    """
+    Lê um arquivo de trás para frente em blocos, gerando as linhas da última
+    para a primeira sem carregar o arquivo inteiro.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size) + remainder
+            lines = chunk.split(b"\n")
+            # A primeira linha pode estar incompleta: fica para o próximo bloco
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line.decode('utf-8', errors='replace')
+        if remainder:
+            yield remainder.decode('utf-8', errors='replace')
+
+
+def _parse_request_line(line: str) -> Optional[dict]:
+    parts = line.strip().split(' | ')
+    if len(parts) < 4:
+        return None
+    return {
+        'timestamp': parts[0],
+        'endpoint': parts[1],
+        'priority': parts[2] if len(parts) > 2 else 'N/A',
+        'duration': parts[3] if len(parts) > 3 else 'N/A',
+        'status': parts[4] if len(parts) > 4 else 'N/A',
+        'error': parts[5] if len(parts) > 5 else None
+    }
+
+
+def _duration_ms(log: dict) -> float:
+    try:
+        return float(log['duration'].rstrip('ms'))
+    except (ValueError, AttributeError):
+        return 0.0
 
-def get_request_logs(limit: int = 200) -> list:
-    """Retorna logs de requisições"""
+
+def get_request_logs(
+    limit: int = 200,
+    endpoint: Optional[str] = None,
+    status: Optional[str] = None,
+    min_duration_ms: Optional[float] = None
+) -> list:
+    """
+    Retorna os logs de requisições mais recentes primeiro.
+    O arquivo é lido do fim para o começo e os filtros são aplicados durante
+    a leitura, parando assim que `limit` linhas forem encontradas.
+    """
     ensure_logs_dir()
+    request_logger.flush()
     logs = []
     
     if not REQUESTS_LOG_FILE.exists():
         return logs
     
+    endpoint_filter = endpoint.lower() if endpoint else None
     try:
-        with open(REQUESTS_LOG_FILE, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        for line in lines[-limit:]:
-            line = line.strip()
-            if not line:
+        for line in _tail_lines(REQUESTS_LOG_FILE):
+            log = _parse_request_line(line)
+            if log is None:
+                continue
+            if endpoint_filter and endpoint_filter not in log['endpoint'].lower():
                 continue
-            
-            parts = line.split(' | ')
-            if len(parts) >= 4:
-                logs.append({
-                    'timestamp': parts[0],
-                    'endpoint': parts[1],
-                    'priority': parts[2] if len(parts) > 2 else 'N/A',
-                    'duration': parts[3] if len(parts) > 3 else 'N/A',
-                    'status': parts[4] if len(parts) > 4 else 'N/A',
-                    'error': parts[5] if len(parts) > 5 else None
-                })
+            if status and log['status'] != status:
+                continue
+            if min_duration_ms is not None and _duration_ms(log) < min_duration_ms:
+                continue
+            logs.append(log)
+            if len(logs) >= limit:
+                break
     except Exception as e:
         print(f"[REQUEST_LOG] Erro ao ler logs: {e}")
     
-    logs.reverse()
     return logs
 
 def get_system_info() -> dict:
@@ -320,43 +715,36 @@ def get_system_info() -> dict:
     import sys
     
     db_path = Path(__file__).parent / "data_backup" / "nucleo.db"
-    bugs_count = len(get_all_bugs(limit=1000))
+    bugs_count = count_bugs()
     
     return {
         'python_version': sys.version,
         'sqlite_path': str(db_path),
         'sqlite_exists': db_path.exists(),
         'sqlite_size_mb': round(db_path.stat().st_size / 1024 / 1024, 2) if db_path.exists() else 0,
-        'bugs_log_path': str(BUGS_LOG_FILE),
-        'bugs_log_exists': BUGS_LOG_FILE.exists(),
+        'bugs_log_path': str(BUGS_DB_FILE),
+        'bugs_log_exists': BUGS_DB_FILE.exists(),
         'total_bugs': bugs_count,
         'requests_log_path': str(REQUESTS_LOG_FILE),
         'requests_log_exists': REQUESTS_LOG_FILE.exists(),
+        'requests_log_stats': request_logger.get_stats(),
         'queue_stats': request_queue.get_stats()
     }
 
 def clear_bugs(bug_ids: list = None):
     """Limpa bugs específicos ou todos"""
-    ensure_logs_dir()
-    
-    if bug_ids is None:
-        # Limpar todos - criar arquivo vazio
-        with open(BUGS_LOG_FILE, 'w', encoding='utf-8') as f:
-            f.write(f"# Sistema de Logs de Bugs - Iniciado em {datetime.now(timezone.utc).isoformat()}\n")
-        return True
-    
-    # TODO: Implementar remoção seletiva se necessário
-    return False
+    with bug_store.cursor() as cursor:
+        if bug_ids is None:
+            cursor.execute("DELETE FROM bugs")
+        else:
+            cursor.executemany("DELETE FROM bugs WHERE id = ?", [(bug_id,) for bug_id in bug_ids])
+    return True
 
 def update_bug_status(bug_id: str, new_status: str) -> bool:
     """Atualiza status de um bug"""
-    # Por simplicidade, apenas registra a mudança
-    log_bug(
-        error_type="STATUS_UPDATE",
-        message=f"Bug {bug_id} status alterado para: {new_status}",
-        endpoint="bug_management"
-    )
-    return True
+    with bug_store.cursor() as cursor:
+        cursor.execute("UPDATE bugs SET status = ? WHERE id = ?", (new_status, bug_id))
+        return cursor.rowcount > 0
 
 # Inicializar diretório de logs
 ensure_logs_dir()
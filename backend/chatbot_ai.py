@@ -7,6 +7,7 @@ Sistema de alerta para pedidos de atendimento humano
 
 from __future__ import annotations  # <- CRÍTICO: evita NameError em type hints
 
+import importlib.util
 import os
 import json
 import re
@@ -23,16 +24,24 @@ else:
     LlmChat = Any  # type: ignore
     UserMessage = Any  # type: ignore
 
-# Importar integração LLM (runtime)
+# Integração LLM (runtime): só verifica se o pacote existe; o import
+# (pesado) acontece na primeira conversa - ver _llm_classes()
 LLM_AVAILABLE = False
 try:
-    from emergentintegrations.llm.chat import LlmChat as _LlmChat, UserMessage as _UserMessage
-    LlmChat = _LlmChat
-    UserMessage = _UserMessage
-    LLM_AVAILABLE = True
-except Exception as e:
+    LLM_AVAILABLE = importlib.util.find_spec("emergentintegrations") is not None
+except Exception:
     LLM_AVAILABLE = False
-    print(f"[CHATBOT AI] emergentintegrations não disponível: {e}")
+if not LLM_AVAILABLE:
+    print("[CHATBOT AI] emergentintegrations não disponível")
+
+
+def _load_llm():
+    """Importa LlmChat/UserMessage (globais do módulo) no primeiro uso"""
+    global LlmChat, UserMessage
+    if LlmChat is Any:
+        chat_module = lazy_import("emergentintegrations.llm.chat")
+        LlmChat = chat_module.LlmChat
+        UserMessage = chat_module.UserMessage
 
 # Importar serviço de áudio
 AUDIO_AVAILABLE = False
@@ -44,19 +53,27 @@ except Exception as e:
     print(f"[CHATBOT AI] audio_service não disponível: {e}")
 
 import database as db
+from event_hub import event_hub, TOPIC_WAITING_QUEUE
+from state_store import state_store
+from metrics import track_external_call
+from startup_profile import lazy_import
 
 # Configuração
 EMERGENT_LLM_KEY = os.environ.get("EMERGENT_LLM_KEY", "")
 
-# Cache de instâncias de chat por sessão
-# (agora isso NUNCA quebra, mesmo sem emergentintegrations)
+# Cache de instâncias de chat por sessão (por processo).
+# A instância é recriada a cada mensagem e o histórico vem do banco,
+# então não precisa ser compartilhada entre workers.
 chat_instances: Dict[str, Any] = {}
 
-# Cache de pausas por telefone (quando atendente humano intervém)
-human_intervention_pauses: Dict[str, datetime] = {}
+# Namespaces no state_store (compartilhado entre workers):
+# - pausas por telefone (quando atendente humano intervém), com TTL
+# - fila de clientes aguardando atendimento humano
+PAUSES_NAMESPACE = "bot_pause"
+WAITING_NAMESPACE = "waiting_for_human"
 
-# Fila de clientes aguardando atendimento humano
-waiting_for_human: Dict[str, Dict[str, Any]] = {}
+# Tempo máximo que um cliente permanece na fila de espera
+WAITING_QUEUE_TTL_SECONDS = 24 * 3600
 
 # Palavras-chave que indicam pedido de atendimento humano
 HUMAN_ASSISTANCE_KEYWORDS = [
@@ -133,14 +150,16 @@ def add_to_waiting_queue(phone: str, push_name: str, message: str) -> Dict[str,
     Returns:
         Informações do cliente na fila
     """
-    waiting_for_human[phone] = {
+    entry = {
         "push_name": push_name or "Cliente",
-        "timestamp": datetime.now(timezone.utc),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
         "message": message[:200] if message else "",  # Limitar tamanho
         "phone": phone
     }
+    state_store.set(WAITING_NAMESPACE, phone, entry, ttl_seconds=WAITING_QUEUE_TTL_SECONDS)
     print(f"[CHATBOT AI] Cliente {push_name} ({phone}) aguardando atendimento humano")
-    return waiting_for_human[phone]
+    event_hub.publish(TOPIC_WAITING_QUEUE, "added", {"phone": phone, "push_name": push_name or "Cliente"})
+    return entry
 
 
 def remove_from_waiting_queue(phone: str) -> bool:
@@ -153,13 +172,19 @@ def remove_from_waiting_queue(phone: str) -> bool:
     Returns:
         True se foi removido, False se não estava na fila
     """
-    if phone in waiting_for_human:
-        del waiting_for_human[phone]
+    if state_store.delete(WAITING_NAMESPACE, phone):
         print(f"[CHATBOT AI] Cliente {phone} removido da fila de espera")
+        event_hub.publish(TOPIC_WAITING_QUEUE, "removed", {"phone": phone})
         return True
     return False
 
 
+def clear_waiting_queue():
+    """Limpa toda a fila de espera e avisa os terminais"""
+    state_store.clear(WAITING_NAMESPACE)
+    event_hub.publish(TOPIC_WAITING_QUEUE, "cleared", {})
+
+
 def get_waiting_queue() -> List[Dict[str, Any]]:
     """
     Retorna a lista de clientes aguardando atendimento humano.
@@ -168,20 +193,26 @@ def get_waiting_queue() -> List[Dict[str, Any]]:
         Lista de dicts com informações dos clientes
     """
     result = []
-    for phone, data in waiting_for_human.items():
+    now = datetime.now(timezone.utc)
+    for phone, data in state_store.items(WAITING_NAMESPACE):
+        timestamp = data.get("timestamp")
+        try:
+            waiting_time = (now - datetime.fromisoformat(timestamp)).total_seconds() if timestamp else 0
+        except (TypeError, ValueError):
+            waiting_time = 0
         result.append({
             "phone": phone,
             "push_name": data.get("push_name", "Cliente"),
-            "timestamp": data.get("timestamp").isoformat() if data.get("timestamp") else None,
+            "timestamp": timestamp,
             "message": data.get("message", ""),
-            "waiting_time_seconds": (datetime.now(timezone.utc) - data.get("timestamp", datetime.now(timezone.utc))).total_seconds() if data.get("timestamp") else 0
+            "waiting_time_seconds": waiting_time
         })
     return sorted(result, key=lambda x: x.get("timestamp") or "", reverse=False)
 
 
 def is_waiting_for_human(phone: str) -> bool:
     """Verifica se o cliente está na fila de espera"""
-    return phone in waiting_for_human
+    return state_store.contains(WAITING_NAMESPACE, phone)
 
 
 def get_human_assistance_response() -> str:
@@ -209,19 +240,15 @@ def get_bot_pause_duration() -> int:
 
 def is_bot_paused_for_phone(phone: str) -> bool:
     """Verifica se o bot está pausado para este telefone"""
-    if phone in human_intervention_pauses:
-        if datetime.now(timezone.utc) < human_intervention_pauses[phone]:
-            return True
-        else:
-            # Pausa expirou, remover
-            del human_intervention_pauses[phone]
-    return False
+    # A pausa expira sozinha pelo TTL do state_store
+    return state_store.contains(PAUSES_NAMESPACE, phone)
 
 
 def pause_bot_for_phone(phone: str) -> str:
     """Pausa o bot para este telefone e retorna a mensagem de pausa"""
     duration = get_bot_pause_duration()
-    human_intervention_pauses[phone] = datetime.now(timezone.utc) + timedelta(minutes=duration)
+    until = datetime.now(timezone.utc) + timedelta(minutes=duration)
+    state_store.set(PAUSES_NAMESPACE, phone, {"until": until.isoformat()}, ttl_seconds=duration * 60)
     
     # Remover da fila de espera quando atendente intervém
     remove_from_waiting_queue(phone)
@@ -234,10 +261,7 @@ def pause_bot_for_phone(phone: str) -> str:
 
 def resume_bot_for_phone(phone: str) -> bool:
     """Remove a pausa do bot para este telefone"""
-    if phone in human_intervention_pauses:
-        del human_intervention_pauses[phone]
-        return True
-    return False
+    return state_store.delete(PAUSES_NAMESPACE, phone)
 
 
 def replace_variables_in_response(response_text: str, phone: str, push_name: str = "") -> str:
@@ -669,6 +693,7 @@ async def process_message(phone: str, message: str, push_name: str = "", for_aud
                 print(f"[CHATBOT AI] Humanizando resposta de palavra-chave...")
                 if LLM_AVAILABLE and EMERGENT_LLM_KEY:
                     try:
+                        _load_llm()
                         humanize_prompt = f"""Reescreva esta mensagem no formato de FALA HUMANA para ser lida em voz alta.
 
 REGRAS:
@@ -691,7 +716,8 @@ MENSAGEM HUMANIZADA:"""
                             system_message="Você converte textos para formato de fala natural em português brasileiro."
                         ).with_model("openai", "gpt-4o-mini")
                         
-                        humanized = await temp_chat.send_message(UserMessage(text=humanize_prompt))
+                        with track_external_call("llm"):
+                            humanized = await temp_chat.send_message(UserMessage(text=humanize_prompt))
                         if humanized:
                             # O retorno pode ser string ou objeto com .text
                             if hasattr(humanized, 'text'):
@@ -718,6 +744,8 @@ MENSAGEM HUMANIZADA:"""
         if not LLM_AVAILABLE or not EMERGENT_LLM_KEY:
             return "Desculpe, nosso sistema de atendimento está temporariamente indisponível. Por favor, tente novamente em alguns minutos ou entre em contato pelo telefone."
         
+        _load_llm()
+        
         # Buscar contexto do cliente
         client_context = await get_client_context(phone)
         context_text = format_context_for_llm(client_context)
@@ -778,7 +806,8 @@ INSTRUÇÕES: Responda de forma natural e direta. Se já cumprimentou antes, NÃ
         
         # Enviar para LLM
         user_message = UserMessage(text=full_message)
-        response = await chat.send_message(user_message)
+        with track_external_call("llm"):
+            response = await chat.send_message(user_message)
         
         # Salvar resposta do bot
         db.add_conversation_message({
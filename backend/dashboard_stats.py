@@ -0,0 +1,125 @@
+"""
+Estatísticas das telas (dashboard, valor em estoque, despesas)
+Cada tela é respondida por uma única consulta agregada no SQLite - sem
+carregar e decodificar tabelas inteiras em Python - e o resultado fica em
+cache até os dados mudarem.
+
+- Versão dos dados: (PRAGMA data_version, total_changes da conexão).
+  data_version muda com commits de outras conexões/workers; total_changes
+  conta as escritas feitas pela conexão compartilhada deste processo
+- Qualquer escrita invalida todas as telas; o recálculo é uma consulta só
+"""
+import threading
+from typing import Callable, Dict, Tuple
+
+import database as sqlite_db
+
+
+def _dashboard(cursor) -> Dict:
+    cursor.execute('''
+        SELECT (SELECT COUNT(*) FROM ingredients),
+               (SELECT COUNT(*) FROM products),
+               (SELECT COUNT(*) FROM purchases),
+               (SELECT COALESCE(AVG(COALESCE(cmv, 0)), 0) FROM products)
+    ''')
+    ingredients, products, purchases, avg_cmv = cursor.fetchone()
+    return {
+        "total_ingredients": ingredients,
+        "total_products": products,
+        "total_purchases": purchases,
+        "avg_cmv": avg_cmv,
+    }
+
+
+def _stock_value(cursor) -> Dict:
+    # Apenas insumos ativos (is_active nulo conta como inativo, como antes)
+    cursor.execute('''
+        SELECT COALESCE(SUM(COALESCE(stock_quantity, 0) * COALESCE(average_price, 0)), 0),
+               COALESCE(SUM(CASE WHEN stock_quantity > 0 THEN 1 ELSE 0 END), 0),
+               COUNT(*)
+        FROM ingredients
+        WHERE is_active != 0
+    ''')
+    total_value, with_stock, total_items = cursor.fetchone()
+    return {
+        "total_value": total_value,
+        "items_with_stock": with_stock,
+        "total_items": total_items,
+    }
+
+
+def _expenses(cursor) -> Dict:
+    cursor.execute('''
+        SELECT COUNT(*),
+               COALESCE(SUM(CASE WHEN is_paid = 0 THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN is_paid = 0 THEN value END), 0),
+               COALESCE(SUM(CASE WHEN is_paid = 1 THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN is_paid = 1 THEN value END), 0)
+        FROM expenses
+    ''')
+    total, pending_count, pending_value, paid_count, paid_value = cursor.fetchone()
+    return {
+        "total": total,
+        "pending_count": pending_count,
+        "pending_value": pending_value,
+        "paid_count": paid_count,
+        "paid_value": paid_value,
+    }
+
+
+# Tela -> consulta agregada
+STATS_SCREENS: Dict[str, Callable] = {
+    "dashboard": _dashboard,
+    "stock_value": _stock_value,
+    "expenses": _expenses,
+}
+
+
+def data_version(conn) -> Tuple[int, int]:
+    return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+
+class StatsCache:
+    """Resultado por tela, válido enquanto a versão dos dados não mudar"""
+
+    def __init__(self, screens: Dict[str, Callable] = STATS_SCREENS):
+        self.screens = screens
+        self._entries: Dict[str, Tuple[Tuple[int, int], Dict]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, screen: str) -> Dict:
+        """Estatísticas da tela (KeyError se a tela não existir)"""
+        query = self.screens[screen]
+        # Versão e consulta sob o db_lock: nenhuma escrita deste processo no meio
+        with sqlite_db.db_lock:
+            conn = sqlite_db.get_connection()
+            version = data_version(conn)
+            with self._lock:
+                entry = self._entries.get(screen)
+                if entry is not None and entry[0] == version:
+                    self.hits += 1
+                    return dict(entry[1])
+                self.misses += 1
+            result = query(conn.cursor())
+            with self._lock:
+                self._entries[screen] = (version, result)
+            return dict(result)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "screens": sorted(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0,
+            }
+
+
+stats_cache = StatsCache()
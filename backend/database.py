@@ -9,6 +9,7 @@ REGRAS FUNDAMENTAIS (produção):
 """
 import sqlite3
 import json
+import re
 import uuid
 import os
 import hashlib
@@ -19,10 +20,14 @@ from datetime import datetime, timezone, timedelta
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 import threading
+import time
 from contextlib import contextmanager
 
+from fast_json import RawJSON
+from metrics import InstrumentedRLock
+
 # ==================== CONFIGURAÇÃO ====================
-db_lock = threading.RLock()
+db_lock = InstrumentedRLock("db_lock")
 _connection = None
 _connection_lock = threading.Lock()
 _initialized = False
@@ -159,6 +164,76 @@ def get_db():
         raise e
 
 
+# ==================== COLUNAS JSON ====================
+# recipe, order_steps e items são servidos crus (fast_json.RawJSON, sem
+# decode), então só entra no banco texto JSON válido: sempre uma lista.
+JSON_LIST_COLUMNS = {"products": ("recipe", "order_steps"), "pedidos": ("items",)}
+
+
+def _json_list(value: Any) -> str:
+    """Serializa uma coluna de lista JSON; texto inválido ou não-lista vira []"""
+    if isinstance(value, RawJSON):
+        value = value.load()
+    elif isinstance(value, (str, bytes)):
+        try:
+            value = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            value = []
+    if not isinstance(value, list):
+        value = []
+    return json.dumps(value)
+
+
+def normalize_json_columns(table: str, normalizers: Dict[str, Any], version: Optional[str] = None) -> int:
+    """
+    Reescreve colunas de lista JSON com o normalizador de cada uma (defaults
+    dos modelos aninhados). Só grava as linhas que mudaram; valores que não
+    validam ficam como estão. Retorna quantas linhas foram atualizadas.
+
+    Com `version`, roda uma vez por versão: a versão aplicada fica em
+    system_settings (json_normalizado_<tabela>) e os boots seguintes só leem
+    essa chave. Mude a versão quando os defaults dos modelos mudarem.
+    """
+    columns = list(normalizers)
+    setting_key = f"json_normalizado_{table}"
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        if version is not None:
+            cursor.execute("SELECT value FROM system_settings WHERE key = ?", (setting_key,))
+            row = cursor.fetchone()
+            if row and row[0] == version:
+                return 0
+        cursor.execute(f"SELECT id, {', '.join(columns)} FROM {table}")
+        updates = []
+        for row in cursor.fetchall():
+            changes = {}
+            for column in columns:
+                current = row[column]
+                try:
+                    normalized = _json_list(normalizers[column](json.loads(current or "[]")))
+                except (ValueError, TypeError):
+                    continue
+                if normalized != current:
+                    changes[column] = normalized
+            if changes:
+                updates.append((row["id"], changes))
+
+        for row_id, changes in updates:
+            assignments = ", ".join(f"{column} = ?" for column in changes)
+            cursor.execute(f"UPDATE {table} SET {assignments} WHERE id = ?", (*changes.values(), row_id))
+        if version is not None:
+            cursor.execute('''
+                INSERT OR REPLACE INTO system_settings (key, value, updated_at)
+                VALUES (?, ?, ?)
+            ''', (setting_key, version, datetime.now(timezone.utc).isoformat()))
+        if updates or version is not None:
+            conn.commit()
+        if updates:
+            print(f"[DATABASE] {len(updates)} linha(s) de {table} normalizada(s)")
+        return len(updates)
+
+
 # ==================== HASH DE SENHA ====================
 def hash_password(password: str) -> str:
     """Hash de senha usando SHA256 com salt"""
@@ -180,713 +255,868 @@ def verify_password(stored_hash: str, password: str) -> bool:
     return password == stored_hash
 
 
-# ==================== INICIALIZAÇÃO ====================
+# ==================== INICIALIZAÇÃO / MIGRAÇÕES ====================
+# O esquema é versionado com PRAGMA user_version: cada migração da lista
+# MIGRATIONS roda uma única vez, em sua própria transação, e grava a nova
+# versão junto. Um banco já atualizado sobe com uma única leitura da versão.
+#
+# As migrações são idempotentes (CREATE IF NOT EXISTS / _add_column) porque
+# bancos anteriores ao versionamento (user_version = 0) já podem ter parte
+# das tabelas e colunas. Novas alterações de esquema entram SEMPRE como uma
+# nova migração no fim da lista - nunca editar uma migração já publicada.
+
+# Migrações aplicadas neste processo (versão, nome, duração) - diagnóstico
+_migration_report: List[Dict] = []
+
+
+def _column_names(cursor, table: str) -> set:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _add_column(cursor, table: str, column: str, definition: str):
+    """ALTER TABLE ADD COLUMN apenas se a coluna ainda não existir"""
+    if column not in _column_names(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"[DATABASE] Coluna {column} adicionada em {table}")
+
+
+def _migration_001_core_tables(cursor):
+    """Tabelas principais (usuários, estoque, produtos, pedidos, clientes)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS system_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT DEFAULT 'observador',
+            must_change_password INTEGER DEFAULT 0,
+            created_at TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingredients (
+            id TEXT PRIMARY KEY,
+            code TEXT,
+            name TEXT NOT NULL,
+            unit TEXT,
+            unit_weight REAL DEFAULT 0,
+            units_per_package INTEGER DEFAULT 0,
+            average_price REAL DEFAULT 0,
+            category TEXT,
+            stock_quantity REAL DEFAULT 0,
+            stock_min REAL DEFAULT 0,
+            stock_max REAL DEFAULT 0,
+            is_active INTEGER DEFAULT 1,
+            created_at TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id TEXT PRIMARY KEY,
+            code TEXT,
+            name TEXT NOT NULL,
+            description TEXT,
+            category TEXT,
+            product_type TEXT DEFAULT 'produto',
+            sale_price REAL,
+            simple_price REAL,
+            combo_description TEXT,
+            simple_description TEXT,
+            simple_photo_url TEXT,
+            combo_photo_url TEXT,
+            photo_url TEXT,
+            recipe TEXT,
+            cmv REAL DEFAULT 0,
+            profit_margin REAL,
+            is_insumo INTEGER DEFAULT 0,
+            is_divisible INTEGER DEFAULT 0,
+            order_steps TEXT,
+            created_at TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS purchases (
+            id TEXT PRIMARY KEY,
+            batch_id TEXT,
+            supplier TEXT,
+            ingredient_id TEXT,
+            ingredient_name TEXT,
+            ingredient_unit TEXT,
+            quantity REAL,
+            price REAL,
+            unit_price REAL,
+            purchase_date TEXT,
+            is_paid INTEGER DEFAULT 1,
+            due_date TEXT,
+            expense_id TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id TEXT PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            created_at TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audit_logs (
+            id TEXT PRIMARY KEY,
+            action TEXT,
+            resource_type TEXT,
+            resource_name TEXT,
+            user_id TEXT,
+            username TEXT,
+            priority TEXT DEFAULT 'normal',
+            timestamp TEXT,
+            details TEXT
+        )
+    ''')
+
+    # Tabela de classificações de despesas
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS expense_classifications (
+            id TEXT PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            created_at TEXT
+        )
+    ''')
+
+    # Tabela de despesas
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS expenses (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            classification_id TEXT,
+            classification_name TEXT,
+            supplier TEXT,
+            value REAL NOT NULL,
+            due_date TEXT NOT NULL,
+            is_paid INTEGER DEFAULT 0,
+            paid_date TEXT,
+            is_recurring INTEGER DEFAULT 0,
+            recurring_period TEXT,
+            installments_total INTEGER DEFAULT 0,
+            installment_number INTEGER DEFAULT 0,
+            parent_expense_id TEXT,
+            attachment_url TEXT,
+            notes TEXT,
+            created_at TEXT,
+            FOREIGN KEY (classification_id) REFERENCES expense_classifications(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS clientes (
+            id TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            telefone TEXT,
+            email TEXT,
+            cpf TEXT,
+            data_nascimento TEXT,
+            genero TEXT,
+            foto TEXT,
+            endereco TEXT,
+            numero TEXT,
+            complemento TEXT,
+            bairro TEXT,
+            cep TEXT,
+            pedidos_count INTEGER DEFAULT 0,
+            total_gasto REAL DEFAULT 0,
+            last_order_date TEXT,
+            orders_last_30_days INTEGER DEFAULT 0,
+            pontuacao INTEGER DEFAULT 0,
+            created_at TEXT,
+            membro_clube INTEGER DEFAULT 0,
+            aceita_whatsapp INTEGER DEFAULT 0,
+            data_aceite_clube TEXT,
+            data_aceite_whatsapp TEXT
+        )
+    ''')
+
+    # Tabela de endereços do cliente (múltiplos endereços)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS client_addresses (
+            id TEXT PRIMARY KEY,
+            client_id TEXT NOT NULL,
+            label TEXT DEFAULT 'Casa',
+            endereco TEXT NOT NULL,
+            numero TEXT,
+            complemento TEXT,
+            bairro TEXT,
+            cidade TEXT DEFAULT 'São Paulo',
+            estado TEXT DEFAULT 'SP',
+            cep TEXT,
+            is_default INTEGER DEFAULT 0,
+            created_at TEXT,
+            FOREIGN KEY (client_id) REFERENCES clientes(id)
+        )
+    ''')
+
+    # Tabela de pedidos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pedidos (
+            id TEXT PRIMARY KEY,
+            codigo TEXT UNIQUE NOT NULL,
+            cliente_id TEXT,
+            cliente_nome TEXT,
+            cliente_telefone TEXT,
+            cliente_email TEXT,
+            items TEXT,
+            total REAL DEFAULT 0,
+            status TEXT DEFAULT 'aguardando_aceite',
+            forma_pagamento TEXT,
+            troco_precisa INTEGER DEFAULT 0,
+            troco_valor REAL,
+            tipo_entrega TEXT,
+            endereco_label TEXT,
+            endereco_rua TEXT,
+            endereco_numero TEXT,
+            endereco_complemento TEXT,
+            endereco_bairro TEXT,
+            endereco_cep TEXT,
+            modulo TEXT DEFAULT 'Cardapio',
+            observacao TEXT,
+            entregador_id TEXT,
+            entregador_nome TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    # Tabela de entregadores
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS entregadores (
+            id TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            telefone TEXT,
+            ativo INTEGER DEFAULT 1,
+            created_at TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    # Tabela de funcionários (liga clientes a cargos)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS funcionarios (
+            id TEXT PRIMARY KEY,
+            cliente_id TEXT NOT NULL,
+            cargo TEXT NOT NULL,
+            ativo INTEGER DEFAULT 1,
+            created_at TEXT,
+            updated_at TEXT,
+            FOREIGN KEY (cliente_id) REFERENCES clientes(id)
+        )
+    ''')
+
+    # Tabela de bairros para delivery
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bairros (
+            id TEXT PRIMARY KEY,
+            nome TEXT NOT NULL UNIQUE,
+            valor_entrega REAL DEFAULT 0,
+            cep TEXT,
+            ativo INTEGER DEFAULT 1,
+            created_at TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    # Tabela de ruas para delivery
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ruas (
+            id TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            bairro_id TEXT,
+            cep TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            FOREIGN KEY (bairro_id) REFERENCES bairros(id)
+        )
+    ''')
+
+    # Tabela de analytics de palavras do WhatsApp
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS word_analytics (
+            id TEXT PRIMARY KEY,
+            word TEXT NOT NULL,
+            type TEXT DEFAULT 'word',
+            count INTEGER DEFAULT 1,
+            last_used TEXT,
+            first_used TEXT,
+            sender_phones TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    # Tabela de mensagens do WhatsApp (histórico)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS whatsapp_messages (
+            id TEXT PRIMARY KEY,
+            sender_phone TEXT NOT NULL,
+            sender_name TEXT,
+            message TEXT NOT NULL,
+            response TEXT,
+            created_at TEXT
+        )
+    ''')
+
+
+def _migration_002_legacy_columns(cursor):
+    """Colunas adicionadas ao longo do tempo em bancos antigos"""
+    _add_column(cursor, "ingredients", "code", "TEXT")
+    _add_column(cursor, "users", "must_change_password", "INTEGER DEFAULT 0")
+
+    # Entregador, cancelamento e taxa de entrega nos pedidos
+    _add_column(cursor, "pedidos", "entregador_id", "TEXT")
+    _add_column(cursor, "pedidos", "entregador_nome", "TEXT")
+    _add_column(cursor, "pedidos", "motivo_cancelamento", "TEXT")
+    _add_column(cursor, "pedidos", "valor_entrega", "REAL DEFAULT 0")
+
+    # Clube de clientes e pontuação
+    _add_column(cursor, "clientes", "membro_clube", "INTEGER DEFAULT 0")
+    _add_column(cursor, "clientes", "aceita_whatsapp", "INTEGER DEFAULT 0")
+    _add_column(cursor, "clientes", "data_aceite_clube", "TEXT")
+    _add_column(cursor, "clientes", "data_aceite_whatsapp", "TEXT")
+    _add_column(cursor, "clientes", "pontuacao", "INTEGER DEFAULT 0")
+
+    # Receitas (produto que vira ingrediente) e status dos produtos
+    _add_column(cursor, "products", "linked_ingredient_id", "TEXT")
+    _add_column(cursor, "products", "recipe_yield", "REAL")
+    _add_column(cursor, "products", "recipe_yield_unit", "TEXT")
+    _add_column(cursor, "products", "unit_cost", "REAL")
+    _add_column(cursor, "products", "is_active", "INTEGER DEFAULT 1")
+    _add_column(cursor, "products", "available", "INTEGER DEFAULT 1")
+    _add_column(cursor, "ingredients", "recipe_cost_history", "TEXT")
+    _add_column(cursor, "ingredients", "is_active", "INTEGER DEFAULT 1")
+
+    # Pagamento das compras
+    _add_column(cursor, "purchases", "is_paid", "INTEGER DEFAULT 1")
+    _add_column(cursor, "purchases", "due_date", "TEXT")
+    _add_column(cursor, "purchases", "expense_id", "TEXT")
+
+
+def _migration_003_chatbot_tables(cursor):
+    """Horários de funcionamento, ChatBot/WhatsApp e templates de status"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS business_hours (
+            id TEXT PRIMARY KEY,
+            day_of_week INTEGER NOT NULL,
+            day_name TEXT NOT NULL,
+            is_open INTEGER DEFAULT 1,
+            opening_time TEXT DEFAULT '08:00',
+            closing_time TEXT DEFAULT '22:00',
+            has_second_period INTEGER DEFAULT 0,
+            opening_time_2 TEXT DEFAULT '18:00',
+            closing_time_2 TEXT DEFAULT '23:59',
+            updated_at TEXT
+        )
+    ''')
+    _add_column(cursor, "business_hours", "has_second_period", "INTEGER DEFAULT 0")
+    _add_column(cursor, "business_hours", "opening_time_2", "TEXT DEFAULT '18:00'")
+    _add_column(cursor, "business_hours", "closing_time_2", "TEXT DEFAULT '23:59'")
+    _add_column(cursor, "word_analytics", "type", "TEXT DEFAULT 'word'")
+
+    # Árvore de decisão do ChatBot WhatsApp
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS decision_tree (
+            id TEXT PRIMARY KEY,
+            trigger TEXT NOT NULL,
+            response TEXT NOT NULL,
+            parent_id TEXT,
+            "order" INTEGER DEFAULT 0,
+            is_active INTEGER DEFAULT 1,
+            created_at TEXT,
+            updated_at TEXT,
+            FOREIGN KEY (parent_id) REFERENCES decision_tree(id)
+        )
+    ''')
+
+    # Nós do fluxograma visual do ChatBot
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chatbot_flow_nodes (
+            id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            title TEXT NOT NULL,
+            content TEXT,
+            position_x REAL DEFAULT 0,
+            position_y REAL DEFAULT 0,
+            config TEXT,
+            is_active INTEGER DEFAULT 1,
+            created_at TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    # Conexões entre nós do fluxograma
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chatbot_flow_edges (
+            id TEXT PRIMARY KEY,
+            source_id TEXT NOT NULL,
+            target_id TEXT NOT NULL,
+            condition TEXT,
+            label TEXT,
+            created_at TEXT,
+            FOREIGN KEY (source_id) REFERENCES chatbot_flow_nodes(id),
+            FOREIGN KEY (target_id) REFERENCES chatbot_flow_nodes(id)
+        )
+    ''')
+
+    # Histórico de conversas do WhatsApp
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chatbot_conversations (
+            id TEXT PRIMARY KEY,
+            phone TEXT NOT NULL,
+            client_name TEXT,
+            client_id TEXT,
+            status TEXT DEFAULT 'active',
+            current_node_id TEXT,
+            context TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            FOREIGN KEY (client_id) REFERENCES clientes(id)
+        )
+    ''')
+
+    # Mensagens das conversas
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chatbot_messages (
+            id TEXT PRIMARY KEY,
+            conversation_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            node_id TEXT,
+            created_at TEXT,
+            FOREIGN KEY (conversation_id) REFERENCES chatbot_conversations(id)
+        )
+    ''')
+
+    # Configurações do chatbot
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chatbot_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    # Respostas automáticas por palavras-chave
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS keyword_responses (
+            id TEXT PRIMARY KEY,
+            keywords TEXT NOT NULL,
+            response TEXT NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            priority INTEGER DEFAULT 0,
+            match_type TEXT DEFAULT 'contains',
+            created_at TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    # Estatísticas do WhatsApp/ChatBot
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS whatsapp_stats (
+            id TEXT PRIMARY KEY DEFAULT 'main',
+            messages_received INTEGER DEFAULT 0,
+            messages_sent INTEGER DEFAULT 0,
+            updated_at TEXT
+        )
+    ''')
+
+    # Clientes atendidos pelo WhatsApp
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS whatsapp_clients (
+            phone TEXT PRIMARY KEY,
+            name TEXT,
+            first_contact TEXT,
+            last_contact TEXT,
+            messages_count INTEGER DEFAULT 0
+        )
+    ''')
+
+    # Templates de notificações de status de pedidos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_status_templates (
+            id TEXT PRIMARY KEY,
+            tipo_entrega TEXT NOT NULL,
+            status TEXT NOT NULL,
+            template TEXT NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            delay_seconds INTEGER DEFAULT 0,
+            created_at TEXT,
+            updated_at TEXT,
+            UNIQUE(tipo_entrega, status)
+        )
+    ''')
+
+
+def _migration_004_default_data(cursor):
+    """Admin inicial, configurações e horários/templates padrão"""
+    now = datetime.now(timezone.utc).isoformat()
+
+    # Criar admin se não existir nenhum usuário
+    cursor.execute("SELECT COUNT(*) FROM users")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('''
+            INSERT INTO users (id, username, password, role, must_change_password, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (str(uuid.uuid4()), 'admin', hash_password("admin"), 'proprietario', 1, now))
+        print("[DATABASE] Usuário admin criado (admin/admin)")
+
+    cursor.execute('''
+        INSERT OR IGNORE INTO system_settings (key, value, updated_at)
+        VALUES ('skip_login', 'false', ?)
+    ''', (now,))
+
+    cursor.execute('''
+        INSERT OR IGNORE INTO whatsapp_stats (id, messages_received, messages_sent, updated_at)
+        VALUES ('main', 0, 0, ?)
+    ''', (now,))
+
+    # Horários padrão se a tabela estiver vazia
+    cursor.execute("SELECT COUNT(*) FROM business_hours")
+    if cursor.fetchone()[0] == 0:
+        days = [
+            (0, "Segunda-feira"),
+            (1, "Terça-feira"),
+            (2, "Quarta-feira"),
+            (3, "Quinta-feira"),
+            (4, "Sexta-feira"),
+            (5, "Sábado"),
+            (6, "Domingo")
+        ]
+        for day_num, day_name in days:
+            # Domingo fechado por padrão
+            is_open = 0 if day_num == 6 else 1
+            cursor.execute('''
+                INSERT INTO business_hours (id, day_of_week, day_name, is_open, opening_time, closing_time, has_second_period, opening_time_2, closing_time_2, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (str(uuid.uuid4()), day_num, day_name, is_open, '08:00', '22:00', 0, '18:00', '23:59', now))
+        print("[DATABASE] Horários de funcionamento padrão criados")
+
+    # Templates de notificações de status de pedidos se a tabela estiver vazia
+    cursor.execute("SELECT COUNT(*) FROM order_status_templates")
+    if cursor.fetchone()[0] == 0:
+        # Templates para ENTREGA (delivery)
+        delivery_templates = [
+            ('delivery', 'aguardando_aceite', 'Pedido Criado #{codigo}', 1, 35),
+            ('delivery', 'producao', 'Pedido #{codigo} Aceito, ja esta em produção', 1, 42),
+            ('delivery', 'pronto', 'Pedido #{codigo} Pronto, estamos aguardando entregador', 1, 0),
+            ('delivery', 'na_bag', 'Pedido #{codigo} Na Bag do entregador, em breve entra em rota de entrega', 1, 0),
+            ('delivery', 'em_rota', 'Pedido #{codigo} Esta em rota de entrega, confira no link www.rastreio.com.br', 1, 0),
+            ('delivery', 'entregue', 'Pedido #{codigo} Entregue', 1, 0),
+            ('delivery', 'concluido', 'Pedido #{codigo} Entregue', 1, 0),
+            ('delivery', 'cancelado', 'Pedido #{codigo} foi Cancelado\n\nMotivo: {motivo}', 1, 0),
+        ]
+        # Templates para RETIRADA (pickup)
+        pickup_templates = [
+            ('pickup', 'aguardando_aceite', 'Pedido Criado #{codigo}', 1, 35),
+            ('pickup', 'producao', 'Pedido #{codigo} Aceito, ja esta em produção', 1, 42),
+            ('pickup', 'pronto', 'Pedido #{codigo} Pronto, pode retirar\n\n📍 {endereco}', 1, 0),
+            ('pickup', 'retirado', 'Pedido #{codigo} Retirado com sucesso', 1, 0),
+            ('pickup', 'concluido', 'Pedido #{codigo} Retirado com sucesso', 1, 0),
+            ('pickup', 'cancelado', 'Pedido #{codigo} foi Cancelado\n\nMotivo: {motivo}', 1, 0),
+        ]
+        for t in delivery_templates + pickup_templates:
+            cursor.execute('''
+                INSERT INTO order_status_templates (id, tipo_entrega, status, template, is_active, delay_seconds, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (str(uuid.uuid4()), t[0], t[1], t[2], t[3], t[4], now, now))
+        print("[DATABASE] Templates de notificações de status de pedidos criados")
+
+
+def _migration_005_chatbot_state(cursor):
+    """Estado compartilhado do chatbot entre workers (fila de espera, pausas)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chatbot_state (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            expires_at REAL,
+            PRIMARY KEY (namespace, key)
+        )
+    ''')
+
+
+def _migration_006_job_runs(cursor):
+    """Histórico de execuções de jobs em segundo plano (jobs.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id TEXT PRIMARY KEY,
+            job_name TEXT NOT NULL,
+            params TEXT,
+            status TEXT NOT NULL,
+            trigger TEXT,
+            slot TEXT UNIQUE,
+            attempts INTEGER DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            next_attempt_at TEXT
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_runs_name ON job_runs(job_name, created_at DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_runs_created ON job_runs(created_at DESC)")
+
+
+def _migration_007_pedidos_created_index(cursor):
+    """Índice por data dos pedidos para os relatórios de vendas"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pedidos_created_at ON pedidos(created_at)")
+
+
+def _migration_008_sales_rollups(cursor):
+    """Totais de vendas por hora (produto, bairro, forma de pagamento) + carga inicial"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_hourly_product (
+            hour TEXT NOT NULL,
+            product_key TEXT NOT NULL,
+            nome TEXT,
+            pedidos INTEGER NOT NULL DEFAULT 0,
+            quantidade REAL NOT NULL DEFAULT 0,
+            faturamento REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, product_key)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_hourly_bairro (
+            hour TEXT NOT NULL,
+            bairro TEXT NOT NULL,
+            pedidos INTEGER NOT NULL DEFAULT 0,
+            faturamento REAL NOT NULL DEFAULT 0,
+            taxa_entrega REAL NOT NULL DEFAULT 0,
+            cancelados INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, bairro)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_hourly_payment (
+            hour TEXT NOT NULL,
+            forma_pagamento TEXT NOT NULL,
+            pedidos INTEGER NOT NULL DEFAULT 0,
+            faturamento REAL NOT NULL DEFAULT 0,
+            taxa_entrega REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, forma_pagamento)
+        ) WITHOUT ROWID
+    ''')
+    _rebuild_sales_rollups(cursor)
+
+
+def _migration_009_delivery_times(cursor):
+    """Horários de saída/entrega dos pedidos e índice por entregador"""
+    _add_column(cursor, "pedidos", "despachado_em", "TEXT")
+    _add_column(cursor, "pedidos", "entregue_em", "TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pedidos_entregador_created ON pedidos(entregador_id, created_at)")
+
+
+def _migration_010_valid_json_lists(cursor):
+    """Colunas de lista JSON inválidas (texto corrompido/legado) viram []"""
+    for table, columns in JSON_LIST_COLUMNS.items():
+        for column in columns:
+            cursor.execute(f'''
+                UPDATE {table} SET {column} = '[]'
+                WHERE {column} IS NULL OR NOT json_valid({column}) OR json_type({column}) != 'array'
+            ''')
+            if cursor.rowcount:
+                print(f"[DATABASE] {cursor.rowcount} valor(es) inválido(s) em {table}.{column} -> []")
+
+
+# (versão, nome, função) - em ordem; a versão do banco é a última aplicada
+MIGRATIONS = [
+    (1, "tabelas_principais", _migration_001_core_tables),
+    (2, "colunas_legadas", _migration_002_legacy_columns),
+    (3, "tabelas_chatbot", _migration_003_chatbot_tables),
+    (4, "dados_padrao", _migration_004_default_data),
+    (5, "chatbot_state", _migration_005_chatbot_state),
+    (6, "job_runs", _migration_006_job_runs),
+    (7, "indice_pedidos_data", _migration_007_pedidos_created_index),
+    (8, "rollups_vendas", _migration_008_sales_rollups),
+    (9, "tempos_entrega", _migration_009_delivery_times),
+    (10, "listas_json_validas", _migration_010_valid_json_lists),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn=None) -> int:
+    conn = conn or get_connection()
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _apply_migration(conn, version: int, name: str, migration) -> float:
+    """
+    Aplica uma migração em transação própria (BEGIN IMMEDIATE: outro processo
+    iniciando ao mesmo tempo espera e depois vê a versão já gravada).
+    Retorna a duração em ms, ou -1 se outro processo já a aplicou.
+    """
+    conn.commit()
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        if get_schema_version(conn) >= version:
+            conn.rollback()
+            return -1
+        migration(cursor)
+        duration_ms = (time.perf_counter() - start) * 1000
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL,
+                duration_ms REAL
+            )
+        ''')
+        cursor.execute(
+            "INSERT OR REPLACE INTO schema_version (version, name, applied_at, duration_ms) VALUES (?, ?, ?, ?)",
+            (version, name, datetime.now(timezone.utc).isoformat(), round(duration_ms, 2))
+        )
+        cursor.execute(f"PRAGMA user_version = {int(version)}")
+        conn.commit()
+        return duration_ms
+    except Exception:
+        conn.rollback()
+        raise
+
+
 def init_database():
-    """Inicializa o banco de dados criando as tabelas e usuário admin padrão"""
+    """
+    Inicializa o banco aplicando as migrações pendentes (ver MIGRATIONS).
+    Banco já na versão atual: apenas lê PRAGMA user_version.
+    """
     global _initialized, DB_PATH
-    
+
     if _initialized:
         return
-    
+
+    with db_lock:
+        conn = get_connection()
+        current = get_schema_version(conn)
+
+        if current > SCHEMA_VERSION:
+            print(f"[DATABASE] AVISO: banco na versão {current}, mais nova que a do aplicativo ({SCHEMA_VERSION})")
+
+        for version, name, migration in MIGRATIONS:
+            if version <= current:
+                continue
+            try:
+                duration_ms = _apply_migration(conn, version, name, migration)
+            except Exception as e:
+                print(f"[DATABASE] ERRO na migração {version} ({name}): {e}")
+                raise
+            if duration_ms >= 0:
+                _migration_report.append({"version": version, "name": name, "duration_ms": round(duration_ms, 2)})
+                print(f"[DATABASE] Migração {version} ({name}) aplicada em {duration_ms:.1f}ms")
+
+        _initialized = True
+        print(f"[DATABASE] Inicializado em: {DB_PATH} (esquema v{get_schema_version(conn)})")
+
+
+def get_schema_info() -> Dict:
+    """Versão do esquema e migrações aplicadas (neste processo e no histórico)"""
     with db_lock:
         conn = get_connection()
         cursor = conn.cursor()
-        
-        # Criar tabelas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS system_settings (
-                key TEXT PRIMARY KEY,
-                value TEXT,
-                updated_at TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id TEXT PRIMARY KEY,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT DEFAULT 'observador',
-                must_change_password INTEGER DEFAULT 0,
-                created_at TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ingredients (
-                id TEXT PRIMARY KEY,
-                code TEXT,
-                name TEXT NOT NULL,
-                unit TEXT,
-                unit_weight REAL DEFAULT 0,
-                units_per_package INTEGER DEFAULT 0,
-                average_price REAL DEFAULT 0,
-                category TEXT,
-                stock_quantity REAL DEFAULT 0,
-                stock_min REAL DEFAULT 0,
-                stock_max REAL DEFAULT 0,
-                is_active INTEGER DEFAULT 1,
-                created_at TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id TEXT PRIMARY KEY,
-                code TEXT,
-                name TEXT NOT NULL,
-                description TEXT,
-                category TEXT,
-                product_type TEXT DEFAULT 'produto',
-                sale_price REAL,
-                simple_price REAL,
-                combo_description TEXT,
-                simple_description TEXT,
-                simple_photo_url TEXT,
-                combo_photo_url TEXT,
-                photo_url TEXT,
-                recipe TEXT,
-                cmv REAL DEFAULT 0,
-                profit_margin REAL,
-                is_insumo INTEGER DEFAULT 0,
-                is_divisible INTEGER DEFAULT 0,
-                order_steps TEXT,
-                created_at TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS purchases (
-                id TEXT PRIMARY KEY,
-                batch_id TEXT,
-                supplier TEXT,
-                ingredient_id TEXT,
-                ingredient_name TEXT,
-                ingredient_unit TEXT,
-                quantity REAL,
-                price REAL,
-                unit_price REAL,
-                purchase_date TEXT,
-                is_paid INTEGER DEFAULT 1,
-                due_date TEXT,
-                expense_id TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS categories (
-                id TEXT PRIMARY KEY,
-                name TEXT UNIQUE NOT NULL,
-                created_at TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS audit_logs (
-                id TEXT PRIMARY KEY,
-                action TEXT,
-                resource_type TEXT,
-                resource_name TEXT,
-                user_id TEXT,
-                username TEXT,
-                priority TEXT DEFAULT 'normal',
-                timestamp TEXT,
-                details TEXT
-            )
-        ''')
-        
-        # Tabela de classificações de despesas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS expense_classifications (
-                id TEXT PRIMARY KEY,
-                name TEXT UNIQUE NOT NULL,
-                created_at TEXT
-            )
-        ''')
-        
-        # Tabela de despesas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS expenses (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                classification_id TEXT,
-                classification_name TEXT,
-                supplier TEXT,
-                value REAL NOT NULL,
-                due_date TEXT NOT NULL,
-                is_paid INTEGER DEFAULT 0,
-                paid_date TEXT,
-                is_recurring INTEGER DEFAULT 0,
-                recurring_period TEXT,
-                installments_total INTEGER DEFAULT 0,
-                installment_number INTEGER DEFAULT 0,
-                parent_expense_id TEXT,
-                attachment_url TEXT,
-                notes TEXT,
-                created_at TEXT,
-                FOREIGN KEY (classification_id) REFERENCES expense_classifications(id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clientes (
-                id TEXT PRIMARY KEY,
-                nome TEXT NOT NULL,
-                telefone TEXT,
-                email TEXT,
-                cpf TEXT,
-                data_nascimento TEXT,
-                genero TEXT,
-                foto TEXT,
-                endereco TEXT,
-                numero TEXT,
-                complemento TEXT,
-                bairro TEXT,
-                cep TEXT,
-                pedidos_count INTEGER DEFAULT 0,
-                total_gasto REAL DEFAULT 0,
-                last_order_date TEXT,
-                orders_last_30_days INTEGER DEFAULT 0,
-                pontuacao INTEGER DEFAULT 0,
-                created_at TEXT,
-                membro_clube INTEGER DEFAULT 0,
-                aceita_whatsapp INTEGER DEFAULT 0,
-                data_aceite_clube TEXT,
-                data_aceite_whatsapp TEXT
-            )
-        ''')
-        
-        # Tabela de endereços do cliente (múltiplos endereços)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS client_addresses (
-                id TEXT PRIMARY KEY,
-                client_id TEXT NOT NULL,
-                label TEXT DEFAULT 'Casa',
-                endereco TEXT NOT NULL,
-                numero TEXT,
-                complemento TEXT,
-                bairro TEXT,
-                cidade TEXT DEFAULT 'São Paulo',
-                estado TEXT DEFAULT 'SP',
-                cep TEXT,
-                is_default INTEGER DEFAULT 0,
-                created_at TEXT,
-                FOREIGN KEY (client_id) REFERENCES clientes(id)
-            )
-        ''')
-        
-        # Criar tabela de pedidos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS pedidos (
-                id TEXT PRIMARY KEY,
-                codigo TEXT UNIQUE NOT NULL,
-                cliente_id TEXT,
-                cliente_nome TEXT,
-                cliente_telefone TEXT,
-                cliente_email TEXT,
-                items TEXT,
-                total REAL DEFAULT 0,
-                status TEXT DEFAULT 'aguardando_aceite',
-                forma_pagamento TEXT,
-                troco_precisa INTEGER DEFAULT 0,
-                troco_valor REAL,
-                tipo_entrega TEXT,
-                endereco_label TEXT,
-                endereco_rua TEXT,
-                endereco_numero TEXT,
-                endereco_complemento TEXT,
-                endereco_bairro TEXT,
-                endereco_cep TEXT,
-                modulo TEXT DEFAULT 'Cardapio',
-                observacao TEXT,
-                entregador_id TEXT,
-                entregador_nome TEXT,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
-        
-        # Criar tabela de entregadores
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS entregadores (
-                id TEXT PRIMARY KEY,
-                nome TEXT NOT NULL,
-                telefone TEXT,
-                ativo INTEGER DEFAULT 1,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
-        
-        # Criar tabela de funcionários (liga clientes a cargos)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS funcionarios (
-                id TEXT PRIMARY KEY,
-                cliente_id TEXT NOT NULL,
-                cargo TEXT NOT NULL,
-                ativo INTEGER DEFAULT 1,
-                created_at TEXT,
-                updated_at TEXT,
-                FOREIGN KEY (cliente_id) REFERENCES clientes(id)
-            )
-        ''')
-        
-        # Criar tabela de bairros para delivery
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bairros (
-                id TEXT PRIMARY KEY,
-                nome TEXT NOT NULL UNIQUE,
-                valor_entrega REAL DEFAULT 0,
-                cep TEXT,
-                ativo INTEGER DEFAULT 1,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
-        
-        # Criar tabela de ruas para delivery
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ruas (
-                id TEXT PRIMARY KEY,
-                nome TEXT NOT NULL,
-                bairro_id TEXT,
-                cep TEXT,
-                created_at TEXT,
-                updated_at TEXT,
-                FOREIGN KEY (bairro_id) REFERENCES bairros(id)
-            )
-        ''')
-        
-        # Tabela de analytics de palavras do WhatsApp
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS word_analytics (
-                id TEXT PRIMARY KEY,
-                word TEXT NOT NULL,
-                type TEXT DEFAULT 'word',
-                count INTEGER DEFAULT 1,
-                last_used TEXT,
-                first_used TEXT,
-                sender_phones TEXT,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
-        
-        # Tabela de mensagens do WhatsApp (histórico)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS whatsapp_messages (
-                id TEXT PRIMARY KEY,
-                sender_phone TEXT NOT NULL,
-                sender_name TEXT,
-                message TEXT NOT NULL,
-                response TEXT,
-                created_at TEXT
-            )
-        ''')
-        
-        # Migrações
-        try:
-            cursor.execute("SELECT code FROM ingredients LIMIT 1")
-        except sqlite3.OperationalError:
-            cursor.execute("ALTER TABLE ingredients ADD COLUMN code TEXT")
-        
+        history = []
         try:
-            cursor.execute("SELECT must_change_password FROM users LIMIT 1")
+            cursor.execute("SELECT version, name, applied_at, duration_ms FROM schema_version ORDER BY version")
+            history = [dict(row) for row in cursor.fetchall()]
         except sqlite3.OperationalError:
-            cursor.execute("ALTER TABLE users ADD COLUMN must_change_password INTEGER DEFAULT 0")
-        
-        # Migração: Adicionar colunas de entregador na tabela pedidos
-        try:
-            cursor.execute("SELECT entregador_id FROM pedidos LIMIT 1")
-        except sqlite3.OperationalError:
-            cursor.execute("ALTER TABLE pedidos ADD COLUMN entregador_id TEXT")
-            cursor.execute("ALTER TABLE pedidos ADD COLUMN entregador_nome TEXT")
-            print("[DATABASE] Colunas de entregador adicionadas em pedidos")
-        
-        # Migração: Adicionar coluna motivo_cancelamento na tabela pedidos
-        try:
-            cursor.execute("SELECT motivo_cancelamento FROM pedidos LIMIT 1")
-        except sqlite3.OperationalError:
-            cursor.execute("ALTER TABLE pedidos ADD COLUMN motivo_cancelamento TEXT")
-            print("[DATABASE] Coluna motivo_cancelamento adicionada em pedidos")
-        
-        # Migração: Adicionar coluna valor_entrega na tabela pedidos
-        try:
-            cursor.execute("SELECT valor_entrega FROM pedidos LIMIT 1")
-        except sqlite3.OperationalError:
-            cursor.execute("ALTER TABLE pedidos ADD COLUMN valor_entrega REAL DEFAULT 0")
-            print("[DATABASE] Coluna valor_entrega adicionada em pedidos")
-        
-        # Migração: Adicionar colunas do clube na tabela clientes
-        try:
-            cursor.execute("SELECT membro_clube FROM clientes LIMIT 1")
-        except sqlite3.OperationalError:
-            cursor.execute("ALTER TABLE clientes ADD COLUMN membro_clube INTEGER DEFAULT 0")
-            cursor.execute("ALTER TABLE clientes ADD COLUMN aceita_whatsapp INTEGER DEFAULT 0")
-            cursor.execute("ALTER TABLE clientes ADD COLUMN data_aceite_clube TEXT")
-            cursor.execute("ALTER TABLE clientes ADD COLUMN data_aceite_whatsapp TEXT")
-            print("[DATABASE] Colunas do clube adicionadas em clientes")
-        
-        conn.commit()
-        
-        # Criar admin se não existir nenhum usuário
-        cursor.execute("SELECT COUNT(*) FROM users")
-        user_count = cursor.fetchone()[0]
-        
-        if user_count == 0:
-            admin_id = str(uuid.uuid4())
-            created_at = datetime.now(timezone.utc).isoformat()
-            admin_hash = hash_password("admin")
-            
-            cursor.execute('''
-                INSERT INTO users (id, username, password, role, must_change_password, created_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (admin_id, 'admin', admin_hash, 'proprietario', 1, created_at))
-            conn.commit()
-            print("[DATABASE] Usuário admin criado (admin/admin)")
-        
-        # Configurações padrão
-        cursor.execute("SELECT value FROM system_settings WHERE key = 'skip_login'")
-        if not cursor.fetchone():
-            cursor.execute('''
-                INSERT INTO system_settings (key, value, updated_at)
-                VALUES ('skip_login', 'false', ?)
-            ''', (datetime.now(timezone.utc).isoformat(),))
-            conn.commit()
-        
-        # Migração: Adicionar colunas de receita na tabela products
-        try:
-            cursor.execute("ALTER TABLE products ADD COLUMN linked_ingredient_id TEXT")
-            conn.commit()
-            print("[DATABASE] Coluna linked_ingredient_id adicionada em products")
-        except:
-            pass  # Coluna já existe
-        
-        try:
-            cursor.execute("ALTER TABLE products ADD COLUMN recipe_yield REAL")
-            conn.commit()
-            print("[DATABASE] Coluna recipe_yield adicionada em products")
-        except:
-            pass  # Coluna já existe
-        
-        try:
-            cursor.execute("ALTER TABLE products ADD COLUMN recipe_yield_unit TEXT")
-            conn.commit()
-            print("[DATABASE] Coluna recipe_yield_unit adicionada em products")
-        except:
-            pass  # Coluna já existe
-        
-        try:
-            cursor.execute("ALTER TABLE products ADD COLUMN unit_cost REAL")
-            conn.commit()
-            print("[DATABASE] Coluna unit_cost adicionada em products")
-        except:
-            pass  # Coluna já existe
-        
-        # Migração: Adicionar coluna recipe_cost_history na tabela ingredients
-        try:
-            cursor.execute("ALTER TABLE ingredients ADD COLUMN recipe_cost_history TEXT")
-            conn.commit()
-            print("[DATABASE] Coluna recipe_cost_history adicionada em ingredients")
-        except:
-            pass  # Coluna já existe
-        
-        # Migração: Adicionar colunas de pagamento na tabela purchases
-        try:
-            cursor.execute("ALTER TABLE purchases ADD COLUMN is_paid INTEGER DEFAULT 1")
-            conn.commit()
-            print("[DATABASE] Coluna is_paid adicionada em purchases")
-        except:
-            pass  # Coluna já existe
-        
-        try:
-            cursor.execute("ALTER TABLE purchases ADD COLUMN due_date TEXT")
-            conn.commit()
-            print("[DATABASE] Coluna due_date adicionada em purchases")
-        except:
-            pass  # Coluna já existe
-        
-        try:
-            cursor.execute("ALTER TABLE purchases ADD COLUMN expense_id TEXT")
-            conn.commit()
-            print("[DATABASE] Coluna expense_id adicionada em purchases")
-        except:
-            pass  # Coluna já existe
-        
-        # Migração: Adicionar coluna is_active na tabela ingredients
-        try:
-            cursor.execute("ALTER TABLE ingredients ADD COLUMN is_active INTEGER DEFAULT 1")
-            conn.commit()
-            print("[DATABASE] Coluna is_active adicionada em ingredients")
-        except:
-            pass  # Coluna já existe
-        
-        # Migração: Adicionar coluna is_active na tabela products
-        try:
-            cursor.execute("ALTER TABLE products ADD COLUMN is_active INTEGER DEFAULT 1")
-            conn.commit()
-            print("[DATABASE] Coluna is_active adicionada em products")
-        except:
-            pass  # Coluna já existe
-        
-        # Migração: Adicionar coluna available na tabela products (disponível para compra)
-        try:
-            cursor.execute("ALTER TABLE products ADD COLUMN available INTEGER DEFAULT 1")
-            conn.commit()
-            print("[DATABASE] Coluna available adicionada em products")
-        except:
-            pass  # Coluna já existe
-        
-        # Migração: Adicionar coluna pontuacao na tabela clientes
-        try:
-            cursor.execute("ALTER TABLE clientes ADD COLUMN pontuacao INTEGER DEFAULT 0")
-            conn.commit()
-            print("[DATABASE] Coluna pontuacao adicionada em clientes")
-        except:
-            pass  # Coluna já existe
-        
-        # Criar tabela de horários de funcionamento
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS business_hours (
-                id TEXT PRIMARY KEY,
-                day_of_week INTEGER NOT NULL,
-                day_name TEXT NOT NULL,
-                is_open INTEGER DEFAULT 1,
-                opening_time TEXT DEFAULT '08:00',
-                closing_time TEXT DEFAULT '22:00',
-                has_second_period INTEGER DEFAULT 0,
-                opening_time_2 TEXT DEFAULT '18:00',
-                closing_time_2 TEXT DEFAULT '23:59',
-                updated_at TEXT
-            )
-        ''')
-        conn.commit()
-        
-        # Tabela para árvore de decisão do ChatBot WhatsApp
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS decision_tree (
-                id TEXT PRIMARY KEY,
-                trigger TEXT NOT NULL,
-                response TEXT NOT NULL,
-                parent_id TEXT,
-                "order" INTEGER DEFAULT 0,
-                is_active INTEGER DEFAULT 1,
-                created_at TEXT,
-                updated_at TEXT,
-                FOREIGN KEY (parent_id) REFERENCES decision_tree(id)
-            )
-        ''')
-        conn.commit()
-        
-        # Tabela para nós do fluxograma visual do ChatBot
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chatbot_flow_nodes (
-                id TEXT PRIMARY KEY,
-                type TEXT NOT NULL,
-                title TEXT NOT NULL,
-                content TEXT,
-                position_x REAL DEFAULT 0,
-                position_y REAL DEFAULT 0,
-                config TEXT,
-                is_active INTEGER DEFAULT 1,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
-        conn.commit()
-        
-        # Tabela para conexões entre nós do fluxograma
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chatbot_flow_edges (
-                id TEXT PRIMARY KEY,
-                source_id TEXT NOT NULL,
-                target_id TEXT NOT NULL,
-                condition TEXT,
-                label TEXT,
-                created_at TEXT,
-                FOREIGN KEY (source_id) REFERENCES chatbot_flow_nodes(id),
-                FOREIGN KEY (target_id) REFERENCES chatbot_flow_nodes(id)
-            )
-        ''')
-        conn.commit()
-        
-        # Tabela para histórico de conversas do WhatsApp
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chatbot_conversations (
-                id TEXT PRIMARY KEY,
-                phone TEXT NOT NULL,
-                client_name TEXT,
-                client_id TEXT,
-                status TEXT DEFAULT 'active',
-                current_node_id TEXT,
-                context TEXT,
-                created_at TEXT,
-                updated_at TEXT,
-                FOREIGN KEY (client_id) REFERENCES clientes(id)
-            )
-        ''')
-        conn.commit()
-        
-        # Tabela para mensagens das conversas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chatbot_messages (
-                id TEXT PRIMARY KEY,
-                conversation_id TEXT NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                node_id TEXT,
-                created_at TEXT,
-                FOREIGN KEY (conversation_id) REFERENCES chatbot_conversations(id)
-            )
-        ''')
-        conn.commit()
-        
-        # Tabela para configurações do chatbot
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chatbot_settings (
-                key TEXT PRIMARY KEY,
-                value TEXT,
-                updated_at TEXT
-            )
-        ''')
-        conn.commit()
-        
-        # Tabela para respostas automáticas por palavras-chave
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS keyword_responses (
-                id TEXT PRIMARY KEY,
-                keywords TEXT NOT NULL,
-                response TEXT NOT NULL,
-                is_active INTEGER DEFAULT 1,
-                priority INTEGER DEFAULT 0,
-                match_type TEXT DEFAULT 'contains',
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
-        conn.commit()
-        
-        # Tabela para estatísticas do WhatsApp/ChatBot
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS whatsapp_stats (
-                id TEXT PRIMARY KEY DEFAULT 'main',
-                messages_received INTEGER DEFAULT 0,
-                messages_sent INTEGER DEFAULT 0,
-                updated_at TEXT
-            )
-        ''')
-        conn.commit()
-        
-        # Tabela para clientes atendidos pelo WhatsApp
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS whatsapp_clients (
-                phone TEXT PRIMARY KEY,
-                name TEXT,
-                first_contact TEXT,
-                last_contact TEXT,
-                messages_count INTEGER DEFAULT 0
-            )
-        ''')
-        conn.commit()
-        
-        # Tabela para templates de notificações de status de pedidos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_status_templates (
-                id TEXT PRIMARY KEY,
-                tipo_entrega TEXT NOT NULL,
-                status TEXT NOT NULL,
-                template TEXT NOT NULL,
-                is_active INTEGER DEFAULT 1,
-                delay_seconds INTEGER DEFAULT 0,
-                created_at TEXT,
-                updated_at TEXT,
-                UNIQUE(tipo_entrega, status)
-            )
-        ''')
-        conn.commit()
-        
-        # Inicializar registro de estatísticas se não existir
-        cursor.execute("SELECT COUNT(*) FROM whatsapp_stats WHERE id = 'main'")
-        if cursor.fetchone()[0] == 0:
-            now = datetime.now(timezone.utc).isoformat()
-            cursor.execute("INSERT INTO whatsapp_stats (id, messages_received, messages_sent, updated_at) VALUES ('main', 0, 0, ?)", (now,))
-            conn.commit()
-        
-        # Verificar se precisa adicionar novas colunas (migração)
+            pass
+        return {
+            "version": get_schema_version(conn),
+            "latest": SCHEMA_VERSION,
+            "applied_this_start": list(_migration_report),
+            "history": history
+        }
+
+
+# ==================== HEALTH CHECK ====================
+# Conexão própria para o /health/ready: não usa a conexão compartilhada nem
+# o db_lock, então o polling do Electron nunca espera atrás de uma escrita.
+_health_connection = None
+_health_lock = threading.Lock()
+
+
+def check_database_ready() -> bool:
+    """Banco inicializado e respondendo a SELECT 1"""
+    global _health_connection
+    if not _initialized or DB_PATH is None:
+        return False
+    with _health_lock:
         try:
-            cursor.execute("SELECT has_second_period FROM business_hours LIMIT 1")
-        except sqlite3.OperationalError:
-            cursor.execute("ALTER TABLE business_hours ADD COLUMN has_second_period INTEGER DEFAULT 0")
-            cursor.execute("ALTER TABLE business_hours ADD COLUMN opening_time_2 TEXT DEFAULT '18:00'")
-            cursor.execute("ALTER TABLE business_hours ADD COLUMN closing_time_2 TEXT DEFAULT '23:59'")
-            conn.commit()
-            print("[DATABASE] Colunas de segundo período adicionadas em business_hours")
-        
-        # Migração: adicionar coluna type em word_analytics se não existir
+            if _health_connection is None:
+                _health_connection = sqlite3.connect(str(DB_PATH), check_same_thread=False, timeout=2.0)
+            return _health_connection.execute("SELECT 1").fetchone()[0] == 1
+        except sqlite3.Error:
+            if _health_connection is not None:
+                try:
+                    _health_connection.close()
+                except sqlite3.Error:
+                    pass
+            _health_connection = None
+            return False
+
+
+# ==================== SNAPSHOT DE LEITURA ====================
+def read_snapshot(loaders: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Executa várias funções de leitura deste módulo (nome -> função sem
+    argumentos) em uma única transação de leitura, sob uma única aquisição
+    do db_lock: todas veem o mesmo estado do banco, mesmo com outro worker
+    escrevendo (WAL). As funções devem ser apenas de leitura.
+    """
+    with db_lock:
+        conn = get_connection()
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")
         try:
-            cursor.execute("SELECT type FROM word_analytics LIMIT 1")
-        except sqlite3.OperationalError:
-            cursor.execute("ALTER TABLE word_analytics ADD COLUMN type TEXT DEFAULT 'word'")
-            conn.commit()
-            print("[DATABASE] Coluna 'type' adicionada em word_analytics")
-        
-        # Inicializar horários padrão se tabela vazia
-        cursor.execute("SELECT COUNT(*) FROM business_hours")
-        if cursor.fetchone()[0] == 0:
-            days = [
-                (0, "Segunda-feira"),
-                (1, "Terça-feira"),
-                (2, "Quarta-feira"),
-                (3, "Quinta-feira"),
-                (4, "Sexta-feira"),
-                (5, "Sábado"),
-                (6, "Domingo")
-            ]
-            now = datetime.now(timezone.utc).isoformat()
-            for day_num, day_name in days:
-                # Domingo fechado por padrão
-                is_open = 0 if day_num == 6 else 1
-                cursor.execute('''
-                    INSERT INTO business_hours (id, day_of_week, day_name, is_open, opening_time, closing_time, has_second_period, opening_time_2, closing_time_2, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (str(uuid.uuid4()), day_num, day_name, is_open, '08:00', '22:00', 0, '18:00', '23:59', now))
-            conn.commit()
-            print("[DATABASE] Horários de funcionamento padrão criados")
-        
-        # Inicializar templates de notificações de status de pedidos se tabela vazia
-        cursor.execute("SELECT COUNT(*) FROM order_status_templates")
-        if cursor.fetchone()[0] == 0:
-            now = datetime.now(timezone.utc).isoformat()
-            # Templates para ENTREGA (delivery)
-            delivery_templates = [
-                ('delivery', 'aguardando_aceite', 'Pedido Criado #{codigo}', 1, 35),
-                ('delivery', 'producao', 'Pedido #{codigo} Aceito, ja esta em produção', 1, 42),
-                ('delivery', 'pronto', 'Pedido #{codigo} Pronto, estamos aguardando entregador', 1, 0),
-                ('delivery', 'na_bag', 'Pedido #{codigo} Na Bag do entregador, em breve entra em rota de entrega', 1, 0),
-                ('delivery', 'em_rota', 'Pedido #{codigo} Esta em rota de entrega, confira no link www.rastreio.com.br', 1, 0),
-                ('delivery', 'entregue', 'Pedido #{codigo} Entregue', 1, 0),
-                ('delivery', 'concluido', 'Pedido #{codigo} Entregue', 1, 0),
-                ('delivery', 'cancelado', 'Pedido #{codigo} foi Cancelado\n\nMotivo: {motivo}', 1, 0),
-            ]
-            # Templates para RETIRADA (pickup)
-            pickup_templates = [
-                ('pickup', 'aguardando_aceite', 'Pedido Criado #{codigo}', 1, 35),
-                ('pickup', 'producao', 'Pedido #{codigo} Aceito, ja esta em produção', 1, 42),
-                ('pickup', 'pronto', 'Pedido #{codigo} Pronto, pode retirar\n\n📍 {endereco}', 1, 0),
-                ('pickup', 'retirado', 'Pedido #{codigo} Retirado com sucesso', 1, 0),
-                ('pickup', 'concluido', 'Pedido #{codigo} Retirado com sucesso', 1, 0),
-                ('pickup', 'cancelado', 'Pedido #{codigo} foi Cancelado\n\nMotivo: {motivo}', 1, 0),
-            ]
-            for t in delivery_templates + pickup_templates:
-                cursor.execute('''
-                    INSERT INTO order_status_templates (id, tipo_entrega, status, template, is_active, delay_seconds, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (str(uuid.uuid4()), t[0], t[1], t[2], t[3], t[4], now, now))
-            conn.commit()
-            print("[DATABASE] Templates de notificações de status de pedidos criados")
-        
-        _initialized = True
-        print(f"[DATABASE] Inicializado em: {DB_PATH}")
+            return {name: loader() for name, loader in loaders.items()}
+        finally:
+            if own_transaction and conn.in_transaction:
+                conn.commit()
+
+
+# ==================== PROJEÇÃO DE COLUNAS ====================
+# Colunas por tabela (o esquema só muda nas migrações do startup)
+_table_columns_cache: Dict[str, List[str]] = {}
+
+
+def get_table_columns(table: str) -> List[str]:
+    columns = _table_columns_cache.get(table)
+    if columns is None:
+        with db_lock:
+            conn = get_connection()
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        _table_columns_cache[table] = columns
+    return columns
+
+
+def _select_list(table: str, columns: Optional[List[str]], required: tuple = ("id",)) -> str:
+    """
+    Lista do SELECT para uma projeção (?fields=). None = todas as colunas.
+    Nomes que não são colunas da tabela são ignorados (nunca entram no SQL).
+    """
+    if not columns:
+        return "*"
+    available = set(get_table_columns(table))
+    selected = [c for c in dict.fromkeys([*required, *columns]) if c in available]
+    return ", ".join(f'"{c}"' for c in selected)
 
 
 # ==================== SYSTEM SETTINGS ====================
@@ -1138,26 +1368,35 @@ def count_ingredients() -> int:
 
 
 # ==================== PRODUCTS ====================
-def get_all_products() -> List[Dict]:
+def get_all_products(raw_json: bool = False, columns: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Retorna todos os produtos.
+    Com raw_json=True, recipe e order_steps ficam como RawJSON (sem decode).
+    Com columns, só essas colunas são lidas (as JSON não são nem carregadas).
+    """
     with db_lock:
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM products ORDER BY name")
+        cursor.execute(f"SELECT {_select_list('products', columns)} FROM products ORDER BY name")
         
         products = []
         for row in cursor.fetchall():
             p = dict(row)
-            try:
-                p['recipe'] = json.loads(p['recipe']) if p['recipe'] else []
-            except (json.JSONDecodeError, TypeError):
-                p['recipe'] = []
-            try:
-                p['order_steps'] = json.loads(p['order_steps']) if p['order_steps'] else []
-            except (json.JSONDecodeError, TypeError):
-                p['order_steps'] = []
-            p['is_insumo'] = bool(p['is_insumo'])
-            p['is_divisible'] = bool(p['is_divisible'])
-            p['available'] = bool(p.get('available', 1))
+            for key in ('is_insumo', 'is_divisible'):
+                if key in p:
+                    p[key] = bool(p[key])
+            if 'available' in p:
+                p['available'] = bool(p['available'])
+            for key in ('recipe', 'order_steps'):
+                if key not in p:
+                    continue
+                if raw_json:
+                    p[key] = RawJSON(p[key])
+                    continue
+                try:
+                    p[key] = json.loads(p[key]) if p[key] else []
+                except (json.JSONDecodeError, TypeError):
+                    p[key] = []
             products.append(p)
         
         return products
@@ -1217,9 +1456,9 @@ def create_product(data: Dict) -> Dict:
               data.get('product_type', 'produto'), data.get('sale_price'), data.get('simple_price'),
               data.get('combo_description'), data.get('simple_description'),
               data.get('simple_photo_url'), data.get('combo_photo_url'), data.get('photo_url'),
-              json.dumps(data.get('recipe', [])), data.get('cmv', 0), data.get('profit_margin'),
+              _json_list(data.get('recipe', [])), data.get('cmv', 0), data.get('profit_margin'),
               1 if data.get('is_insumo') else 0, 1 if data.get('is_divisible') else 0,
-              json.dumps(data.get('order_steps', [])), created_at))
+              _json_list(data.get('order_steps', [])), created_at))
         conn.commit()
         
         return get_product_by_id(prod_id)
@@ -1250,12 +1489,12 @@ def update_product(product_id: str, data: Dict) -> Optional[Dict]:
               data.get('simple_photo_url', current.get('simple_photo_url')),
               data.get('combo_photo_url', current.get('combo_photo_url')),
               data.get('photo_url', current.get('photo_url')),
-              json.dumps(data.get('recipe', current.get('recipe', []))), data.get('cmv', current.get('cmv', 0)),
+              _json_list(data.get('recipe', current.get('recipe', []))), data.get('cmv', current.get('cmv', 0)),
               data.get('profit_margin', current.get('profit_margin')),
               1 if data.get('is_insumo', current.get('is_insumo')) else 0,
               1 if data.get('is_divisible', current.get('is_divisible')) else 0,
               1 if data.get('available', current.get('available', True)) else 0,
-              json.dumps(data.get('order_steps', current.get('order_steps', []))),
+              _json_list(data.get('order_steps', current.get('order_steps', []))),
               data.get('linked_ingredient_id', current.get('linked_ingredient_id')),
               data.get('recipe_yield', current.get('recipe_yield')),
               data.get('recipe_yield_unit', current.get('recipe_yield_unit')),
@@ -1687,41 +1926,13 @@ def get_expenses_by_month(year: int, month: int) -> List[Dict]:
         return [dict(row) for row in cursor.fetchall()]
 
 
-def get_expenses_stats() -> Dict:
-    with db_lock:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Total de despesas
-        cursor.execute("SELECT COUNT(*) FROM expenses")
-        total = cursor.fetchone()[0]
-        
-        # Total pendente
-        cursor.execute("SELECT COUNT(*), COALESCE(SUM(value), 0) FROM expenses WHERE is_paid = 0")
-        row = cursor.fetchone()
-        pending_count, pending_value = row[0], row[1]
-        
-        # Total pago
-        cursor.execute("SELECT COUNT(*), COALESCE(SUM(value), 0) FROM expenses WHERE is_paid = 1")
-        row = cursor.fetchone()
-        paid_count, paid_value = row[0], row[1]
-        
-        return {
-            "total": total,
-            "pending_count": pending_count,
-            "pending_value": pending_value,
-            "paid_count": paid_count,
-            "paid_value": paid_value
-        }
-
-
 # ==================== CLIENTES ====================
-def get_all_clientes() -> List[Dict]:
-    """Retorna todos os clientes"""
+def get_all_clientes(columns: Optional[List[str]] = None) -> List[Dict]:
+    """Retorna todos os clientes (com columns, apenas essas colunas)"""
     with db_lock:
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM clientes ORDER BY nome")
+        cursor.execute(f"SELECT {_select_list('clientes', columns)} FROM clientes ORDER BY nome")
         columns = [desc[0] for desc in cursor.description]
         return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
@@ -1937,7 +2148,7 @@ def add_pontos_clube(cliente_id: str, valor_pedido: float, pontos_por_real: floa
 
 
 def recalculate_all_cliente_stats() -> int:
-    """Recalcula estatísticas de todos os clientes baseado nos pedidos reais"""
+    """Recalcula estatísticas de todos os clientes baseado nos pedidos reais (sem cancelados)"""
     with db_lock:
         conn = get_connection()
         cursor = conn.cursor()
@@ -1952,18 +2163,18 @@ def recalculate_all_cliente_stats() -> int:
         updated_count = 0
         for (cliente_id,) in clientes:
             # Contar pedidos totais
-            cursor.execute("SELECT COUNT(*), COALESCE(SUM(total), 0) FROM pedidos WHERE cliente_id = ?", (cliente_id,))
+            cursor.execute("SELECT COUNT(*), COALESCE(SUM(total), 0) FROM pedidos WHERE cliente_id = ? AND status != 'cancelado'", (cliente_id,))
             total_row = cursor.fetchone()
             pedidos_count = total_row[0] or 0
             total_gasto = total_row[1] or 0
             
             # Último pedido
-            cursor.execute("SELECT created_at FROM pedidos WHERE cliente_id = ? ORDER BY created_at DESC LIMIT 1", (cliente_id,))
+            cursor.execute("SELECT created_at FROM pedidos WHERE cliente_id = ? AND status != 'cancelado' ORDER BY created_at DESC LIMIT 1", (cliente_id,))
             last_order_row = cursor.fetchone()
             last_order_date = last_order_row[0] if last_order_row else None
             
             # Pedidos nos últimos 30 dias
-            cursor.execute("SELECT COUNT(*) FROM pedidos WHERE cliente_id = ? AND created_at >= ?", (cliente_id, thirty_days_ago))
+            cursor.execute("SELECT COUNT(*) FROM pedidos WHERE cliente_id = ? AND status != 'cancelado' AND created_at >= ?", (cliente_id, thirty_days_ago))
             orders_last_30 = cursor.fetchone()[0] or 0
             
             # Atualizar cliente
@@ -2084,22 +2295,30 @@ def delete_client_address(address_id: str) -> bool:
 
 
 # ==================== PEDIDOS ====================
-def get_all_pedidos() -> List[Dict]:
-    """Retorna todos os pedidos ordenados por data (mais recente primeiro)"""
+def get_all_pedidos(raw_json: bool = False, columns: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Retorna todos os pedidos ordenados por data (mais recente primeiro).
+    Com raw_json=True, items fica como RawJSON (sem decode).
+    Com columns, só essas colunas são lidas (ex: sem items).
+    """
     with db_lock:
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM pedidos ORDER BY created_at DESC")
+        cursor.execute(f"SELECT {_select_list('pedidos', columns)} FROM pedidos ORDER BY created_at DESC")
         pedidos = []
         for row in cursor.fetchall():
             p = dict(row)
-            # Converter items de JSON string para lista
-            if p.get('items'):
-                try:
-                    p['items'] = json.loads(p['items'])
-                except:
-                    p['items'] = []
-            p['troco_precisa'] = bool(p.get('troco_precisa', 0))
+            if 'items' in p:
+                if raw_json:
+                    p['items'] = RawJSON(p.get('items'))
+                # Converter items de JSON string para lista
+                elif p.get('items'):
+                    try:
+                        p['items'] = json.loads(p['items'])
+                    except:
+                        p['items'] = []
+            if 'troco_precisa' in p:
+                p['troco_precisa'] = bool(p.get('troco_precisa', 0))
             pedidos.append(p)
         return pedidos
 
@@ -2123,6 +2342,19 @@ def get_pedido_by_id(pedido_id: str) -> Optional[Dict]:
         return None
 
 
+def get_pedido_status(pedido_id: str) -> Optional[Dict]:
+    """Retorna apenas os campos de status de um pedido (sem decodificar items)"""
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id, status, updated_at, entregador_nome, motivo_cancelamento FROM pedidos WHERE id = ?",
+            (pedido_id,)
+        )
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+
 def get_pedido_by_codigo(codigo: str) -> Optional[Dict]:
     """Retorna um pedido pelo código"""
     with db_lock:
@@ -2170,7 +2402,7 @@ def create_pedido(data: Dict) -> Dict:
         created_at = datetime.now(timezone.utc).isoformat()
         
         # Converter items para JSON string
-        items_json = json.dumps(data.get('items', []))
+        items_json = _json_list(data.get('items', []))
         
         cursor.execute('''
             INSERT INTO pedidos (
@@ -2206,6 +2438,7 @@ def create_pedido(data: Dict) -> Dict:
             created_at,
             created_at
         ))
+        _rollup_pedido(cursor, pedido_id, 1)
         conn.commit()
         
         return get_pedido_by_id(pedido_id)
@@ -2227,10 +2460,12 @@ def update_pedido(pedido_id: str, data: Dict) -> Optional[Dict]:
         status = data.get('status', current.get('status'))
         observacao = data.get('observacao', current.get('observacao'))
         
-        cursor.execute('''
-            UPDATE pedidos SET status = ?, observacao = ?, updated_at = ?
-            WHERE id = ?
-        ''', (status, observacao, updated_at, pedido_id))
+        with _rollup_status_change(cursor, pedido_id, status):
+            cursor.execute('''
+                UPDATE pedidos SET status = ?, observacao = ?, updated_at = ?
+                WHERE id = ?
+            ''', (status, observacao, updated_at, pedido_id))
+        _stamp_delivery_time(cursor, pedido_id, status, updated_at)
         conn.commit()
         
         return get_pedido_by_id(pedido_id)
@@ -2244,10 +2479,12 @@ def update_pedido_status(pedido_id: str, status: str) -> Optional[Dict]:
         
         updated_at = datetime.now(timezone.utc).isoformat()
         
-        cursor.execute('''
-            UPDATE pedidos SET status = ?, updated_at = ?
-            WHERE id = ?
-        ''', (status, updated_at, pedido_id))
+        with _rollup_status_change(cursor, pedido_id, status):
+            cursor.execute('''
+                UPDATE pedidos SET status = ?, updated_at = ?
+                WHERE id = ?
+            ''', (status, updated_at, pedido_id))
+        _stamp_delivery_time(cursor, pedido_id, status, updated_at)
         conn.commit()
         
         return get_pedido_by_id(pedido_id)
@@ -2258,6 +2495,7 @@ def delete_pedido(pedido_id: str) -> bool:
     with db_lock:
         conn = get_connection()
         cursor = conn.cursor()
+        _rollup_pedido(cursor, pedido_id, -1)
         cursor.execute("DELETE FROM pedidos WHERE id = ?", (pedido_id,))
         conn.commit()
         return cursor.rowcount > 0
@@ -2269,10 +2507,11 @@ def cancel_pedido(pedido_id: str, motivo: str) -> Optional[Dict]:
         conn = get_connection()
         cursor = conn.cursor()
         now = datetime.now(timezone.utc).isoformat()
-        cursor.execute('''
-            UPDATE pedidos SET status = 'cancelado', motivo_cancelamento = ?, updated_at = ?
-            WHERE id = ?
-        ''', (motivo, now, pedido_id))
+        with _rollup_status_change(cursor, pedido_id, 'cancelado'):
+            cursor.execute('''
+                UPDATE pedidos SET status = 'cancelado', motivo_cancelamento = ?, updated_at = ?
+                WHERE id = ?
+            ''', (motivo, now, pedido_id))
         conn.commit()
         return get_pedido_by_id(pedido_id)
 
@@ -2286,7 +2525,7 @@ def count_pedidos() -> int:
         return cursor.fetchone()[0]
 
 
-def get_pedidos_by_cliente(cliente_id: str) -> List[Dict]:
+def get_pedidos_by_cliente(cliente_id: str, raw_json: bool = False) -> List[Dict]:
     """Retorna todos os pedidos de um cliente"""
     with db_lock:
         conn = get_connection()
@@ -2295,7 +2534,9 @@ def get_pedidos_by_cliente(cliente_id: str) -> List[Dict]:
         pedidos = []
         for row in cursor.fetchall():
             p = dict(row)
-            if p.get('items'):
+            if raw_json:
+                p['items'] = RawJSON(p.get('items'))
+            elif p.get('items'):
                 try:
                     p['items'] = json.loads(p['items'])
                 except:
@@ -2338,6 +2579,314 @@ def update_pedido_entregador(pedido_id: str, entregador_id: str, entregador_nome
         return get_pedido_by_id(pedido_id)
 
 
+# ==================== RELATÓRIOS DE VENDAS ====================
+# Agregações calculadas no SQLite (índice idx_pedidos_created_at) em vez de
+# enviar todos os pedidos para o navegador. created_at é gravado em UTC; os
+# agrupamentos por dia/hora/dia da semana usam o horário local da loja.
+REPORT_UTC_OFFSET_MINUTES = int(float(os.environ.get("NUCLEO_REPORT_UTC_OFFSET_HOURS", "-3")) * 60)
+
+# Agrupamentos por pedido: expressão da chave (sobre a tabela pedidos)
+_SALES_ORDER_GROUPS = {
+    "day": "strftime('%Y-%m-%d', created_at, :tz)",
+    "hour": "CAST(strftime('%H', created_at, :tz) AS INTEGER)",
+    "weekday": "CAST(strftime('%w', created_at, :tz) AS INTEGER)",
+    "bairro": "COALESCE(NULLIF(TRIM(endereco_bairro), ''), 'Sem bairro')",
+    "payment": "COALESCE(NULLIF(TRIM(forma_pagamento), ''), 'nao_informado')",
+    "modulo": "COALESCE(NULLIF(TRIM(modulo), ''), 'Cardapio')",
+}
+# Agrupamentos por item (json_each sobre pedidos.items)
+_SALES_ITEM_GROUPS = {
+    "product": "COALESCE(json_extract(item.value, '$.id'), json_extract(item.value, '$.nome'))",
+    "category": "COALESCE(NULLIF(TRIM(prod.category), ''), 'Sem categoria')",
+}
+SALES_GROUPS = tuple(_SALES_ORDER_GROUPS) + tuple(_SALES_ITEM_GROUPS)
+
+
+def _sales_filter(include_canceled: bool) -> str:
+    where = "p.created_at >= :start AND p.created_at < :end"
+    if not include_canceled:
+        where += " AND p.status != 'cancelado'"
+    return where
+
+
+def _sales_summary(count, revenue, delivery_fees, canceled) -> Dict:
+    return {
+        "pedidos": count,
+        "faturamento": round(revenue, 2),
+        "ticket_medio": round(revenue / count, 2) if count else 0,
+        "taxa_entrega": round(delivery_fees, 2),
+        "cancelados": canceled,
+    }
+
+
+def _order_row(key, count, revenue, delivery_fees) -> Dict:
+    return {"key": key, "label": str(key), "pedidos": count, "faturamento": round(revenue, 2),
+            "ticket_medio": round(revenue / count, 2) if count else 0,
+            "taxa_entrega": round(delivery_fees, 2)}
+
+
+def _quantity(value) -> float:
+    """Mesma representação nos dois caminhos (o rollup guarda REAL, a varredura soma inteiros)"""
+    value = round(float(value or 0), 3)
+    return int(value) if value.is_integer() else value
+
+
+def _item_row(key, label, count, quantity, revenue) -> Dict:
+    """Linha por produto/categoria; count=None omite "pedidos" (categoria)"""
+    row = {"key": key, "label": label or str(key), "pedidos": count,
+           "quantidade": _quantity(quantity), "faturamento": round(revenue, 2)}
+    if count is None:
+        del row["pedidos"]
+    return row
+
+
+def _sales_report_from_pedidos(cursor, params: Dict, group_by: str, include_canceled: bool) -> Dict:
+    """Agrega direto na tabela pedidos (custo proporcional ao número de pedidos do período)"""
+    where = _sales_filter(include_canceled)
+    cursor.execute(f'''
+        SELECT COUNT(*), COALESCE(SUM(p.total), 0), COALESCE(SUM(p.valor_entrega), 0),
+               (SELECT COUNT(*) FROM pedidos c
+                 WHERE c.created_at >= :start AND c.created_at < :end AND c.status = 'cancelado')
+        FROM pedidos p
+        WHERE {where}
+    ''', params)
+    summary = _sales_summary(*cursor.fetchone())
+
+    if group_by in _SALES_ORDER_GROUPS:
+        key_expr = _SALES_ORDER_GROUPS[group_by].replace("created_at", "p.created_at")
+        cursor.execute(f'''
+            SELECT {key_expr} AS bucket, COUNT(*), COALESCE(SUM(p.total), 0), COALESCE(SUM(p.valor_entrega), 0)
+            FROM pedidos p
+            WHERE {where}
+            GROUP BY bucket
+            ORDER BY bucket
+        ''', params)
+        rows = [_order_row(*row) for row in cursor.fetchall()]
+    else:
+        key_expr = _SALES_ITEM_GROUPS[group_by]
+        join = "LEFT JOIN products prod ON prod.id = json_extract(item.value, '$.id')" if group_by == "category" else ""
+        label_expr = "MAX(json_extract(item.value, '$.nome'))" if group_by == "product" else key_expr
+        # Pedidos distintos só por produto: por categoria o rollup por hora não
+        # tem como deduplicar pedidos com vários produtos da mesma categoria
+        count_expr = "COUNT(DISTINCT p.id)" if group_by == "product" else "NULL"
+        cursor.execute(f'''
+            SELECT {key_expr} AS bucket, {label_expr},
+                   {count_expr},
+                   COALESCE(SUM(COALESCE(json_extract(item.value, '$.quantidade'), 1)), 0),
+                   COALESCE(SUM(COALESCE(json_extract(item.value, '$.quantidade'), 1)
+                                * COALESCE(json_extract(item.value, '$.preco'), 0)), 0)
+            FROM pedidos p, json_each(CASE WHEN json_valid(p.items) THEN p.items ELSE '[]' END) AS item
+            {join}
+            WHERE {where} AND {_SALES_ITEM_GROUPS["product"]} IS NOT NULL
+            GROUP BY bucket
+            ORDER BY 5 DESC
+        ''', params)
+        rows = [_item_row(*row) for row in cursor.fetchall()]
+
+    return {"summary": summary, "rows": rows, "source": "pedidos"}
+
+
+def _sales_report_from_rollups(cursor, params: Dict, group_by: str) -> Dict:
+    """Agrega os totais por hora (custo proporcional ao número de horas do período)"""
+    where = "hour >= :start_hour AND hour < :end_hour"
+    cursor.execute(f'''
+        SELECT COALESCE(SUM(pedidos), 0), COALESCE(SUM(faturamento), 0),
+               COALESCE(SUM(taxa_entrega), 0), COALESCE(SUM(cancelados), 0)
+        FROM sales_hourly_bairro
+        WHERE {where}
+    ''', params)
+    summary = _sales_summary(*cursor.fetchone())
+
+    if group_by in _ROLLUP_ORDER_GROUPS:
+        table, key_expr = _ROLLUP_ORDER_GROUPS[group_by]
+        cursor.execute(f'''
+            SELECT {key_expr} AS bucket, SUM(pedidos), SUM(faturamento), SUM(taxa_entrega)
+            FROM {table}
+            WHERE {where}
+            GROUP BY bucket
+            HAVING SUM(pedidos) > 0
+            ORDER BY bucket
+        ''', params)
+        rows = [_order_row(*row) for row in cursor.fetchall()]
+    elif group_by == "product":
+        cursor.execute(f'''
+            SELECT product_key, MAX(nome), SUM(pedidos), SUM(quantidade), SUM(faturamento)
+            FROM sales_hourly_product
+            WHERE {where}
+            GROUP BY product_key
+            HAVING SUM(pedidos) > 0
+            ORDER BY 5 DESC
+        ''', params)
+        rows = [_item_row(*row) for row in cursor.fetchall()]
+    else:
+        # Categoria = soma dos produtos; sem "pedidos" (igual à varredura)
+        cursor.execute(f'''
+            SELECT COALESCE(NULLIF(TRIM(prod.category), ''), 'Sem categoria') AS bucket, NULL,
+                   NULL, SUM(r.quantidade), SUM(r.faturamento)
+            FROM sales_hourly_product r
+            LEFT JOIN products prod ON prod.id = r.product_key
+            WHERE r.hour >= :start_hour AND r.hour < :end_hour
+            GROUP BY bucket
+            HAVING SUM(r.pedidos) > 0
+            ORDER BY 5 DESC
+        ''', params)
+        rows = [_item_row(*row) for row in cursor.fetchall()]
+
+    return {"summary": summary, "rows": rows, "source": "rollup"}
+
+
+def _whole_hour(timestamp: str) -> bool:
+    return timestamp[13:19] in (":00:00", ":00")
+
+
+def get_sales_report(start_utc: str, end_utc: str, group_by: str, include_canceled: bool = False,
+                     tz_offset_minutes: int = REPORT_UTC_OFFSET_MINUTES) -> Dict:
+    """
+    Vendas no intervalo [start_utc, end_utc) agrupadas por `group_by`
+    (SALES_GROUPS). Retorna o resumo do período e as linhas agregadas
+    (key, label, pedidos, faturamento, ...), sem os pedidos em si.
+
+    Usa os rollups por hora sempre que possível (limites em hora cheia,
+    fuso em horas inteiras, sem cancelados e agrupamento coberto); senão
+    agrega direto nos pedidos.
+    """
+    if group_by not in SALES_GROUPS:
+        raise ValueError(f"Agrupamento inválido: {group_by}")
+    params = {
+        "start": start_utc, "end": end_utc,
+        "start_hour": start_utc[:13], "end_hour": end_utc[:13],
+        "tz": f"{tz_offset_minutes:+d} minutes",
+    }
+    use_rollups = (
+        not include_canceled
+        and group_by in SALES_ROLLUP_GROUPS
+        and tz_offset_minutes % 60 == 0
+        and _whole_hour(start_utc) and _whole_hour(end_utc)
+    )
+
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        if use_rollups:
+            return _sales_report_from_rollups(cursor, params, group_by)
+        return _sales_report_from_pedidos(cursor, params, group_by, include_canceled)
+
+
+# ==================== ROLLUPS DE VENDAS ====================
+# Totais por hora UTC ('YYYY-MM-DDTHH') mantidos na mesma transação que grava
+# o pedido: criação soma, exclusão subtrai e a troca de/para 'cancelado' move o
+# pedido entre vendas e cancelados. O relatório de vendas lê só estas tabelas,
+# então o custo não cresce com o volume de pedidos. `rebuild_sales_rollups()`
+# (job reconstruir_rollups_vendas) recalcula tudo a partir dos pedidos.
+SALES_ROLLUP_TABLES = ("sales_hourly_product", "sales_hourly_bairro", "sales_hourly_payment")
+
+_ROLLUP_ORDER_GROUPS = {
+    "day": ("sales_hourly_bairro", "strftime('%Y-%m-%d', hour || ':00:00', :tz)"),
+    "hour": ("sales_hourly_bairro", "CAST(strftime('%H', hour || ':00:00', :tz) AS INTEGER)"),
+    "weekday": ("sales_hourly_bairro", "CAST(strftime('%w', hour || ':00:00', :tz) AS INTEGER)"),
+    "bairro": ("sales_hourly_bairro", "bairro"),
+    "payment": ("sales_hourly_payment", "forma_pagamento"),
+}
+SALES_ROLLUP_GROUPS = tuple(_ROLLUP_ORDER_GROUPS) + ("product", "category")
+
+_ROLLUP_HOUR = "substr(p.created_at, 1, 13)"
+_ROLLUP_STATEMENTS = (
+    f'''
+    INSERT INTO sales_hourly_bairro (hour, bairro, pedidos, faturamento, taxa_entrega, cancelados)
+    SELECT {_ROLLUP_HOUR}, {_SALES_ORDER_GROUPS["bairro"]},
+           :sign * SUM(CASE WHEN p.status != 'cancelado' THEN 1 ELSE 0 END),
+           :sign * COALESCE(SUM(CASE WHEN p.status != 'cancelado' THEN p.total END), 0),
+           :sign * COALESCE(SUM(CASE WHEN p.status != 'cancelado' THEN p.valor_entrega END), 0),
+           :sign * SUM(CASE WHEN p.status = 'cancelado' THEN 1 ELSE 0 END)
+    FROM pedidos p
+    WHERE {{where}} AND p.created_at IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT(hour, bairro) DO UPDATE SET
+        pedidos = pedidos + excluded.pedidos,
+        faturamento = faturamento + excluded.faturamento,
+        taxa_entrega = taxa_entrega + excluded.taxa_entrega,
+        cancelados = cancelados + excluded.cancelados
+    ''',
+    f'''
+    INSERT INTO sales_hourly_payment (hour, forma_pagamento, pedidos, faturamento, taxa_entrega)
+    SELECT {_ROLLUP_HOUR}, {_SALES_ORDER_GROUPS["payment"]},
+           :sign * COUNT(*), :sign * COALESCE(SUM(p.total), 0), :sign * COALESCE(SUM(p.valor_entrega), 0)
+    FROM pedidos p
+    WHERE {{where}} AND p.created_at IS NOT NULL AND p.status != 'cancelado'
+    GROUP BY 1, 2
+    ON CONFLICT(hour, forma_pagamento) DO UPDATE SET
+        pedidos = pedidos + excluded.pedidos,
+        faturamento = faturamento + excluded.faturamento,
+        taxa_entrega = taxa_entrega + excluded.taxa_entrega
+    ''',
+    f'''
+    INSERT INTO sales_hourly_product (hour, product_key, nome, pedidos, quantidade, faturamento)
+    SELECT {_ROLLUP_HOUR}, {_SALES_ITEM_GROUPS["product"]}, MAX(json_extract(item.value, '$.nome')),
+           :sign * COUNT(DISTINCT p.id),
+           :sign * COALESCE(SUM(COALESCE(json_extract(item.value, '$.quantidade'), 1)), 0),
+           :sign * COALESCE(SUM(COALESCE(json_extract(item.value, '$.quantidade'), 1)
+                                * COALESCE(json_extract(item.value, '$.preco'), 0)), 0)
+    FROM pedidos p, json_each(CASE WHEN json_valid(p.items) THEN p.items ELSE '[]' END) AS item
+    WHERE {{where}} AND p.created_at IS NOT NULL AND p.status != 'cancelado'
+      AND {_SALES_ITEM_GROUPS["product"]} IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT(hour, product_key) DO UPDATE SET
+        nome = CASE WHEN nome IS NULL OR excluded.nome > nome THEN excluded.nome ELSE nome END,
+        pedidos = pedidos + excluded.pedidos,
+        quantidade = quantidade + excluded.quantidade,
+        faturamento = faturamento + excluded.faturamento
+    ''',
+)
+
+
+def _rollup_pedido(cursor, pedido_id: str, sign: int):
+    """Soma (sign=1) ou subtrai (sign=-1) um pedido dos rollups, no estado atual da linha"""
+    for statement in _ROLLUP_STATEMENTS:
+        cursor.execute(statement.format(where="p.id = :id"), {"id": pedido_id, "sign": sign})
+
+
+@contextmanager
+def _rollup_status_change(cursor, pedido_id: str, new_status: Optional[str]):
+    """
+    Envolve o UPDATE de status: se o pedido entra ou sai de 'cancelado',
+    retira dos rollups antes e soma de novo (já como cancelado/venda) depois.
+    """
+    cursor.execute("SELECT status FROM pedidos WHERE id = ?", (pedido_id,))
+    row = cursor.fetchone()
+    moved = row is not None and (row[0] == 'cancelado') != (new_status == 'cancelado')
+    if moved:
+        _rollup_pedido(cursor, pedido_id, -1)
+    yield
+    if moved:
+        _rollup_pedido(cursor, pedido_id, 1)
+
+
+def _rebuild_sales_rollups(cursor) -> Dict[str, int]:
+    for table in SALES_ROLLUP_TABLES:
+        cursor.execute(f"DELETE FROM {table}")
+    for statement in _ROLLUP_STATEMENTS:
+        cursor.execute(statement.format(where="1 = 1"), {"sign": 1})
+    counts = {}
+    for table in SALES_ROLLUP_TABLES:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = cursor.fetchone()[0]
+    return counts
+
+
+def rebuild_sales_rollups() -> Dict[str, int]:
+    """Recalcula os rollups de vendas a partir de todos os pedidos (backfill/correção)"""
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            counts = _rebuild_sales_rollups(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return counts
+
+
 # ==================== ENTREGADORES ====================
 def get_all_entregadores() -> List[Dict]:
     """Retorna todos os entregadores ativos"""
@@ -2429,6 +2978,149 @@ def get_pedidos_by_entregador(entregador_id: str) -> List[Dict]:
             pedidos.append(p)
         return pedidos
 
+# ==================== DESEMPENHO DOS ENTREGADORES ====================
+# Entregas = pedidos delivery concluídos/entregues do entregador, pela data do pedido
+# (índice idx_pedidos_entregador_created). A taxa usa o valor gravado no
+# pedido e, sem ele, o valor atual do bairro. O tempo de entrega vai de
+# despachado_em (em_rota) até entregue_em (concluido/entregue).
+DELIVERY_SHIFTS = (("madrugada", 0), ("manha", 6), ("tarde", 12), ("noite", 18))
+OPEN_DELIVERY_STATUSES = ("na_bag", "em_rota")
+_DELIVERY_TIME_COLUMNS = {"em_rota": "despachado_em", "concluido": "entregue_em", "entregue": "entregue_em"}
+
+_DELIVERY_FEE = "COALESCE(p.valor_entrega, b.valor_entrega, 0)"
+_DELIVERY_MINUTES = "(julianday(p.entregue_em) - julianday(p.despachado_em)) * 1440"
+_DELIVERY_FROM = "FROM pedidos p LEFT JOIN bairros b ON b.nome = p.endereco_bairro"
+_DELIVERY_WHERE = ("p.created_at >= :start AND p.created_at < :end "
+                   "AND p.status IN ('concluido', 'entregue') AND p.tipo_entrega = 'delivery'")
+_DRIVER_ORDER_COLUMNS = f'''
+    p.id, p.codigo, p.status, p.cliente_nome, p.cliente_telefone,
+    p.endereco_rua, p.endereco_numero, p.endereco_complemento, p.endereco_bairro,
+    p.total, {_DELIVERY_FEE} AS valor_entrega,
+    json_array_length(CASE WHEN json_valid(p.items) THEN p.items ELSE '[]' END) AS itens_count,
+    p.created_at, p.despachado_em, p.entregue_em,
+    ROUND({_DELIVERY_MINUTES}, 1) AS tempo_entrega_min
+'''
+
+
+def _stamp_delivery_time(cursor, pedido_id: str, status: Optional[str], now: str):
+    """Registra a saída para entrega e a conclusão (apenas a primeira vez)"""
+    column = _DELIVERY_TIME_COLUMNS.get(status)
+    if column:
+        cursor.execute(f"UPDATE pedidos SET {column} = COALESCE({column}, ?) WHERE id = ?", (now, pedido_id))
+
+
+def _shift_expr() -> str:
+    hour = "CAST(strftime('%H', p.created_at, :tz) AS INTEGER)"
+    whens = " ".join(f"WHEN {hour} >= {start} THEN '{name}'" for name, start in reversed(DELIVERY_SHIFTS))
+    return f"CASE {whens} END"
+
+
+def _delivery_totals(entregas, taxa, tempo_medio, com_tempo) -> Dict:
+    return {
+        "entregas": entregas,
+        "taxa_entrega": round(taxa or 0, 2),
+        "tempo_medio_min": round(tempo_medio, 1) if tempo_medio is not None else None,
+        "entregas_com_tempo": com_tempo,
+    }
+
+
+def _open_delivery_orders(cursor, entregador_id: str) -> List[Dict]:
+    placeholders = ", ".join("?" for _ in OPEN_DELIVERY_STATUSES)
+    cursor.execute(f'''
+        SELECT {_DRIVER_ORDER_COLUMNS} {_DELIVERY_FROM}
+        WHERE p.entregador_id = ? AND p.status IN ({placeholders})
+        ORDER BY p.created_at DESC
+    ''', (entregador_id, *OPEN_DELIVERY_STATUSES))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def get_pedidos_abertos_entregador(entregador_id: str) -> List[Dict]:
+    """Pedidos na_bag/em_rota do entregador (colunas da tela do entregador)"""
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        return _open_delivery_orders(cursor, entregador_id)
+
+
+def get_entregador_desempenho(entregador_id: str, start_utc: str, end_utc: str, limit: int = 50,
+                              offset: int = 0, tz_offset_minutes: int = REPORT_UTC_OFFSET_MINUTES) -> Dict:
+    """
+    Desempenho de um entregador no intervalo [start_utc, end_utc): totais,
+    entregas por dia e por turno (horário local), pedidos em aberto (na_bag/
+    em_rota, sem filtro de data) e a lista paginada das entregas.
+    """
+    params = {"entregador": entregador_id, "start": start_utc, "end": end_utc,
+              "tz": f"{tz_offset_minutes:+d} minutes", "limit": limit, "offset": offset}
+    where = f"p.entregador_id = :entregador AND {_DELIVERY_WHERE}"
+    aggregates = f'''COUNT(*), COALESCE(SUM({_DELIVERY_FEE}), 0), AVG({_DELIVERY_MINUTES}),
+                     COUNT({_DELIVERY_MINUTES})'''
+
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(f"SELECT {aggregates} {_DELIVERY_FROM} WHERE {where}", params)
+        resumo = _delivery_totals(*cursor.fetchone())
+
+        cursor.execute(f'''
+            SELECT strftime('%Y-%m-%d', p.created_at, :tz) AS dia, {aggregates}
+            {_DELIVERY_FROM} WHERE {where}
+            GROUP BY dia ORDER BY dia
+        ''', params)
+        por_dia = [{"dia": row[0], **_delivery_totals(*row[1:])} for row in cursor.fetchall()]
+
+        cursor.execute(f'''
+            SELECT {_shift_expr()} AS turno, {aggregates}
+            {_DELIVERY_FROM} WHERE {where}
+            GROUP BY turno
+        ''', params)
+        by_shift = {row[0]: _delivery_totals(*row[1:]) for row in cursor.fetchall()}
+        por_turno = [{"turno": name, **by_shift.get(name, _delivery_totals(0, 0, None, 0))}
+                     for name, _ in DELIVERY_SHIFTS]
+
+        abertos = _open_delivery_orders(cursor, entregador_id)
+
+        cursor.execute(f'''
+            SELECT {_DRIVER_ORDER_COLUMNS} {_DELIVERY_FROM} WHERE {where}
+            ORDER BY p.created_at DESC
+            LIMIT :limit OFFSET :offset
+        ''', params)
+        entregas = [dict(row) for row in cursor.fetchall()]
+
+        resumo["pedidos_abertos"] = len(abertos)
+        return {
+            "resumo": resumo,
+            "por_dia": por_dia,
+            "por_turno": por_turno,
+            "abertos": abertos,
+            "entregas": {"items": entregas, "total": resumo["entregas"], "limit": limit, "offset": offset},
+        }
+
+
+def get_entregas_por_entregador(start_utc: str, end_utc: str) -> List[Dict]:
+    """Totais de entregas de cada entregador ativo no intervalo [start_utc, end_utc)"""
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT e.id, e.nome, e.telefone,
+                   COALESCE(t.entregas, 0), COALESCE(t.taxa, 0), t.tempo_medio, COALESCE(t.com_tempo, 0)
+            FROM entregadores e
+            LEFT JOIN (
+                SELECT p.entregador_id, COUNT(*) AS entregas, SUM({_DELIVERY_FEE}) AS taxa,
+                       AVG({_DELIVERY_MINUTES}) AS tempo_medio, COUNT({_DELIVERY_MINUTES}) AS com_tempo
+                {_DELIVERY_FROM}
+                WHERE {_DELIVERY_WHERE}
+                GROUP BY p.entregador_id
+            ) t ON t.entregador_id = e.id
+            WHERE e.ativo = 1
+            ORDER BY 4 DESC, e.nome
+        ''', {"start": start_utc, "end": end_utc})
+        return [
+            {"id": row[0], "nome": row[1], "telefone": row[2], **_delivery_totals(*row[3:])}
+            for row in cursor.fetchall()
+        ]
+
 
 # ==================== FUNCIONÁRIOS ====================
 def get_all_funcionarios() -> List[Dict]:
@@ -3954,6 +4646,8 @@ def clear_sales_data() -> int:
         # Deletar
         cursor.execute("DELETE FROM pedido_items")
         cursor.execute("DELETE FROM pedidos")
+        for table in SALES_ROLLUP_TABLES:
+            cursor.execute(f"DELETE FROM {table}")
         
         conn.commit()
         return total
@@ -4027,5 +4721,186 @@ def clear_locations_data() -> int:
         return total
 
 
+# ==================== JOBS EM SEGUNDO PLANO ====================
+JOB_RUN_FIELDS = ['params', 'status', 'attempts', 'result', 'error',
+                  'started_at', 'finished_at', 'next_attempt_at']
+
+
+def _job_run_row_to_dict(row) -> Dict:
+    run = dict(row)
+    for field in ('params', 'result'):
+        if run.get(field):
+            try:
+                run[field] = json.loads(run[field])
+            except (json.JSONDecodeError, TypeError):
+                pass
+    return run
+
+
+def create_job_run(data: Dict) -> Optional[Dict]:
+    """
+    Registra uma execução de job. Se `slot` já existir (execução agendada já
+    registrada por outro worker), não insere e retorna None.
+    """
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO job_runs (id, job_name, params, status, trigger, slot, attempts, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, 0, ?)
+        ''', (
+            data['id'], data['job_name'],
+            json.dumps(data.get('params') or {}, ensure_ascii=False),
+            data.get('status', 'queued'), data.get('trigger', 'manual'),
+            data.get('slot'), data['created_at']
+        ))
+        conn.commit()
+        if cursor.rowcount == 0:
+            return None
+        cursor.execute("SELECT * FROM job_runs WHERE id = ?", (data['id'],))
+        row = cursor.fetchone()
+        return _job_run_row_to_dict(row) if row else None
+
+
+def update_job_run(run_id: str, data: Dict) -> bool:
+    """Atualiza campos de uma execução de job"""
+    updates = []
+    values = []
+    for field in JOB_RUN_FIELDS:
+        if field in data:
+            value = data[field]
+            if field in ('params', 'result') and value is not None:
+                value = json.dumps(value, ensure_ascii=False, default=str)
+            updates.append(f"{field} = ?")
+            values.append(value)
+    if not updates:
+        return False
+    values.append(run_id)
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"UPDATE job_runs SET {', '.join(updates)} WHERE id = ?", values)
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def get_job_run(run_id: str) -> Optional[Dict]:
+    """Busca uma execução de job pelo ID"""
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM job_runs WHERE id = ?", (run_id,))
+        row = cursor.fetchone()
+        return _job_run_row_to_dict(row) if row else None
+
+
+def get_job_runs(job_name: str = None, status: str = None, limit: int = 50) -> List[Dict]:
+    """Histórico de execuções (mais recentes primeiro)"""
+    query = "SELECT * FROM job_runs"
+    conditions = []
+    params = []
+    if job_name:
+        conditions.append("job_name = ?")
+        params.append(job_name)
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY created_at DESC LIMIT ?"
+    params.append(limit)
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return [_job_run_row_to_dict(row) for row in cursor.fetchall()]
+
+
+def get_last_job_runs() -> Dict[str, Dict]:
+    """Última execução de cada job"""
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM job_runs r
+            WHERE r.created_at = (SELECT MAX(created_at) FROM job_runs WHERE job_name = r.job_name)
+        ''')
+        return {row['job_name']: _job_run_row_to_dict(row) for row in cursor.fetchall()}
+
+
+def fail_interrupted_job_runs() -> int:
+    """Execuções que ficaram abertas quando o processo parou são marcadas como interrompidas"""
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE job_runs SET status = 'interrupted', finished_at = ?
+            WHERE status IN ('queued', 'running', 'retrying')
+        ''', (datetime.now(timezone.utc).isoformat(),))
+        conn.commit()
+        return cursor.rowcount
+
+
+def cleanup_job_runs(keep_days: int = 30) -> int:
+    """Remove o histórico de execuções mais antigo que keep_days"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=keep_days)).isoformat()
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM job_runs WHERE created_at < ? AND status NOT IN ('queued', 'running', 'retrying')",
+            (cutoff,)
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+# ==================== REFERÊNCIAS DE UPLOADS ====================
+UPLOAD_URL_PATTERN = re.compile(r"/uploads/(?:products|company)/[A-Za-z0-9._-]+")
+
+
+def get_upload_references() -> List[str]:
+    """URLs de uploads referenciadas por produtos, pedidos e a logo da empresa"""
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        urls = []
+        cursor.execute("SELECT photo_url, simple_photo_url, combo_photo_url FROM products")
+        for row in cursor.fetchall():
+            urls.extend(url for url in row if url)
+        cursor.execute("SELECT value FROM system_settings WHERE key = 'logo_url'")
+        row = cursor.fetchone()
+        if row and row[0]:
+            urls.append(row[0])
+        # Pedidos guardam a foto do item no momento da venda
+        cursor.execute("SELECT items FROM pedidos WHERE items LIKE '%/uploads/%'")
+        for (items,) in cursor.fetchall():
+            urls.extend(UPLOAD_URL_PATTERN.findall(items))
+        return urls
+
+
+def replace_upload_url(old_url: str, new_url: str) -> int:
+    """Troca a URL de um upload em produtos, pedidos e na logo (migração de nomes)"""
+    with db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        total = 0
+        for column in ("photo_url", "simple_photo_url", "combo_photo_url"):
+            cursor.execute(f"UPDATE products SET {column} = ? WHERE {column} = ?", (new_url, old_url))
+            total += cursor.rowcount
+        cursor.execute(
+            "UPDATE system_settings SET value = REPLACE(value, ?, ?) WHERE key = 'logo_url' AND value LIKE ?",
+            (old_url, new_url, f"%{old_url}")
+        )
+        total += cursor.rowcount
+        cursor.execute(
+            "UPDATE pedidos SET items = REPLACE(items, ?, ?) WHERE items LIKE ?",
+            (old_url, new_url, f"%{old_url}%")
+        )
+        total += cursor.rowcount
+        conn.commit()
+        return total
+
+
 # Inicializar banco ao importar o módulo
 init_database()
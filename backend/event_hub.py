@@ -0,0 +1,155 @@
+"""
+Hub de Eventos em Processo (pub/sub)
+Distribui mudanças de pedidos e da fila de espera para os terminais via
+SSE/WebSocket, substituindo o polling de /pedidos e /chatbot/waiting-queue.
+
+Cada evento recebe um cursor (id) crescente. Os últimos eventos ficam em um
+buffer circular para que clientes que reconectam possam retomar a partir do
+último cursor recebido (Last-Event-ID); se o cursor já saiu do buffer, o
+cliente recebe um evento "reset" e deve recarregar os dados completos.
+"""
+import asyncio
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Tópicos conhecidos
+TOPIC_PEDIDOS = "pedidos"
+TOPIC_WAITING_QUEUE = "waiting_queue"
+ALL_TOPICS = {TOPIC_PEDIDOS, TOPIC_WAITING_QUEUE}
+
+
+@dataclass
+class Event:
+    """Evento publicado no hub"""
+    id: int
+    topic: str
+    type: str
+    data: Dict[str, Any]
+    timestamp: str
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class Subscription:
+    """Assinatura de um cliente (SSE ou WebSocket) em um ou mais tópicos"""
+
+    def __init__(self, topics: Set[str], loop: asyncio.AbstractEventLoop, max_pending: int = 500):
+        self.topics = topics
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        # Cliente lento demais: descartamos eventos e pedimos um reset
+        self.overflowed = False
+
+    def matches(self, event: Event) -> bool:
+        return not self.topics or event.topic in self.topics
+
+    def _deliver(self, event: Event):
+        """Executado no event loop do assinante"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """Aguarda o próximo evento (None se o timeout expirar)"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventHub:
+    """Pub/sub em memória com buffer para retomada por cursor"""
+
+    def __init__(self, buffer_size: int = 1000):
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._last_id = 0
+
+    @property
+    def cursor(self) -> int:
+        """Cursor do último evento publicado"""
+        return self._last_id
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, topic: str, event_type: str, data: Dict[str, Any]) -> Event:
+        """
+        Publica um evento. Pode ser chamado de qualquer thread (handlers async
+        ou funções síncronas executadas no thread pool).
+        """
+        with self._lock:
+            self._last_id += 1
+            event = Event(
+                id=self._last_id,
+                topic=topic,
+                type=event_type,
+                data=data,
+                timestamp=datetime.now(timezone.utc).isoformat()
+            )
+            self._buffer.append(event)
+            subscribers = [s for s in self._subscribers if s.matches(event)]
+
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub._deliver, event)
+            except RuntimeError:
+                # Loop do assinante já foi encerrado
+                self.unsubscribe(sub)
+        return event
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None) -> Subscription:
+        """Cria uma assinatura no event loop atual"""
+        sub = Subscription(set(topics or []), asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def replay(self, cursor: int, topics: Optional[Iterable[str]] = None) -> Optional[List[Event]]:
+        """
+        Retorna os eventos publicados após o cursor.
+        Retorna None se o cursor é antigo demais (eventos já descartados do buffer).
+        """
+        topic_set = set(topics or [])
+        with self._lock:
+            if cursor >= self._last_id:
+                return []
+            oldest = self._buffer[0].id if self._buffer else self._last_id + 1
+            if cursor < oldest - 1:
+                return None
+            return [e for e in self._buffer if e.id > cursor and (not topic_set or e.topic in topic_set)]
+
+
+def parse_topics(topics: Optional[str]) -> Set[str]:
+    """Converte 'pedidos,waiting_queue' em conjunto de tópicos válidos"""
+    if not topics:
+        return set(ALL_TOPICS)
+    return {t.strip() for t in topics.split(",") if t.strip() in ALL_TOPICS}
+
+
+def pedido_summary(pedido: Dict[str, Any]) -> Dict[str, Any]:
+    """Resumo leve de um pedido para o payload do evento (sem items)"""
+    return {
+        "id": pedido.get("id"),
+        "codigo": pedido.get("codigo"),
+        "status": pedido.get("status"),
+        "tipo_entrega": pedido.get("tipo_entrega"),
+        "entregador_id": pedido.get("entregador_id"),
+        "updated_at": pedido.get("updated_at"),
+    }
+
+
+# Instância global do hub
+event_hub = EventHub()
@@ -0,0 +1,184 @@
+"""
+Serialização JSON rápida para respostas da API
+Usa orjson quando disponível (fallback para json da stdlib) e permite que
+endpoints de listagem devolvam linhas "confiáveis" sem revalidação Pydantic.
+Colunas JSON do banco podem ser embutidas cruas na resposta (RawJSON).
+Listagens aceitam projeção (?fields=, ver parse_fields) aplicada no SELECT.
+
+As linhas vindas do SQLite já foram validadas pelos modelos *Create na escrita,
+então na leitura basta projetar os campos do modelo de resposta e aplicar os
+defaults - sem construir um objeto Pydantic por linha.
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import Response
+
+# Importar orjson (opcional)
+ORJSON_AVAILABLE = False
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except Exception as e:
+    orjson = None
+    print(f"[FAST_JSON] orjson não disponível, usando json padrão: {e}")
+
+
+# orjson >= 3.9 permite embutir JSON pré-codificado (Fragment)
+FRAGMENT_AVAILABLE = ORJSON_AVAILABLE and hasattr(orjson, "Fragment")
+
+
+class RawJSON:
+    """
+    Coluna JSON do banco (items, recipe, order_steps) mantida como texto.
+    Na serialização é embutida como fragmento pré-codificado, sem o ciclo
+    decode/encode; o decode só acontece se o código do servidor acessar a
+    estrutura (iteração, índice, len ou load()).
+
+    O texto é confiável: o banco só grava essas colunas via
+    database._json_list e a migração listas_json_validas corrige as antigas.
+    """
+    __slots__ = ("text", "_empty", "_value", "_loaded")
+
+    def __init__(self, text: Optional[str], empty: str = "[]"):
+        self.text = text or empty
+        self._empty = empty
+        self._value = None
+        self._loaded = False
+
+    def load(self) -> Any:
+        """Decodifica (uma única vez) o texto JSON"""
+        if not self._loaded:
+            try:
+                self._value = json.loads(self.text)
+            except (json.JSONDecodeError, TypeError):
+                self._value = json.loads(self._empty)
+            self._loaded = True
+        return self._value
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __len__(self) -> int:
+        return len(self.load())
+
+    def __getitem__(self, key):
+        return self.load()[key]
+
+    def __bool__(self) -> bool:
+        return bool(self.load())
+
+    def __repr__(self) -> str:
+        return f"RawJSON({self.text[:40]!r})"
+
+
+def _default(obj: Any) -> Any:
+    """Converte tipos não suportados nativamente pelo encoder"""
+    if isinstance(obj, RawJSON):
+        if FRAGMENT_AVAILABLE and not obj._loaded:
+            return orjson.Fragment(obj.text)
+        return obj.load()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serializa para bytes JSON (UTF-8)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """Resposta JSON serializada com orjson (sem passar pelo jsonable_encoder)"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# Cache de (campo, default, aceita None) por modelo de resposta
+_model_plans: Dict[Type[BaseModel], List[Tuple[str, Any, bool]]] = {}
+
+
+def _get_model_plan(model: Type[BaseModel]) -> List[Tuple[str, Any, bool]]:
+    """Monta (uma única vez por modelo) a lista de campos com seus defaults"""
+    plan = _model_plans.get(model)
+    if plan is None:
+        plan = []
+        for name, field in model.model_fields.items():
+            if field.default_factory is not None:
+                default = field.default_factory
+            elif field.is_required():
+                default = None
+            else:
+                default = field.default
+            # Campos Optional[...] aceitam None vindo do banco
+            nullable = not field.is_required() and field.default is None and field.default_factory is None
+            nullable = nullable or type(None) in getattr(field.annotation, "__args__", ())
+            plan.append((name, default, nullable))
+        _model_plans[model] = plan
+    return plan
+
+
+def json_normalizer(annotation: Any) -> Callable[[Any], Any]:
+    """
+    Normalizador de uma coluna JSON com modelos aninhados (ex.: List[OrderStep]):
+    valida com o tipo e devolve o valor com os defaults aplicados, como fazia a
+    validação do response_model. trusted_rows só projeta o primeiro nível, então
+    essas colunas precisam ser gravadas já normalizadas.
+    """
+    adapter = TypeAdapter(annotation)
+
+    def normalize(value: Any) -> Any:
+        return adapter.dump_python(adapter.validate_python(value), mode="json")
+
+    return normalize
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel], always: Tuple[str, ...] = ("id",)) -> Optional[List[str]]:
+    """
+    Projeção pedida em ?fields=a,b,c. Só campos do modelo de resposta são
+    aceitos (ValueError para os demais); `always` entra sempre.
+    None/vazio = todos os campos.
+    """
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in model.model_fields]
+    if unknown:
+        raise ValueError(f"Campos inválidos: {', '.join(unknown)}")
+    return list(dict.fromkeys([*always, *requested]))
+
+
+def trusted_rows(rows: Iterable[Dict], model: Type[BaseModel], fields: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Projeta linhas do banco no formato do modelo de resposta sem validar.
+    Campos extras são descartados (como extra="ignore") e valores None em
+    campos não-opcionais recebem o default do modelo.
+    Com `fields` (parse_fields), só esses campos saem na resposta.
+    """
+    plan = _get_model_plan(model)
+    if fields is not None:
+        wanted = set(fields)
+        plan = [entry for entry in plan if entry[0] in wanted]
+    result = []
+    for row in rows:
+        item = {}
+        for name, default, nullable in plan:
+            value = row.get(name)
+            if value is None and not nullable:
+                value = default() if callable(default) else default
+            item[name] = value
+        result.append(item)
+    return result
+
+
+def trusted_response(rows: Iterable[Dict], model: Type[BaseModel], fields: Optional[List[str]] = None) -> FastJSONResponse:
+    """Atalho: projeta as linhas e devolve a resposta JSON pronta"""
+    return FastJSONResponse(trusted_rows(rows, model, fields))
@@ -0,0 +1,224 @@
+"""
+Pipeline de Imagens de Produtos
+Processa as fotos enviadas fora do event loop (pool de threads) e gera
+variantes responsivas para o cardápio:
+
+    {nome}.{ext}          full 1080px JPEG (URL original, compatível)
+    {nome}.webp           full 1080px WebP
+    {nome}_medium.jpg/.webp   540px
+    {nome}_thumb.jpg/.webp    240px
+
+Os nomes das variantes derivam do nome base, então o frontend monta o
+srcset a partir do photo_url sem consultar a API (ver image_variants()).
+Fotos antigas ganham as variantes pelo job "gerar_variantes_imagens".
+
+O Pillow só é importado no primeiro processamento (startup mais rápido).
+"""
+import asyncio
+import os
+import re
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from startup_profile import lazy_import
+
+# Tamanho (lado do quadrado) de cada variante
+VARIANT_SIZES = {"thumb": 240, "medium": 540, "full": 1080}
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+# Variantes geradas: nome_thumb.jpg, nome_medium.webp, ...
+VARIANT_NAME = re.compile(r"^(?P<stem>.+?)_(?P<variant>thumb|medium)\.(?P<fmt>jpg|webp)$")
+
+_executor: Optional[Executor] = None
+_webp_available: Optional[bool] = None
+
+
+def _pil_image():
+    return lazy_import("PIL.Image")
+
+
+def webp_available() -> bool:
+    """Suporte a WebP no Pillow instalado (verificado uma vez)"""
+    global _webp_available
+    if _webp_available is None:
+        _webp_available = bool(lazy_import("PIL.features").check("webp"))
+    return _webp_available
+
+
+def get_executor() -> Executor:
+    """
+    Pool de threads dedicado ao processamento (CPU) das imagens.
+    O Pillow libera o GIL durante decode/resize/encode, então o event loop
+    continua livre. Processos não são usados: 'fork' num servidor com várias
+    threads (jobs, threadpool, logger, db_lock) pode gerar filhos travados, e
+    'spawn' reimportaria o server.py inteiro em cada filho.
+    """
+    global _executor
+    if _executor is None:
+        workers = max(1, min(2, (os.cpu_count() or 1) - 1))
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def variant_filename(base_name: str, variant: str, fmt: str) -> str:
+    """Nome do arquivo de uma variante a partir do nome base (ex: abc.jpg)"""
+    stem = Path(base_name).stem
+    if variant == "full":
+        return base_name if fmt == "jpg" else f"{stem}.webp"
+    return f"{stem}_{variant}.{fmt}"
+
+
+def is_variant_file(name: str) -> bool:
+    """True para arquivos gerados (variantes e o .webp full)"""
+    return bool(VARIANT_NAME.match(name)) or name.endswith(".webp")
+
+
+def _square_canvas(img):
+    """Centraliza a imagem em um quadrado com fundo branco"""
+    if img.size[0] == img.size[1]:
+        return img
+    size = max(img.size)
+    canvas = _pil_image().new("RGB", (size, size), (255, 255, 255))
+    canvas.paste(img, ((size - img.size[0]) // 2, (size - img.size[1]) // 2))
+    return canvas
+
+
+def _save(img, path: Path, fmt: str):
+    """Grava em arquivo temporário e renomeia (leitores nunca veem arquivo parcial)"""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    if fmt == "webp":
+        img.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+    else:
+        img.save(tmp, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    os.replace(tmp, path)
+
+
+def render_variants(source: bytes, upload_dir: str, base_name: str) -> List[str]:
+    """
+    Gera todas as variantes de uma imagem (executado no pool de imagens).
+    Retorna os nomes dos arquivos gravados.
+    """
+    Image = _pil_image()
+    directory = Path(upload_dir)
+    img = Image.open(BytesIO(source))
+    img = img.convert("RGB")
+    img.thumbnail((VARIANT_SIZES["full"], VARIANT_SIZES["full"]), Image.Resampling.LANCZOS)
+    img = _square_canvas(img)
+
+    written = []
+    for variant, size in VARIANT_SIZES.items():
+        resized = img if img.size[0] <= size else img.resize((size, size), Image.Resampling.LANCZOS)
+        formats = ["jpg", "webp"] if webp_available() else ["jpg"]
+        for fmt in formats:
+            name = variant_filename(base_name, variant, fmt)
+            _save(resized, directory / name, fmt)
+            written.append(name)
+    return written
+
+
+def render_missing_variants(upload_dir: str, base_name: str) -> List[str]:
+    """Gera as variantes de uma foto já existente (sem regravar o JPEG full)"""
+    Image = _pil_image()
+    directory = Path(upload_dir)
+    base_path = directory / base_name
+    formats = ["jpg", "webp"] if webp_available() else ["jpg"]
+    missing = [
+        (variant, fmt) for variant in VARIANT_SIZES for fmt in formats
+        if not (variant == "full" and fmt == "jpg")
+        and not (directory / variant_filename(base_name, variant, fmt)).exists()
+    ]
+    if not missing:
+        return []
+
+    img = Image.open(base_path)
+    img = _square_canvas(img.convert("RGB"))
+    written = []
+    for variant, fmt in missing:
+        size = VARIANT_SIZES[variant]
+        resized = img if img.size[0] <= size else img.resize((size, size), Image.Resampling.LANCZOS)
+        name = variant_filename(base_name, variant, fmt)
+        _save(resized, directory / name, fmt)
+        written.append(name)
+    return written
+
+
+async def process_product_upload(source: bytes, upload_dir: Path, base_name: str) -> List[str]:
+    """
+    Processa uma foto enviada fora do event loop, gravando-a como base_name.
+    Erros de decodificação da imagem são propagados para o endpoint.
+    """
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), render_variants, source, str(upload_dir), base_name)
+
+
+def image_variants(photo_url: Optional[str]) -> Optional[Dict]:
+    """
+    URLs das variantes de uma foto de produto (para srcset).
+    Retorna None para URLs externas ou fora de /uploads/products/.
+    """
+    if not photo_url or not photo_url.startswith("/uploads/products/"):
+        return None
+    prefix, base_name = photo_url.rsplit("/", 1)
+    result = {}
+    webp = webp_available()
+    for variant, size in VARIANT_SIZES.items():
+        result[variant] = {
+            "width": size,
+            "jpg": f"{prefix}/{variant_filename(base_name, variant, 'jpg')}",
+            "webp": f"{prefix}/{variant_filename(base_name, variant, 'webp')}" if webp else None,
+        }
+    return result
+
+
+def backfill_variants(upload_dir: Path, ctx=None) -> Dict:
+    """
+    Gera as variantes faltantes das fotos existentes em uploads/products.
+    Usado pelo job em segundo plano; `ctx` permite cancelamento.
+    """
+    stats = {"processed": 0, "skipped": 0, "failed": 0, "files_written": 0}
+    if not upload_dir.exists():
+        return stats
+    for path in sorted(upload_dir.iterdir()):
+        if ctx is not None:
+            ctx.check_cancelled()
+        if not path.is_file() or path.name.endswith(".tmp") or is_variant_file(path.name):
+            continue
+        try:
+            written = render_missing_variants(str(upload_dir), path.name)
+        except Exception as e:
+            print(f"[IMAGES] Erro ao gerar variantes de {path.name}: {e}")
+            stats["failed"] += 1
+            continue
+        if written:
+            stats["processed"] += 1
+            stats["files_written"] += len(written)
+        else:
+            stats["skipped"] += 1
+    return stats
+
+
+def fallback_for_variant(upload_dir: Path, filename: str) -> Optional[Path]:
+    """
+    Foto antiga ainda sem variantes: devolve o arquivo original no lugar da
+    variante pedida (o backfill gera a variante depois).
+    """
+    match = VARIANT_NAME.match(filename)
+    stem = match.group("stem") if match else (filename[:-5] if filename.endswith(".webp") else None)
+    if not stem:
+        return None
+    for candidate in upload_dir.glob(f"{stem}.*"):
+        if candidate.suffix.lower() != ".webp" and not candidate.name.endswith(".tmp"):
+            return candidate
+    return None
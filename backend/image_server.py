@@ -0,0 +1,234 @@
+"""
+Servidor de Imagens (fotos de produtos e logo da empresa)
+Camada de entrega das imagens de /uploads com:
+
+- ETag forte: para arquivos endereçados por conteúdo (upload_store) o próprio
+  hash do nome; para arquivos antigos, tamanho + data de modificação
+- Cache-Control: immutable por 1 ano para nomes com hash (o conteúdo nunca
+  muda para o mesmo nome); revalidação para os demais
+- 304 (If-None-Match) e Range de intervalo único (206 / 416)
+- Cache LRU em memória das imagens mais acessadas (limite em bytes)
+"""
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from image_pipeline import VARIANT_NAME
+from upload_store import is_content_addressed
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "public, no-cache"
+# Variante ainda não gerada: o original é servido por pouco tempo
+FALLBACK_CACHE = "public, max-age=300"
+
+# Memória do cache de imagens (por diretório)
+IMAGE_CACHE_MAX_BYTES = int(float(os.environ.get("NUCLEO_IMAGE_CACHE_MB", "32")) * 1024 * 1024)
+IMAGE_CACHE_MAX_ITEM_BYTES = 1024 * 1024
+
+
+@dataclass
+class CachedImage:
+    data: bytes
+    etag: str
+    media_type: str
+    mtime: float
+    immutable: bool
+
+
+def is_hashed_image(name: str) -> bool:
+    """Arquivo base ou variante de um upload endereçado por conteúdo"""
+    match = VARIANT_NAME.match(name)
+    if match:
+        return is_content_addressed(match.group("stem") + ".jpg")
+    return is_content_addressed(name)
+
+
+def _etag_for(name: str, stat: os.stat_result, hashed: bool) -> str:
+    if hashed:
+        return f'"{name}"'
+    return f'"{stat.st_size:x}-{int(stat.st_mtime * 1000):x}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Intervalo único 'bytes=início-fim' (inclusive). Retorna None para
+    cabeçalhos não suportados (múltiplos intervalos) e levanta 416 para
+    intervalos fora do arquivo.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_str, _, end_str = header[6:].strip().partition("-")
+    try:
+        if start_str == "":
+            # Sufixo: últimos N bytes
+            length = int(end_str)
+            if length <= 0:
+                raise ValueError
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Intervalo inválido",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+class ImageServer:
+    """Entrega de imagens de um diretório com validação, Range e cache LRU"""
+
+    def __init__(self, directory: Path, max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+                 max_item_bytes: int = IMAGE_CACHE_MAX_ITEM_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._cache: "OrderedDict[str, CachedImage]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_get(self, name: str) -> Optional[CachedImage]:
+        with self._lock:
+            entry = self._cache.get(name)
+            if entry is not None:
+                self._cache.move_to_end(name)
+            return entry
+
+    def _cache_put(self, name: str, entry: CachedImage):
+        size = len(entry.data)
+        if size > self.max_item_bytes or size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._cache.pop(name, None)
+            if previous is not None:
+                self._cache_bytes -= len(previous.data)
+            self._cache[name] = entry
+            self._cache_bytes += size
+            while self._cache_bytes > self.max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted.data)
+
+    def invalidate(self, name: Optional[str] = None):
+        """Descarta uma imagem (ou todas) do cache"""
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+                self._cache_bytes = 0
+            else:
+                entry = self._cache.pop(name, None)
+                if entry is not None:
+                    self._cache_bytes -= len(entry.data)
+
+    def _load(self, path: Path, hashed: bool) -> Tuple[Optional[CachedImage], Optional[os.stat_result]]:
+        """Lê metadados (e o conteúdo, se couber no cache) - executado em thread"""
+        try:
+            stat = path.stat()
+        except OSError:
+            return None, None
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        etag = _etag_for(path.name, stat, hashed)
+        if stat.st_size > self.max_item_bytes:
+            return CachedImage(b"", etag, media_type, stat.st_mtime, hashed), stat
+        data = path.read_bytes()
+        entry = CachedImage(data, etag, media_type, stat.st_mtime, hashed)
+        self._cache_put(path.name, entry)
+        return entry, stat
+
+    def _resolve(self, name: str, hashed: bool) -> Tuple[Optional[CachedImage], Optional[Path]]:
+        path = self.directory / name
+        entry = self._cache_get(name)
+        if entry is not None and not hashed:
+            # Nome sem hash pode ter sido sobrescrito: confere a data de modificação
+            try:
+                if path.stat().st_mtime != entry.mtime:
+                    self.invalidate(name)
+                    entry = None
+            except OSError:
+                self.invalidate(name)
+                return None, None
+        if entry is not None:
+            self.hits += 1
+            return entry, path
+        self.misses += 1
+        entry, _ = self._load(path, hashed)
+        return entry, path if entry else None
+
+    async def response(self, request: Request, filename: str,
+                       fallback: Optional[Path] = None) -> Response:
+        """
+        Responde a imagem `filename`. Se não existir e `fallback` for
+        informado (variante ainda não gerada), serve o fallback com cache curto.
+        """
+        name = Path(filename).name
+        hashed = is_hashed_image(name)
+        entry = self._cache_get(name) if hashed else None
+        if entry is not None:
+            self.hits += 1
+            path = self.directory / name
+        else:
+            entry, path = await run_in_threadpool(self._resolve, name, hashed)
+        cache_control = IMMUTABLE_CACHE if hashed else REVALIDATE_CACHE
+
+        if entry is None:
+            if fallback is None:
+                raise HTTPException(status_code=404, detail="Image not found")
+            entry, path = await run_in_threadpool(self._resolve, fallback.name, is_hashed_image(fallback.name))
+            if entry is None:
+                raise HTTPException(status_code=404, detail="Image not found")
+            cache_control = FALLBACK_CACHE
+
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": cache_control,
+            "Accept-Ranges": "bytes",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or entry.etag in [t.strip() for t in if_none_match.split(",")]):
+            return Response(status_code=304, headers=headers)
+
+        size = len(entry.data) if entry.data else path.stat().st_size
+        byte_range = parse_range(request.headers.get("range", ""), size)
+        if_range = request.headers.get("if-range")
+        if byte_range and if_range and if_range.strip() != entry.etag:
+            byte_range = None
+
+        if byte_range:
+            start, end = byte_range
+            if entry.data:
+                chunk = entry.data[start:end + 1]
+            else:
+                chunk = await run_in_threadpool(_read_range, path, start, end)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return Response(content=chunk, status_code=206, media_type=entry.media_type, headers=headers)
+
+        if entry.data:
+            return Response(content=entry.data, media_type=entry.media_type, headers=headers)
+        return FileResponse(str(path), media_type=entry.media_type, headers=headers)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "directory": str(self.directory),
+                "cached_images": len(self._cache),
+                "cached_bytes": self._cache_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def _read_range(path: Path, start: int, end: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start + 1)
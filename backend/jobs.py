@@ -0,0 +1,386 @@
+"""
+Jobs em Segundo Plano
+Executa tarefas longas (recálculo de estatísticas, custos de receitas, backup
+em Excel, limpezas) fora das requisições HTTP, usando os workers da
+RequestQueue do bug_tracker.
+
+- Jobs nomeados, registrados com prioridade, tentativas e backoff
+- Agendamento periódico estilo cron ("*/15 * * * *", hora local)
+- Execuções idênticas (mesmo job + parâmetros) pendentes são reaproveitadas
+- Cancelamento: pendentes são descartados; em execução, o job consulta
+  ctx.cancelled / ctx.check_cancelled()
+- Histórico persistido na tabela job_runs (database.py)
+
+Com vários workers, cada execução agendada recebe um `slot` único
+(job + minuto), então apenas um processo a registra e executa.
+"""
+import json
+import threading
+import traceback
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import database as sqlite_db
+from bug_tracker import Priority, RequestQueue, log_bug, request_queue
+from state_store import get_worker_count
+
+# Status terminais de uma execução
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled", "interrupted")
+
+
+class JobCancelled(Exception):
+    """Levantada pelo job (via ctx.check_cancelled) ao ser cancelado"""
+
+
+class CronSchedule:
+    """
+    Expressão cron de 5 campos: minuto hora dia-do-mês mês dia-da-semana.
+    Suporta '*', '*/n', 'a-b', 'a-b/n' e listas 'a,b,c'. Domingo = 0.
+    Como no cron padrão, se dia-do-mês e dia-da-semana forem ambos
+    restritos (não começam com '*'), basta um dos dois coincidir.
+    """
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Expressão cron inválida: {expression!r}")
+        self.fields: List[Set[int]] = [
+            self._parse_field(part, lo, hi) for part, (lo, hi) in zip(parts, self.RANGES)
+        ]
+        self.day_or_weekday = not parts[2].startswith("*") and not parts[4].startswith("*")
+
+    @staticmethod
+    def _parse_field(part: str, lo: int, hi: int) -> Set[int]:
+        values: Set[int] = set()
+        for item in part.split(","):
+            step = 1
+            if "/" in item:
+                item, step_str = item.split("/", 1)
+                step = int(step_str)
+            if item == "*":
+                start, end = lo, hi
+            elif "-" in item:
+                start, end = (int(x) for x in item.split("-", 1))
+            else:
+                start = end = int(item)
+            if start < lo or end > hi or step < 1:
+                raise ValueError(f"Campo cron fora do intervalo: {part!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def matches(self, dt: datetime) -> bool:
+        minute, hour, day, month, weekday = self.fields
+        day_match = dt.day in day
+        weekday_match = (dt.weekday() + 1) % 7 in weekday
+        if self.day_or_weekday:
+            day_ok = day_match or weekday_match
+        else:
+            day_ok = day_match and weekday_match
+        return dt.minute in minute and dt.hour in hour and dt.month in month and day_ok
+
+    def next_after(self, dt: datetime, max_days: int = 62) -> Optional[datetime]:
+        """Próximo minuto (após dt) que satisfaz a expressão"""
+        candidate = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=max_days)
+        while candidate < limit:
+            if self.matches(candidate):
+                return candidate
+            candidate += timedelta(minutes=1)
+        return None
+
+
+@dataclass
+class JobDefinition:
+    """Job registrado no gerenciador"""
+    name: str
+    func: Callable[["JobContext"], Any]
+    description: str = ""
+    priority: Priority = Priority.BACKGROUND
+    max_retries: int = 2
+    retry_backoff: float = 30.0
+    schedule: Optional[CronSchedule] = None
+
+
+@dataclass
+class JobContext:
+    """Passado para a função do job"""
+    run_id: str
+    job_name: str
+    params: Dict[str, Any]
+    attempt: int = 0
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+
+@dataclass
+class _ActiveRun:
+    ctx: JobContext
+    key: str
+    running: bool = False
+    timer: Optional[threading.Timer] = None
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobManager:
+    """Registro, agendamento e execução de jobs sobre a RequestQueue"""
+
+    def __init__(self, queue: RequestQueue):
+        self.queue = queue
+        self.jobs: Dict[str, JobDefinition] = {}
+        self._active: Dict[str, _ActiveRun] = {}
+        self._active_by_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._scheduler: Optional[threading.Thread] = None
+
+    def register(
+        self,
+        name: str,
+        func: Callable[[JobContext], Any],
+        description: str = "",
+        priority: Priority = Priority.BACKGROUND,
+        max_retries: int = 2,
+        retry_backoff: float = 30.0,
+        schedule: Optional[str] = None
+    ) -> JobDefinition:
+        """Registra um job. `schedule` é uma expressão cron (hora local) ou None"""
+        job = JobDefinition(
+            name=name,
+            func=func,
+            description=description,
+            priority=priority,
+            max_retries=max_retries,
+            retry_backoff=retry_backoff,
+            schedule=CronSchedule(schedule) if schedule else None
+        )
+        self.jobs[name] = job
+        return job
+
+    # ---------- Submissão e execução ----------
+
+    def submit(self, name: str, params: Dict[str, Any] = None, trigger: str = "manual",
+               slot: str = None) -> Optional[Dict]:
+        """
+        Enfileira uma execução e retorna o registro (status 'queued').
+        Se já houver uma execução pendente do mesmo job com os mesmos
+        parâmetros, ela é retornada em vez de criar outra. Retorna None
+        quando o slot agendado já foi registrado por outro worker.
+        """
+        if name not in self.jobs:
+            raise KeyError(name)
+        params = params or {}
+        key = name + ":" + json.dumps(params, sort_keys=True, default=str)
+
+        with self._lock:
+            existing_id = self._active_by_key.get(key)
+            if existing_id and not self._active[existing_id].running:
+                return sqlite_db.get_job_run(existing_id)
+
+            run_id = str(uuid.uuid4())
+            run = sqlite_db.create_job_run({
+                "id": run_id,
+                "job_name": name,
+                "params": params,
+                "status": "queued",
+                "trigger": trigger,
+                "slot": slot,
+                "created_at": _now_iso()
+            })
+            if run is None:
+                return None
+            self._active[run_id] = _ActiveRun(ctx=JobContext(run_id, name, params), key=key)
+            self._active_by_key[key] = run_id
+
+        self._enqueue(run_id)
+        return run
+
+    def _enqueue(self, run_id: str):
+        with self._lock:
+            active = self._active.get(run_id)
+            if active is None:
+                return
+            active.timer = None
+            job = self.jobs[active.ctx.job_name]
+        self.queue.enqueue(self._execute, (run_id,), job.priority)
+
+    def _finish(self, run_id: str, **data):
+        with self._lock:
+            active = self._active.pop(run_id, None)
+            if active and self._active_by_key.get(active.key) == run_id:
+                del self._active_by_key[active.key]
+        data["finished_at"] = _now_iso()
+        sqlite_db.update_job_run(run_id, data)
+
+    def _execute(self, run_id: str):
+        """Executado nas threads da RequestQueue"""
+        with self._lock:
+            active = self._active.get(run_id)
+            if active is None:
+                return
+            if active.ctx.cancelled:
+                cancelled = True
+            else:
+                cancelled = False
+                active.running = True
+                active.ctx.attempt += 1
+                # Novas submissões idênticas passam a gerar outra execução
+                if self._active_by_key.get(active.key) == run_id:
+                    del self._active_by_key[active.key]
+        if cancelled:
+            self._finish(run_id, status="cancelled")
+            return
+
+        ctx = active.ctx
+        job = self.jobs[ctx.job_name]
+        sqlite_db.update_job_run(run_id, {
+            "status": "running",
+            "attempts": ctx.attempt,
+            "started_at": _now_iso(),
+            "next_attempt_at": None
+        })
+
+        try:
+            result = job.func(ctx)
+        except JobCancelled:
+            self._finish(run_id, status="cancelled")
+            return
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if ctx.attempt <= job.max_retries and not ctx.cancelled:
+                delay = job.retry_backoff * (2 ** (ctx.attempt - 1))
+                next_attempt = datetime.now(timezone.utc) + timedelta(seconds=delay)
+                sqlite_db.update_job_run(run_id, {
+                    "status": "retrying",
+                    "error": error,
+                    "next_attempt_at": next_attempt.isoformat()
+                })
+                timer = threading.Timer(delay, self._enqueue, (run_id,))
+                timer.daemon = True
+                with self._lock:
+                    active.running = False
+                    active.timer = timer
+                timer.start()
+                return
+            log_bug(
+                error_type=type(e).__name__,
+                message=str(e),
+                endpoint=f"job:{ctx.job_name}",
+                stack_trace=traceback.format_exc()
+            )
+            self._finish(run_id, status="failed", error=error)
+            return
+
+        self._finish(run_id, status="succeeded", result=result, error=None)
+
+    def cancel(self, run_id: str) -> Optional[Dict]:
+        """
+        Cancela uma execução. Pendentes (na fila ou aguardando nova tentativa)
+        são encerradas na hora; em execução, o job é sinalizado e termina no
+        próximo ctx.check_cancelled(). Retorna o registro atualizado.
+        """
+        with self._lock:
+            active = self._active.get(run_id)
+            if active is None:
+                return sqlite_db.get_job_run(run_id)
+            active.ctx.cancel_event.set()
+            running = active.running
+            timer = active.timer
+        if timer:
+            timer.cancel()
+        if not running:
+            self._finish(run_id, status="cancelled")
+        return sqlite_db.get_job_run(run_id)
+
+    # ---------- Agendamento ----------
+
+    def start(self, schedule: bool = True):
+        """
+        Inicia os workers da fila e, com schedule=True, o agendador.
+        Com vários workers só o processo primário agenda; todos executam
+        o que for submetido neles.
+        """
+        if self._scheduler and self._scheduler.is_alive():
+            return
+        # Com um único processo, o que ficou aberto na última execução foi interrompido
+        if get_worker_count() == 1:
+            sqlite_db.fail_interrupted_job_runs()
+        self.queue.start()
+        if not schedule:
+            return
+        self._stop.clear()
+        self._scheduler = threading.Thread(target=self._scheduler_loop, name="job-scheduler", daemon=True)
+        self._scheduler.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            timers = [a.timer for a in self._active.values() if a.timer]
+        for timer in timers:
+            timer.cancel()
+
+    def _scheduler_loop(self):
+        while not self._stop.is_set():
+            now = datetime.now()
+            next_minute = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+            if self._stop.wait((next_minute - now).total_seconds()):
+                return
+            self.run_due(next_minute)
+
+    def run_due(self, moment: datetime):
+        """Submete os jobs agendados para o minuto `moment` (hora local)"""
+        for job in list(self.jobs.values()):
+            if job.schedule and job.schedule.matches(moment):
+                try:
+                    self.submit(job.name, trigger="schedule",
+                                slot=f"{job.name}@{moment.strftime('%Y-%m-%dT%H:%M')}")
+                except Exception as e:
+                    print(f"[JOBS] Erro ao agendar {job.name}: {e}")
+
+    # ---------- Consulta ----------
+
+    def list_jobs(self) -> List[Dict]:
+        """Jobs registrados com a última execução e a próxima agendada"""
+        last_runs = sqlite_db.get_last_job_runs()
+        now = datetime.now()
+        with self._lock:
+            active_counts: Dict[str, int] = {}
+            for active in self._active.values():
+                active_counts[active.ctx.job_name] = active_counts.get(active.ctx.job_name, 0) + 1
+        result = []
+        for job in self.jobs.values():
+            next_run = job.schedule.next_after(now) if job.schedule else None
+            result.append({
+                "name": job.name,
+                "description": job.description,
+                "priority": int(job.priority),
+                "max_retries": job.max_retries,
+                "schedule": job.schedule.expression if job.schedule else None,
+                "next_run": next_run.isoformat() if next_run else None,
+                "active_runs": active_counts.get(job.name, 0),
+                "last_run": last_runs.get(job.name)
+            })
+        return result
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            active = len(self._active)
+        return {"active_runs": active, "queue": self.queue.get_stats()}
+
+
+# Instância global
+job_manager = JobManager(request_queue)
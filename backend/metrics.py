@@ -0,0 +1,364 @@
+"""
+Métricas em Processo (formato texto do Prometheus)
+Registro leve de contadores, gauges e histogramas, exposto em /api/metrics.
+
+Cobre latência por rota HTTP, duração de db_call por função, tempo de espera
+e de posse do db_lock, fila do thread pool, atraso do event loop, assinantes
+SSE e latência das chamadas externas (WhatsApp, LLM, TTS, transcrição).
+"""
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Buckets padrão (segundos)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Linhas de amostra no formato texto do Prometheus"""
+
+
+class Counter(_Metric):
+    """Contador monotônico"""
+    type_name = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Valor instantâneo (pode subir e descer ou vir de uma função)"""
+    type_name = "gauge"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float]):
+        """Valor calculado no momento da coleta (gauge sem labels)"""
+        self._function = fn
+
+    def _samples(self):
+        if self._function is not None:
+            try:
+                self.set(float(self._function()))
+            except Exception:
+                pass
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Histograma cumulativo com buckets fixos"""
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [contagens por bucket..., soma, total]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = data
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+                    break
+            data[-2] += value
+            data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mede a duração de um bloco (funciona também em volta de await)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, data in items:
+            cumulative = 0.0
+            for i, bound in enumerate(self.buckets):
+                cumulative += data[i]
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {_format_value(data[-1])}")
+            plain = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{plain} {_format_value(data[-2])}")
+            lines.append(f"{self.name}_count{plain} {_format_value(data[-1])}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas renderizado em formato texto do Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Instância global
+registry = Registry()
+
+# ==================== MÉTRICAS DO SISTEMA ====================
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "nucleo_http_request_duration_seconds",
+    "Tempo até o início da resposta HTTP, por rota",
+    ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = registry.gauge("nucleo_http_requests_in_flight", "Requisições HTTP em andamento")
+
+DB_CALL_SECONDS = registry.histogram(
+    "nucleo_db_call_duration_seconds",
+    "Duração de db_call (fila do thread pool + execução), por função",
+    ("function",)
+)
+DB_CALL_IN_FLIGHT = registry.gauge("nucleo_db_calls_in_flight", "db_call aguardando ou executando no thread pool")
+
+LOCK_WAIT_SECONDS = registry.histogram(
+    "nucleo_lock_wait_seconds", "Tempo esperando para adquirir o lock", ("lock",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+LOCK_HOLD_SECONDS = registry.histogram(
+    "nucleo_lock_hold_seconds", "Tempo segurando o lock", ("lock",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+THREADPOOL_BORROWED = registry.gauge("nucleo_threadpool_busy_threads", "Threads do pool em uso")
+THREADPOOL_TOTAL = registry.gauge("nucleo_threadpool_total_threads", "Tamanho do thread pool")
+THREADPOOL_WAITING = registry.gauge("nucleo_threadpool_waiting_tasks", "Tarefas na fila aguardando thread")
+
+EVENT_LOOP_LAG_SECONDS = registry.gauge("nucleo_event_loop_lag_seconds", "Último atraso medido do event loop")
+EVENT_LOOP_LAG_HISTOGRAM = registry.histogram(
+    "nucleo_event_loop_lag_distribution_seconds", "Distribuição do atraso do event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+SSE_SUBSCRIBERS = registry.gauge("nucleo_event_subscribers", "Clientes conectados ao canal de eventos (SSE/WebSocket)")
+
+EXTERNAL_CALL_SECONDS = registry.histogram(
+    "nucleo_external_call_duration_seconds",
+    "Latência de chamadas externas (whatsapp, llm, tts, transcricao)",
+    ("service", "outcome")
+)
+
+ADMISSION_REJECTIONS = registry.counter(
+    "nucleo_admission_rejections_total", "Requisições rejeitadas pelo controle de admissão",
+    ("rule", "reason")
+)
+
+
+@contextmanager
+def track_external_call(service: str):
+    """Mede uma chamada externa; outcome=error se o bloco levantar exceção"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        EXTERNAL_CALL_SECONDS.observe(time.perf_counter() - start, service=service, outcome=outcome)
+
+
+class InstrumentedRLock:
+    """
+    RLock que mede espera e posse (apenas na aquisição mais externa de cada
+    thread). Substitui threading.RLock sem mudar o uso com `with`.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            self._lock.acquire()
+            self._local.depth = depth + 1
+            return True
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            now = time.perf_counter()
+            LOCK_WAIT_SECONDS.observe(now - start, lock=self.name)
+            self._local.depth = 1
+            self._local.acquired_at = now
+        return acquired
+
+    def release(self):
+        depth = self._local.depth - 1
+        self._local.depth = depth
+        if depth == 0:
+            LOCK_HOLD_SECONDS.observe(time.perf_counter() - self._local.acquired_at, lock=self.name)
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latência até o início da resposta, por rota (template)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        observed = False
+
+        def observe(status_code: int):
+            nonlocal observed
+            if observed:
+                return
+            observed = True
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status_code)
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                observe(message["status"])
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            observe(500)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Tarefa de fundo: mede quanto o event loop atrasa para acordar"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - start - interval)
+        EVENT_LOOP_LAG_SECONDS.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
+
+
+def collect_threadpool_stats():
+    """Atualiza os gauges do thread pool do anyio (chamar dentro do event loop)"""
+    try:
+        import anyio.to_thread
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        stats = limiter.statistics()
+        THREADPOOL_BORROWED.set(stats.borrowed_tokens)
+        THREADPOOL_TOTAL.set(limiter.total_tokens)
+        THREADPOOL_WAITING.set(stats.tasks_waiting)
+    except Exception:
+        pass
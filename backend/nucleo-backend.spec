@@ -44,6 +44,8 @@ a = Analysis(
         'jwt',
         'PIL',
         'PIL.Image',
+        'PIL.features',
+        'httpx',
         'multipart',
         'python_multipart',
         'dotenv',
@@ -56,6 +58,20 @@ a = Analysis(
         'database',
         'bug_tracker',
         'excel_backup',
+        'fast_json',
+        'event_hub',
+        'pedido_status',
+        'state_store',
+        'rate_limit',
+        'metrics',
+        'static_assets',
+        'image_pipeline',
+        'upload_store',
+        'image_server',
+        'jobs',
+        'startup_profile',
+        'dashboard_stats',
+        'orjson',
     ],
     hookspath=[],
     hooksconfig={},
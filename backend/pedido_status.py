@@ -0,0 +1,122 @@
+"""
+Mapa em memória do status dos pedidos
+Atende o acompanhamento do cardápio público sem decodificar o pedido inteiro:
+guarda apenas status/updated_at de cada pedido, gera um ETag por versão e
+permite long-poll (aguardar até o status mudar ou o tempo esgotar).
+
+As transições de pedido no servidor atualizam o mapa; pedidos ainda não
+carregados são lidos do banco com uma consulta leve (get_pedido_status).
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from state_store import get_worker_count
+
+# Campos expostos publicamente no acompanhamento do pedido
+STATUS_FIELDS = ("id", "status", "updated_at", "entregador_nome", "motivo_cancelamento")
+
+
+def make_etag(entry: Dict[str, Any]) -> str:
+    """ETag forte derivado dos campos de status"""
+    raw = "|".join(str(entry.get(f) or "") for f in STATUS_FIELDS)
+    return '"' + hashlib.md5(raw.encode("utf-8")).hexdigest()[:16] + '"'
+
+
+def _resolve(future: asyncio.Future, value: Optional[Dict[str, Any]]):
+    """Executado no event loop de quem está aguardando"""
+    if not future.done():
+        future.set_result(value)
+
+
+class PedidoStatusMap:
+    """
+    Status atual por pedido (LRU limitado) com espera por mudança.
+    Com vários workers, as transições podem acontecer em outro processo:
+    max_age_seconds faz as entradas expirarem e serem relidas do banco.
+    """
+
+    def __init__(self, max_entries: int = 5000, max_age_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, pedido_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(pedido_id)
+            if entry is None:
+                return None
+            if self.max_age_seconds and time.monotonic() - entry["_loaded_at"] > self.max_age_seconds:
+                del self._entries[pedido_id]
+                return None
+            self._entries.move_to_end(pedido_id)
+            return entry
+
+    def set(self, pedido: Dict[str, Any]) -> Dict[str, Any]:
+        """Registra o status de um pedido e acorda quem aguarda mudança"""
+        entry = {f: pedido.get(f) for f in STATUS_FIELDS}
+        entry["etag"] = make_etag(entry)
+        entry["_loaded_at"] = time.monotonic()
+        pedido_id = entry["id"]
+        with self._lock:
+            previous = self._entries.get(pedido_id)
+            self._entries[pedido_id] = entry
+            self._entries.move_to_end(pedido_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            waiters = self._waiters.pop(pedido_id, []) if not previous or previous["etag"] != entry["etag"] else []
+        self._wake(waiters, entry)
+        return entry
+
+    def remove(self, pedido_id: str):
+        """Pedido excluído: descarta o status e libera quem aguarda"""
+        with self._lock:
+            self._entries.pop(pedido_id, None)
+            waiters = self._waiters.pop(pedido_id, [])
+        self._wake(waiters, None)
+
+    def _wake(self, waiters, entry: Optional[Dict[str, Any]]):
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future, entry)
+            except RuntimeError:
+                pass  # Loop já encerrado
+
+    async def wait_for_change(self, pedido_id: str, etag: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Aguarda até o ETag do pedido ser diferente de `etag` ou o timeout expirar.
+        Retorna o status atual (None se o pedido foi excluído).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._lock:
+            entry = self._entries.get(pedido_id)
+            if entry is None or entry["etag"] != etag:
+                return entry
+            self._waiters.setdefault(pedido_id, []).append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            return self.get(pedido_id)
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(pedido_id)
+                if waiters and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._waiters[pedido_id]
+
+    @staticmethod
+    def public_view(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Payload público do acompanhamento"""
+        return {f: entry.get(f) for f in STATUS_FIELDS + ("etag",)}
+
+
+# Instância global
+pedido_status_map = PedidoStatusMap(max_age_seconds=5 if get_worker_count() > 1 else None)
@@ -0,0 +1,254 @@
+"""
+Controle de Admissão e Rate Limiting
+Protege as rotas públicas (cardápio, login, chatbot) contra abas com bug e
+rajadas de mensagens do WhatsApp, para que não esgotem o thread pool e o
+db_lock de todo o sistema.
+
+- TokenBucketLimiter: limite por chave (IP, telefone, cliente_id) -> 429
+- ConcurrencyGate: limite global de execuções simultâneas de rotas caras,
+  com tempo máximo de espera na fila -> 503
+- AdmissionMiddleware: aplica as regras por método/rota (ASGI puro, não
+  interfere em respostas streaming). Requisições de funcionários autenticados
+  passam direto, mantendo a prioridade da operação da loja.
+
+Os contadores de rejeição ficam em memória (por processo) e são expostos em
+get_rejection_stats().
+
+Vários workers (NUCLEO_WORKERS=N): buckets, semáforos e contadores são por
+processo. Para o limite configurado continuar valendo para o servidor como um
+todo, cada worker aplica 1/N da taxa, do burst e da concorrência (burst e
+concorrência arredondados para cima, mínimo 1). Um cliente cujas requisições
+caem sempre no mesmo worker fica mais limitado, nunca menos. Os contadores de
+rejeição (/system/rate-limits) mostram só o worker que atendeu a consulta.
+"""
+import asyncio
+import ipaddress
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from metrics import ADMISSION_REJECTIONS
+from state_store import get_worker_count
+
+# Contadores de rejeição: (nome da regra, motivo) -> total
+_rejections: Dict[Tuple[str, str], int] = {}
+_rejections_lock = threading.Lock()
+
+
+def record_rejection(name: str, reason: str):
+    """Registra uma requisição rejeitada (reason: rate_limited | overloaded)"""
+    with _rejections_lock:
+        _rejections[(name, reason)] = _rejections.get((name, reason), 0) + 1
+    ADMISSION_REJECTIONS.inc(rule=name, reason=reason)
+
+
+def get_rejection_stats() -> List[Dict]:
+    """Totais de rejeições por regra e motivo"""
+    with _rejections_lock:
+        return [
+            {"name": name, "reason": reason, "count": count}
+            for (name, reason), count in sorted(_rejections.items())
+        ]
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket por chave: `burst` requisições imediatas e reposição de
+    `rate_per_minute` fichas por minuto. Chaves antigas são descartadas (LRU).
+    Os valores são para o servidor todo; cada um dos `workers` aplica 1/N.
+    """
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_keys: int = 10000,
+                 workers: Optional[int] = None):
+        workers = workers or get_worker_count()
+        self.name = name
+        self.rate = rate_per_minute / 60.0 / workers
+        self.burst = float(max(1, math.ceil(burst / workers)))
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key: str) -> Tuple[bool, int]:
+        """Consome uma ficha. Retorna (permitido, segundos para tentar novamente)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        if allowed:
+            return True, 0
+        retry_after = int((1.0 - tokens) / self.rate) + 1 if self.rate > 0 else 60
+        return False, retry_after
+
+
+class ConcurrencyGate:
+    """
+    Limita execuções simultâneas; quem espera mais que queue_timeout é rejeitado.
+    `limit` é para o servidor todo; cada um dos `workers` aplica 1/N.
+    """
+
+    def __init__(self, name: str, limit: int, queue_timeout: float, workers: Optional[int] = None):
+        workers = workers or get_worker_count()
+        self.name = name
+        self.limit = max(1, math.ceil(limit / workers))
+        self.queue_timeout = queue_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Criado sob demanda dentro do event loop do servidor
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    async def acquire(self) -> bool:
+        try:
+            await asyncio.wait_for(self._get_semaphore().acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._get_semaphore().release()
+
+
+def check_rate_limit(limiter: TokenBucketLimiter, key: Optional[str]):
+    """
+    Verificação dentro do endpoint para chaves que vêm do corpo
+    (telefone, cliente_id). Levanta 429 com Retry-After.
+    """
+    if not key:
+        return
+    allowed, retry_after = limiter.check(str(key))
+    if not allowed:
+        record_rejection(limiter.name, "rate_limited")
+        raise HTTPException(
+            status_code=429,
+            detail="Muitas requisições. Tente novamente em instantes.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+@dataclass
+class AdmissionRule:
+    """Regra aplicada pelo middleware a um método + rota exata"""
+    method: str
+    path: str
+    limiter: Optional[TokenBucketLimiter] = None
+    gate: Optional[ConcurrencyGate] = None
+    exempt_staff: bool = True
+
+
+def _parse_trusted_proxies(raw: str) -> List:
+    networks = []
+    for item in raw.split(","):
+        item = item.strip()
+        if item:
+            networks.append(ipaddress.ip_network(item, strict=False))
+    return networks
+
+
+# Proxies/ingress confiáveis (IPs ou CIDRs separados por vírgula). Sem esta
+# configuração o X-Forwarded-For é ignorado: qualquer cliente poderia forjá-lo.
+TRUSTED_PROXIES = _parse_trusted_proxies(os.environ.get("NUCLEO_TRUSTED_PROXIES", ""))
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def get_client_ip(scope) -> str:
+    """
+    IP do cliente: o par direto da conexão. Só quando ele é um proxy
+    confiável (NUCLEO_TRUSTED_PROXIES) o X-Forwarded-For é considerado,
+    usando o endereço mais à direita que não seja de um proxy confiável.
+    """
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    if not TRUSTED_PROXIES or not _is_trusted_proxy(peer):
+        return peer
+
+    forwarded = []
+    for name, value in scope.get("headers") or []:
+        if name == b"x-forwarded-for":
+            forwarded.extend(part.strip() for part in value.decode("latin-1").split(","))
+    for address in reversed([a for a in forwarded if a]):
+        if not _is_trusted_proxy(address):
+            return address
+    return peer
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI que aplica rate limit e limite de concorrência por rota"""
+
+    def __init__(self, app, rules: List[AdmissionRule], is_staff: Optional[Callable[[str], bool]] = None):
+        self.app = app
+        self.rules = {(r.method.upper(), r.path): r for r in rules}
+        self.is_staff = is_staff
+
+    def _staff_request(self, scope) -> bool:
+        if not self.is_staff:
+            return False
+        for name, value in scope.get("headers") or []:
+            if name == b"authorization":
+                auth = value.decode("latin-1")
+                if auth.lower().startswith("bearer "):
+                    return self.is_staff(auth[7:].strip())
+        return False
+
+    async def _reject(self, send, status_code: int, detail: str, retry_after: int):
+        body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        rule = self.rules.get((scope["method"], scope["path"]))
+        if rule is None or (rule.exempt_staff and self._staff_request(scope)):
+            return await self.app(scope, receive, send)
+
+        if rule.limiter:
+            allowed, retry_after = rule.limiter.check(get_client_ip(scope))
+            if not allowed:
+                record_rejection(rule.limiter.name, "rate_limited")
+                return await self._reject(send, 429, "Muitas requisições. Tente novamente em instantes.", retry_after)
+
+        if rule.gate:
+            if not await rule.gate.acquire():
+                record_rejection(rule.gate.name, "overloaded")
+                return await self._reject(send, 503, "Servidor ocupado. Tente novamente em instantes.", 1)
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                rule.gate.release()
+
+        return await self.app(scope, receive, send)
@@ -1,39 +1,95 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Request
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from dotenv import load_dotenv
-from starlette.middleware.cors import CORSMiddleware
-from starlette.concurrency import run_in_threadpool
+# Linha do tempo da inicialização (deve ser o primeiro import)
+from startup_profile import startup_timeline, lazy_import
+
+with startup_timeline.step("fastapi", "import"):
+    from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Request, WebSocket, WebSocketDisconnect
+    from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+    from fastapi.responses import FileResponse, StreamingResponse, Response
+    from dotenv import load_dotenv
+    from starlette.middleware.cors import CORSMiddleware
+    from starlette.concurrency import run_in_threadpool
+    from pydantic import BaseModel, Field, ConfigDict
 import os
+import io
+import asyncio
 import logging
 import time
 import traceback
 import subprocess
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
-import jwt
-from PIL import Image
 import shutil
-import httpx
+# jwt, PIL e httpx são importados no primeiro uso (lazy_import)
 
-# Banco de dados SQLite - ÚNICA fonte de dados
-import database as sqlite_db
+with startup_timeline.step("database", "import"):
+    # Banco de dados SQLite - ÚNICA fonte de dados (cria as tabelas ao importar)
+    import database as sqlite_db
 
-# Sistema de bugs e fila de requisições
-import bug_tracker
+with startup_timeline.step("bug_tracker, jobs", "import"):
+    # Sistema de bugs e fila de requisições
+    import bug_tracker
 
-# Sistema de notificações WhatsApp
-import whatsapp_notifications
+    # Jobs em segundo plano (sobre a fila de requisições)
+    from jobs import job_manager, JobContext
+    from bug_tracker import Priority
+
+with startup_timeline.step("modulos internos", "import"):
+    # Sistema de notificações WhatsApp
+    import whatsapp_notifications
+
+    # Estatísticas agregadas das telas (cache pela versão dos dados)
+    from dashboard_stats import stats_cache
+
+    # Serialização JSON rápida para endpoints de listagem
+    from fast_json import parse_fields, trusted_response, trusted_rows, dumps as fast_dumps, FastJSONResponse, json_normalizer
+
+    # Canal de eventos em tempo real (SSE/WebSocket)
+    from event_hub import event_hub, parse_topics, pedido_summary, TOPIC_PEDIDOS
+
+    # Status dos pedidos em memória (acompanhamento do cardápio público)
+    from pedido_status import pedido_status_map
+
+    # Número de workers (estado do chatbot compartilhado via state_store)
+    from state_store import get_worker_count, acquire_primary_role
+
+    # Métricas em processo (Prometheus)
+    import metrics
+
+    # Controle de admissão e rate limiting das rotas públicas
+    from rate_limit import (
+        AdmissionMiddleware, AdmissionRule, ConcurrencyGate, TokenBucketLimiter,
+        check_rate_limit, get_rejection_stats
+    )
+
+with startup_timeline.step("imagens, uploads, estaticos", "import"):
+    # Fotos de produtos: variantes responsivas geradas em pool de threads
+    from image_pipeline import (
+        backfill_variants, fallback_for_variant, image_variants, is_variant_file, process_product_upload,
+        shutdown_executor as shutdown_image_executor
+    )
+    from image_server import ImageServer
+
+    # Uploads endereçados por conteúdo (deduplicação e coleta de órfãos)
+    from upload_store import adopt_content_name, collect_garbage, migrate_directory, referenced_names, staging_name
+
+    # Build do frontend servido com manifesto em memória e cache imutável
+    from static_assets import StaticAssetManifest
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Inicializar o banco SQLite
-sqlite_db.init_database()
+# Diretório das fotos de produtos (upload e variantes)
+PRODUCT_UPLOAD_DIR = Path("/app/backend/uploads/products")
+# Logos da empresa
+COMPANY_UPLOAD_DIR = ROOT_DIR / "uploads" / "company"
+
+# Entrega das imagens com validação e cache LRU em memória
+product_images = ImageServer(PRODUCT_UPLOAD_DIR)
+company_images = ImageServer(COMPANY_UPLOAD_DIR)
 
 # ==================== INICIAR SERVIÇO WHATSAPP ====================
 def start_whatsapp_service():
@@ -74,8 +130,6 @@ def start_whatsapp_service():
     except Exception as e:
         print(f"[SERVER] Erro ao iniciar serviço WhatsApp: {e}")
 
-# Iniciar serviço WhatsApp junto com o backend
-start_whatsapp_service()
 # ================================================================
 
 app = FastAPI()
@@ -88,6 +142,7 @@ ALGORITHM = "HS256"
 async def db_call(fn, *args, **kwargs):
     """Executa função SQLite síncrona em thread pool"""
     start_time = time.time()
+    metrics.DB_CALL_IN_FLIGHT.inc()
     try:
         result = await run_in_threadpool(fn, *args, **kwargs)
         duration = (time.time() - start_time) * 1000
@@ -116,6 +171,9 @@ async def db_call(fn, *args, **kwargs):
             stack_trace=traceback.format_exc()
         )
         raise
+    finally:
+        metrics.DB_CALL_IN_FLIGHT.dec()
+        metrics.DB_CALL_SECONDS.observe(time.time() - start_time, function=fn.__name__)
 
 # Models
 class UserCreate(BaseModel):
@@ -443,6 +501,16 @@ class Product(BaseModel):
     card_order: str = "combo_first"  # "combo_first" ou "simple_first"
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+
+# recipe/order_steps são servidos crus (trusted_rows): gravados com os defaults
+# de RecipeIngredient/OrderStep; produtos antigos são normalizados uma vez no
+# startup (aumente a versão quando os defaults desses modelos mudarem)
+PRODUCT_JSON_NORMALIZATION_VERSION = "1"
+PRODUCT_JSON_NORMALIZERS = {
+    "recipe": json_normalizer(List[RecipeIngredient]),
+    "order_steps": json_normalizer(List[OrderStep]),
+}
+
 # ========== BUSINESS HOURS MODELS ==========
 class BusinessHourUpdate(BaseModel):
     day_of_week: int
@@ -491,10 +559,67 @@ def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=7)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = lazy_import("jwt").encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class AuthUserCache:
+    """
+    Cache TTL limitado (LRU) de usuários autenticados, indexado pelo token.
+    Evita ir ao SQLite em cada requisição autenticada (polling dos terminais).
+    Deve ser invalidado sempre que o usuário for alterado ou removido.
+    ttl_seconds <= 0 desliga o cache (toda requisição lê o usuário do banco).
+    """
+    
+    def __init__(self, ttl_seconds: float = 60, max_size: int = 512):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, token: str) -> Optional[User]:
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return user
+    
+    def set(self, token: str, user: User):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (time.monotonic() + self.ttl_seconds, user)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate_user(self, user_id: str):
+        """Remove todas as entradas (tokens) de um usuário"""
+        with self._lock:
+            for token in [t for t, (_, u) in self._entries.items() if u.id == user_id]:
+                del self._entries[token]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Com vários workers, invalidate_user só limparia o processo que atendeu a
+# requisição: usuário removido/rebaixado/com senha trocada continuaria válido
+# nos demais. A revogação tem que valer na hora, então o cache fica desligado.
+auth_user_cache = AuthUserCache(
+    ttl_seconds=0 if get_worker_count() > 1 else float(os.environ.get("NUCLEO_AUTH_CACHE_TTL", "60"))
+)
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    jwt = lazy_import("jwt")
     try:
         token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -502,6 +627,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
         
+        # Token já verificado (assinatura e expiração) - tentar o cache
+        cached = auth_user_cache.get(token)
+        if cached is not None:
+            return cached
+        
         # Usar SQLite
         user = await db_call(sqlite_db.get_user_by_id, user_id)
         if user is None:
@@ -511,7 +641,9 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if isinstance(user.get('created_at'), str):
             user['created_at'] = datetime.fromisoformat(user['created_at'].replace('Z', '+00:00'))
         
-        return User(**user)
+        current_user = User(**user)
+        auth_user_cache.set(token, current_user)
+        return current_user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except Exception as e:
@@ -534,6 +666,30 @@ async def log_audit(action: str, resource_type: str, resource_name: str, user: U
     }
     await db_call(sqlite_db.create_audit_log, audit_data)
 
+
+def is_staff_token(token: str) -> bool:
+    """Token JWT válido de funcionário - requisições da equipe não são limitadas"""
+    try:
+        lazy_import("jwt").decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return True
+    except Exception:
+        return False
+
+
+def is_staff_request(request: Request) -> bool:
+    """Requisição autenticada da equipe (Authorization: Bearer válido)"""
+    auth = request.headers.get("authorization", "")
+    return auth.lower().startswith("bearer ") and is_staff_token(auth[7:].strip())
+
+
+def list_fields(fields: Optional[str], model) -> Optional[List[str]]:
+    """Projeção ?fields= de uma listagem (400 para campos fora do modelo de resposta)"""
+    try:
+        return parse_fields(fields, model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 def check_role(user: User, allowed_roles: List[str]):
     """Verifica se o usuário tem permissão baseada no role"""
     if user.role not in allowed_roles:
@@ -543,13 +699,16 @@ def check_role(user: User, allowed_roles: List[str]):
         )
 
 
-async def update_recipe_costs_for_ingredient(ingredient_id: str):
+def recalculate_recipe_costs(ingredient_id: Optional[str] = None) -> int:
     """
-    Atualiza o custo de todas as receitas que usam um determinado ingrediente.
-    Quando o preço de um ingrediente muda, todas as receitas que o usam
-    devem ter seu custo recalculado e enviado para o ingrediente linkado no estoque.
+    Atualiza o custo das receitas que usam um determinado ingrediente (ou de
+    todas, se ingredient_id for None). Quando o preço de um ingrediente muda,
+    todas as receitas que o usam devem ter seu custo recalculado e enviado
+    para o ingrediente linkado no estoque.
+    Executado em segundo plano pelo job "recalcular_custos_receitas".
     """
-    products = await db_call(sqlite_db.get_all_products)
+    products = sqlite_db.get_all_products()
+    updated = 0
     
     for product in products:
         # Verificar se é uma receita e usa o ingrediente
@@ -557,15 +716,13 @@ async def update_recipe_costs_for_ingredient(ingredient_id: str):
             continue
             
         recipe = product.get("recipe", [])
-        uses_ingredient = any(r.get("ingredient_id") == ingredient_id for r in recipe)
-        
-        if not uses_ingredient:
+        if ingredient_id and not any(r.get("ingredient_id") == ingredient_id for r in recipe):
             continue
         
         # Recalcular CMV da receita
         cmv = 0.0
         for recipe_item in recipe:
-            ingredient = await db_call(sqlite_db.get_ingredient_by_id, recipe_item.get("ingredient_id"))
+            ingredient = sqlite_db.get_ingredient_by_id(recipe_item.get("ingredient_id"))
             if ingredient:
                 avg_price = ingredient.get("average_price", 0)
                 quantity = recipe_item.get("quantity", 0)
@@ -583,24 +740,27 @@ async def update_recipe_costs_for_ingredient(ingredient_id: str):
         unit_cost = cmv / recipe_yield if recipe_yield > 0 else cmv
         
         # Atualizar o produto
-        await db_call(sqlite_db.update_product, product["id"], {
+        sqlite_db.update_product(product["id"], {
             "cmv": cmv,
             "unit_cost": unit_cost
         })
+        updated += 1
         
         # Se tiver ingrediente linkado, atualizar o preço médio no estoque
         linked_ingredient_id = product.get("linked_ingredient_id")
         if linked_ingredient_id:
             # Registrar o custo como uma "compra virtual" para o ingrediente
-            await update_linked_ingredient_price(linked_ingredient_id, unit_cost)
+            update_linked_ingredient_price(linked_ingredient_id, unit_cost)
+    
+    return updated
 
 
-async def update_linked_ingredient_price(ingredient_id: str, new_cost: float):
+def update_linked_ingredient_price(ingredient_id: str, new_cost: float):
     """
     Atualiza o preço médio de um ingrediente linkado a uma receita.
     Armazena os últimos 5 custos e faz a média.
     """
-    ingredient = await db_call(sqlite_db.get_ingredient_by_id, ingredient_id)
+    ingredient = sqlite_db.get_ingredient_by_id(ingredient_id)
     if not ingredient:
         return
     
@@ -623,12 +783,17 @@ async def update_linked_ingredient_price(ingredient_id: str, new_cost: float):
         avg_cost = new_cost
     
     # Atualizar ingrediente
-    await db_call(sqlite_db.update_ingredient, ingredient_id, {
+    sqlite_db.update_ingredient(ingredient_id, {
         "average_price": avg_cost,
         "recipe_cost_history": cost_history
     })
 
 
+async def schedule_recipe_costs_update(ingredient_id: str):
+    """Agenda o recálculo das receitas que usam o ingrediente (não bloqueia a requisição)"""
+    await db_call(job_manager.submit, "recalcular_custos_receitas", {"ingredient_id": ingredient_id}, trigger="purchase")
+
+
 # Auth endpoints
 @api_router.post("/auth/register", response_model=Token)
 async def register(user_data: UserCreate):
@@ -862,6 +1027,7 @@ async def update_user_role(user_id: str, role_data: UserManagementUpdate, curren
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     
     await db_call(sqlite_db.update_user, user_id, {"role": role_data.role})
+    auth_user_cache.invalidate_user(user_id)
     
     # Registrar auditoria
     await log_audit("UPDATE", "user", user["username"], current_user, "media", {"new_role": role_data.role})
@@ -880,6 +1046,7 @@ async def change_password(password_data: ChangePassword, current_user: User = De
     
     # Atualizar senha (será hasheada automaticamente)
     await db_call(sqlite_db.update_user, current_user.id, {"password": password_data.new_password})
+    auth_user_cache.invalidate_user(current_user.id)
     
     return {"message": "Senha alterada com sucesso"}
 
@@ -895,6 +1062,7 @@ async def delete_user(user_id: str, current_user: User = Depends(get_current_use
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     
     await db_call(sqlite_db.delete_user, user_id)
+    auth_user_cache.invalidate_user(user_id)
     
     # Registrar auditoria
     await log_audit("DELETE", "user", user["username"], current_user, "alta")
@@ -1039,24 +1207,7 @@ async def toggle_ingredient_active(ingredient_id: str, current_user: User = Depe
 @api_router.get("/ingredients/stats/stock-value")
 async def get_stock_value(current_user: User = Depends(get_current_user)):
     """Retorna o valor total em estoque (quantidade * preço médio)"""
-    ingredients = await db_call(sqlite_db.get_all_ingredients)
-    
-    total_value = 0
-    items_count = 0
-    
-    for ing in ingredients:
-        if ing.get("is_active", 1):
-            qty = ing.get("stock_quantity", 0) or 0
-            price = ing.get("average_price", 0) or 0
-            total_value += qty * price
-            if qty > 0:
-                items_count += 1
-    
-    return {
-        "total_value": total_value,
-        "items_with_stock": items_count,
-        "total_items": len([i for i in ingredients if i.get("is_active", 1)])
-    }
+    return await db_call(stats_cache.get, "stock_value")
 
 
 @api_router.delete("/ingredients/{ingredient_id}")
@@ -1149,7 +1300,7 @@ async def create_purchase_batch(batch_data: PurchaseBatchCreate, current_user: U
         })
         
         # Atualizar custo das receitas que usam este ingrediente
-        await update_recipe_costs_for_ingredient(item.ingredient_id)
+        await schedule_recipe_costs_update(item.ingredient_id)
     
     # Criar despesa vinculada à compra
     expense_id = None
@@ -1258,7 +1409,7 @@ async def update_purchase_batch(batch_id: str, batch_data: PurchaseBatchCreate,
         await db_call(sqlite_db.update_ingredient, ingredient_id, {"average_price": avg_price})
         
         # Atualizar custo das receitas que usam este ingrediente
-        await update_recipe_costs_for_ingredient(ingredient_id)
+        await schedule_recipe_costs_update(ingredient_id)
     
     # Registrar auditoria
     await log_audit("UPDATE", "purchase", f"Lote de {batch_data.supplier}", current_user, "media", {"items": len(purchases_created)})
@@ -1300,7 +1451,7 @@ async def create_purchase(purchase_data: PurchaseCreate, current_user: User = De
     await db_call(sqlite_db.update_ingredient, purchase_data.ingredient_id, {"average_price": avg_price})
     
     # Atualizar custo das receitas que usam este ingrediente
-    await update_recipe_costs_for_ingredient(purchase_data.ingredient_id)
+    await schedule_recipe_costs_update(purchase_data.ingredient_id)
     
     purchase["purchase_date"] = purchase_date
     return Purchase(**purchase)
@@ -1348,10 +1499,7 @@ async def get_purchases_grouped(current_user: User = Depends(get_current_user)):
 @api_router.get("/purchases", response_model=List[Purchase])
 async def get_purchases(current_user: User = Depends(get_current_user)):
     purchases = await db_call(sqlite_db.get_all_purchases)
-    for p in purchases:
-        if isinstance(p["purchase_date"], str):
-            p["purchase_date"] = datetime.fromisoformat(p["purchase_date"].replace('Z', '+00:00'))
-    return purchases
+    return trusted_response(purchases, Purchase)
 
 @api_router.delete("/purchases/{purchase_id}")
 async def delete_purchase(purchase_id: str, current_user: User = Depends(get_current_user)):
@@ -1545,39 +1693,38 @@ async def create_product(product_data: ProductCreate, current_user: User = Depen
     return Product(**product_dict)
 
 @api_router.get("/products", response_model=List[Product])
-async def get_products(current_user: User = Depends(get_current_user)):
-    products = await db_call(sqlite_db.get_all_products)
-    for p in products:
-        if isinstance(p.get("created_at"), str):
-            p["created_at"] = datetime.fromisoformat(p["created_at"].replace('Z', '+00:00'))
-    return products
+async def get_products(fields: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """Lista produtos; ?fields=id,name,sale_price limita as colunas lidas"""
+    selected = list_fields(fields, Product)
+    products = await db_call(sqlite_db.get_all_products, raw_json=True, columns=selected)
+    return trusted_response(products, Product, selected)
 
 # Endpoint PÚBLICO para o cardápio - não requer autenticação
 @api_router.get("/public/products", response_model=List[Product])
-async def get_public_products():
+async def get_public_products(fields: Optional[str] = None):
     """Retorna produtos para venda no cardápio público (não requer autenticação)"""
-    products = await db_call(sqlite_db.get_all_products)
+    selected = list_fields(fields, Product)
+    columns = selected and selected + ["sale_price", "is_insumo"]
+    products = await db_call(sqlite_db.get_all_products, raw_json=True, columns=columns)
     # Filtra apenas produtos com preço de venda e que não são insumos
     products = [p for p in products if p.get("sale_price") and p.get("sale_price") > 0 and not p.get("is_insumo")]
-    for p in products:
-        if isinstance(p.get("created_at"), str):
-            p["created_at"] = datetime.fromisoformat(p["created_at"].replace('Z', '+00:00'))
-    return products
+    return trusted_response(products, Product, selected)
 
 @api_router.get("/products/for-sale", response_model=List[Product])
-async def get_products_for_sale(current_user: User = Depends(get_current_user)):
+async def get_products_for_sale(fields: Optional[str] = None, current_user: User = Depends(get_current_user)):
     """Retorna apenas produtos para venda (não insumos)"""
-    products = await db_call(sqlite_db.get_all_products)
+    selected = list_fields(fields, Product)
+    columns = selected and selected + ["is_insumo"]
+    products = await db_call(sqlite_db.get_all_products, raw_json=True, columns=columns)
     products = [p for p in products if not p.get("is_insumo")]
-    for p in products:
-        if isinstance(p.get("created_at"), str):
-            p["created_at"] = datetime.fromisoformat(p["created_at"].replace('Z', '+00:00'))
-    return products
+    return trusted_response(products, Product, selected)
 
 @api_router.get("/public/products/all")
 async def get_all_products_public():
     """Retorna TODOS os produtos (incluindo insumos) para buscar fotos, preços, descrições e disponibilidade - público"""
-    products = await db_call(sqlite_db.get_all_products)
+    products = await db_call(
+        sqlite_db.get_all_products, columns=["id", "photo_url", "sale_price", "description", "available"]
+    )
     # Retorna id, photo_url, sale_price, description e available para sincronização
     return [{"id": p.get("id"), "photo_url": p.get("photo_url"), "sale_price": p.get("sale_price", 0), "description": p.get("description", ""), "available": p.get("available", True)} for p in products]
 
@@ -1668,61 +1815,44 @@ async def update_product(product_id: str, product_data: ProductCreate, current_u
 
 @api_router.post("/upload/product-photo")
 async def upload_product_photo(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
-    # Criar diretório para uploads se não existir
-    upload_dir = Path("/app/backend/uploads/products")
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
     # Validar tipo de arquivo
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    # Gerar nome único
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = upload_dir / unique_filename
+    # PNG mantém a extensão (o frontend usa para exibir com fundo transparente);
+    # o conteúdo gravado é sempre JPEG, como antes
+    file_extension = "png" if file.filename.lower().endswith(".png") else "jpg"
+    source = await file.read()
     
-    # Salvar arquivo temporário
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Redimensionar imagem para 1080x1080
+    # Redimensionar e gerar variantes (thumb/medium/full, JPEG e WebP) fora do event loop
+    staged = staging_name(file_extension)
     try:
-        img = Image.open(file_path)
-        img = img.convert("RGB")
-        img.thumbnail((1080, 1080), Image.Resampling.LANCZOS)
-        
-        # Criar canvas quadrado
-        if img.size[0] != img.size[1]:
-            size = max(img.size)
-            new_img = Image.new("RGB", (size, size), (255, 255, 255))
-            offset = ((size - img.size[0]) // 2, (size - img.size[1]) // 2)
-            new_img.paste(img, offset)
-            img = new_img
-        
-        img.save(file_path, "JPEG", quality=85)
+        await process_product_upload(source, PRODUCT_UPLOAD_DIR, staged)
     except Exception as e:
-        os.remove(file_path)
         raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
     
-    # Retornar URL relativa
-    return {"photo_url": f"/uploads/products/{unique_filename}"}
+    # Nome pelo hash do JPEG gravado: a mesma foto reaproveita o arquivo existente
+    filename = await run_in_threadpool(adopt_content_name, PRODUCT_UPLOAD_DIR, staged)
+    
+    # Retornar URL relativa (+ variantes para srcset)
+    photo_url = f"/uploads/products/{filename}"
+    return {"photo_url": photo_url, "variants": image_variants(photo_url)}
 
-# Endpoint para servir imagens de produtos
+# Endpoint para servir imagens de produtos (ETag, 304, Range e cache em memória)
 @api_router.get("/uploads/products/{filename}")
-async def serve_product_image(filename: str):
-    file_path = Path(f"/app/backend/uploads/products/{filename}")
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(file_path)
+async def serve_product_image(filename: str, request: Request):
+    name = Path(filename).name
+    # Foto antiga sem variantes ainda: servir o original
+    fallback = None
+    if is_variant_file(name) and not (PRODUCT_UPLOAD_DIR / name).exists():
+        fallback = fallback_for_variant(PRODUCT_UPLOAD_DIR, name)
+    return await product_images.response(request, name, fallback=fallback)
 
 
 @api_router.get("/uploads/company/{filename}")
-async def serve_company_image(filename: str):
+async def serve_company_image(filename: str, request: Request):
     """Servir imagens da empresa (logo)"""
-    file_path = Path(f"/app/backend/uploads/company/{filename}")
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(file_path)
+    return await company_images.response(request, filename)
 
 
 @api_router.delete("/products/{product_id}")
@@ -1998,7 +2128,7 @@ async def get_expenses(current_user: User = Depends(get_current_user)):
 @api_router.get("/expenses/stats", response_model=ExpenseStats)
 async def get_expenses_stats(current_user: User = Depends(get_current_user)):
     """Retorna estatísticas das despesas"""
-    stats = await db_call(sqlite_db.get_expenses_stats)
+    stats = await db_call(stats_cache.get, "expenses")
     return ExpenseStats(**stats)
 
 
@@ -2263,18 +2393,12 @@ async def delete_expense(expense_id: str, delete_children: bool = False, current
 
 # ==================== CLIENTE ENDPOINTS ====================
 @api_router.get("/clientes", response_model=List[Cliente])
-async def get_clientes(current_user: User = Depends(get_current_user)):
-    """Lista todos os clientes"""
-    # Recalcular estatísticas baseado nos pedidos reais
-    await db_call(sqlite_db.recalculate_all_cliente_stats)
-    
-    clientes = await db_call(sqlite_db.get_all_clientes)
-    result = []
-    for c in clientes:
-        if isinstance(c.get("created_at"), str):
-            c["created_at"] = datetime.fromisoformat(c["created_at"].replace('Z', '+00:00'))
-        result.append(Cliente(**c))
-    return result
+async def get_clientes(fields: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """Lista todos os clientes; ?fields=id,nome,telefone limita as colunas lidas"""
+    # Estatísticas são recalculadas pelo job "recalcular_estatisticas_clientes"
+    selected = list_fields(fields, Cliente)
+    clientes = await db_call(sqlite_db.get_all_clientes, columns=selected)
+    return trusted_response(clientes, Cliente, selected)
 
 
 @api_router.get("/clientes/{cliente_id}", response_model=Cliente)
@@ -2312,6 +2436,8 @@ class ClientePublicCreate(BaseModel):
 @api_router.post("/public/clientes", response_model=Cliente)
 async def create_cliente_public(cliente_data: ClientePublicCreate):
     """Cria um novo cliente (público - para cadastro pelo cardápio)"""
+    check_rate_limit(public_clientes_phone_limiter, ''.join(filter(str.isdigit, cliente_data.telefone)))
+    
     # Verificar se telefone já existe
     existing = await db_call(sqlite_db.get_cliente_by_telefone, cliente_data.telefone)
     if existing:
@@ -2885,15 +3011,28 @@ class PedidoResponse(BaseModel):
     entregador_nome: Optional[str] = None
     motivo_cancelamento: Optional[str] = None
     valor_entrega: Optional[float] = 0
+    despachado_em: Optional[str] = None
+    entregue_em: Optional[str] = None
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
 
+def publish_pedido_event(event_type: str, pedido: Optional[dict]):
+    """Publica a mudança de um pedido no canal de eventos e no mapa de status"""
+    if pedido:
+        pedido_status_map.set(pedido)
+        event_hub.publish(TOPIC_PEDIDOS, event_type, pedido_summary(pedido))
+
+
 @api_router.get("/pedidos", response_model=List[PedidoResponse])
-async def get_all_pedidos():
-    """Retorna todos os pedidos (público para sincronização)"""
-    pedidos = await db_call(sqlite_db.get_all_pedidos)
-    return pedidos
+async def get_all_pedidos(fields: Optional[str] = None):
+    """
+    Retorna todos os pedidos (público para sincronização).
+    ?fields=id,codigo,total,status evita ler e serializar o JSON de items.
+    """
+    selected = list_fields(fields, PedidoResponse)
+    pedidos = await db_call(sqlite_db.get_all_pedidos, raw_json=True, columns=selected)
+    return trusted_response(pedidos, PedidoResponse, selected)
 
 
 @api_router.get("/pedidos/{pedido_id}", response_model=PedidoResponse)
@@ -2915,8 +3054,11 @@ async def get_pedido_by_codigo(codigo: str):
 
 
 @api_router.post("/pedidos", response_model=PedidoResponse)
-async def create_pedido(data: PedidoCreate):
+async def create_pedido(data: PedidoCreate, request: Request):
     """Cria um novo pedido (público para cardápio)"""
+    if not is_staff_request(request):
+        check_rate_limit(pedidos_cliente_limiter, data.cliente_id or data.cliente_telefone)
+    
     # Verificar configuração de aceite automático
     settings = await db_call(sqlite_db.get_all_settings)
     aceite_automatico = settings.get('aceite_automatico', 'false').lower() == 'true'
@@ -2976,6 +3118,7 @@ async def create_pedido(data: PedidoCreate):
             delay_seconds=None  # Usa o delay do template
         )
     
+    publish_pedido_event("created", pedido)
     return pedido
 
 
@@ -2985,6 +3128,7 @@ async def update_pedido(pedido_id: str, data: PedidoUpdate):
     pedido = await db_call(sqlite_db.update_pedido, pedido_id, data.model_dump(exclude_none=True))
     if not pedido:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
+    publish_pedido_event("updated", pedido)
     return pedido
 
 
@@ -3003,6 +3147,11 @@ async def update_pedido_status(pedido_id: str, status: str):
     if pedido.get('cliente_telefone') and status not in ['cancelado']:
         whatsapp_notifications.schedule_order_notification(pedido_id, status, delay_seconds=None)
     
+    # Pedido cancelado sai das estatísticas do cliente
+    if status == 'cancelado':
+        await db_call(job_manager.submit, "recalcular_estatisticas_clientes", trigger="pedido_cancelled")
+    
+    publish_pedido_event("status", pedido)
     return pedido
 
 
@@ -3029,6 +3178,10 @@ async def cancel_pedido(pedido_id: str, data: CancelPedidoRequest, current_user:
             motivo=data.motivo.strip()
         )
     
+    # Pedido cancelado sai das estatísticas do cliente
+    await db_call(job_manager.submit, "recalcular_estatisticas_clientes", trigger="pedido_cancelled")
+    
+    publish_pedido_event("cancelled", pedido)
     return pedido
 
 
@@ -3039,14 +3192,168 @@ async def delete_pedido(pedido_id: str, current_user: User = Depends(get_current
     deleted = await db_call(sqlite_db.delete_pedido, pedido_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
+    pedido_status_map.remove(pedido_id)
+    event_hub.publish(TOPIC_PEDIDOS, "deleted", {"id": pedido_id})
+    # Estatísticas do cliente (pedidos_count, total_gasto) são recalculadas em segundo plano
+    await db_call(job_manager.submit, "recalcular_estatisticas_clientes", trigger="pedido_deleted")
     return {"message": "Pedido deletado com sucesso"}
 
 
+# Tempo máximo de espera do long-poll de status (segundos)
+PEDIDO_STATUS_MAX_WAIT = 25
+
+
+async def _load_pedido_status(pedido_id: str) -> dict:
+    """Status do mapa em memória; na falta, consulta leve no banco"""
+    entry = pedido_status_map.get(pedido_id)
+    if entry is None:
+        row = await db_call(sqlite_db.get_pedido_status, pedido_id)
+        if not row:
+            raise HTTPException(status_code=404, detail="Pedido não encontrado")
+        entry = pedido_status_map.set(row)
+    return entry
+
+
+@api_router.get("/public/pedidos/{pedido_id}/status")
+async def get_public_pedido_status(pedido_id: str, request: Request, wait: int = 0):
+    """
+    Status de um pedido para o acompanhamento do cardápio público.
+    Suporta If-None-Match (304 quando nada mudou) e long-poll: com `wait=N`
+    e o ETag atual, a requisição aguarda até N segundos por uma mudança.
+    """
+    entry = await _load_pedido_status(pedido_id)
+    if_none_match = request.headers.get("if-none-match")
+    wait = max(0, min(wait, PEDIDO_STATUS_MAX_WAIT))
+    if pedido_status_map.max_age_seconds:
+        # Multi-worker: a mudança pode vir de outro processo, reler com frequência
+        wait = min(wait, int(pedido_status_map.max_age_seconds))
+
+    if wait and if_none_match == entry["etag"]:
+        entry = await pedido_status_map.wait_for_change(pedido_id, if_none_match, wait)
+        if entry is None:
+            entry = await _load_pedido_status(pedido_id)
+
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-store"}
+    if if_none_match == entry["etag"]:
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(pedido_status_map.public_view(entry), headers=headers)
+
+
 @api_router.get("/pedidos/cliente/{cliente_id}", response_model=List[PedidoResponse])
 async def get_pedidos_by_cliente(cliente_id: str):
     """Retorna todos os pedidos de um cliente"""
-    pedidos = await db_call(sqlite_db.get_pedidos_by_cliente, cliente_id)
-    return pedidos
+    pedidos = await db_call(sqlite_db.get_pedidos_by_cliente, cliente_id, raw_json=True)
+    return trusted_response(pedidos, PedidoResponse)
+
+
+# ========== EVENTOS EM TEMPO REAL (SSE / WEBSOCKET) ==========
+EVENTS_HEARTBEAT_SECONDS = 15
+
+
+def _resolve_event_cursor(cursor: Optional[int], last_event_id: Optional[str]) -> Optional[int]:
+    """Cursor explícito tem prioridade; senão usa o Last-Event-ID da reconexão"""
+    if cursor is not None:
+        return cursor
+    if last_event_id and last_event_id.strip().isdigit():
+        return int(last_event_id.strip())
+    return None
+
+
+def _initial_events(cursor: Optional[int], topics) -> List[dict]:
+    """Eventos perdidos desde o cursor (ou um reset se já saíram do buffer)"""
+    if cursor is None:
+        return []
+    backlog = event_hub.replay(cursor, topics)
+    if backlog is None:
+        return [{"id": event_hub.cursor, "topic": "*", "type": "reset", "data": {}}]
+    return [e.to_dict() for e in backlog]
+
+
+@api_router.get("/events/stream")
+async def events_stream(request: Request, topics: Optional[str] = None, cursor: Optional[int] = None):
+    """
+    Canal SSE com as mudanças de pedidos e da fila de espera.
+    O navegador reconecta sozinho enviando Last-Event-ID, e os eventos perdidos
+    no intervalo são reenviados a partir do buffer do hub.
+    """
+    topic_set = parse_topics(topics)
+    start = _resolve_event_cursor(cursor, request.headers.get("last-event-id"))
+    # Assinar antes do replay para não perder eventos entre os dois passos
+    sub = event_hub.subscribe(topic_set)
+    initial = _initial_events(start, topic_set)
+
+    def format_event(event: dict) -> str:
+        return f"id: {event['id']}\ndata: {fast_dumps(event).decode('utf-8')}\n\n"
+
+    async def generator():
+        last_sent = start or 0
+        try:
+            yield f"retry: 3000\nid: {event_hub.cursor if start is None else start}\n\n"
+            for event in initial:
+                last_sent = max(last_sent, event["id"])
+                yield format_event(event)
+            while True:
+                if await request.is_disconnected():
+                    break
+                event = await sub.get(timeout=EVENTS_HEARTBEAT_SECONDS)
+                if sub.overflowed:
+                    sub.overflowed = False
+                    yield format_event({"id": event_hub.cursor, "topic": "*", "type": "reset", "data": {}})
+                if event is None:
+                    yield ": ping\n\n"
+                    continue
+                if event.id <= last_sent:
+                    continue
+                last_sent = event.id
+                yield format_event(event.to_dict())
+        finally:
+            event_hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@api_router.websocket("/events/ws")
+async def events_websocket(websocket: WebSocket, topics: Optional[str] = None, cursor: Optional[int] = None):
+    """Mesmo canal de eventos via WebSocket (mensagens JSON)"""
+    await websocket.accept()
+    topic_set = parse_topics(topics)
+    sub = event_hub.subscribe(topic_set)
+    last_sent = cursor or 0
+    try:
+        for event in _initial_events(cursor, topic_set):
+            last_sent = max(last_sent, event["id"])
+            await websocket.send_text(fast_dumps(event).decode("utf-8"))
+        # Escuta o cliente em paralelo só para detectar a desconexão
+        receive_task = asyncio.ensure_future(websocket.receive())
+        while True:
+            event_task = asyncio.ensure_future(sub.get(timeout=EVENTS_HEARTBEAT_SECONDS))
+            await asyncio.wait({event_task, receive_task}, return_when=asyncio.FIRST_COMPLETED)
+            if receive_task.done():
+                event_task.cancel()
+                if receive_task.result().get("type") == "websocket.disconnect":
+                    break
+                receive_task = asyncio.ensure_future(websocket.receive())
+                continue
+            event = event_task.result()
+            if sub.overflowed:
+                sub.overflowed = False
+                await websocket.send_text(fast_dumps({"id": event_hub.cursor, "topic": "*", "type": "reset", "data": {}}).decode("utf-8"))
+            if event is None:
+                await websocket.send_text('{"type":"ping"}')
+                continue
+            if event.id <= last_sent:
+                continue
+            last_sent = event.id
+            await websocket.send_text(fast_dumps(event.to_dict()).decode("utf-8"))
+        receive_task.cancel()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        event_hub.unsubscribe(sub)
 
 
 # ========== ENTREGADORES ENDPOINTS ==========
@@ -3121,6 +3428,51 @@ async def get_pedidos_by_entregador(entregador_id: str):
     return pedidos
 
 
+@api_router.get("/entregadores/{entregador_id}/abertos")
+async def get_entregador_abertos(entregador_id: str):
+    """Entregador e seus pedidos em aberto (na_bag/em_rota) - tela do entregador"""
+    entregador = await db_call(sqlite_db.get_entregador_by_id, entregador_id)
+    if not entregador:
+        raise HTTPException(status_code=404, detail="Entregador não encontrado")
+    abertos = await db_call(sqlite_db.get_pedidos_abertos_entregador, entregador_id)
+    return FastJSONResponse({
+        "entregador": trusted_rows([entregador], EntregadorResponse)[0],
+        "abertos": abertos,
+    })
+
+
+@api_router.get("/entregadores/{entregador_id}/desempenho")
+async def get_entregador_desempenho(
+    entregador_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Desempenho do entregador calculado no banco: entregas por dia e por turno,
+    taxas, tempo médio de saída até a entrega, pedidos em aberto e a lista
+    paginada das entregas do período (padrão: hoje).
+    """
+    check_role(current_user, ["proprietario", "administrador"])
+    entregador = await db_call(sqlite_db.get_entregador_by_id, entregador_id)
+    if not entregador:
+        raise HTTPException(status_code=404, detail="Entregador não encontrado")
+    first_day, last_day, start_utc, end_utc = report_window(start, end, default_days=1)
+    limit = max(0, min(limit, 200))
+    offset = max(0, offset)
+    report = await db_call(
+        sqlite_db.get_entregador_desempenho, entregador_id, start_utc, end_utc, limit, offset
+    )
+    return FastJSONResponse({
+        "entregador": trusted_rows([entregador], EntregadorResponse)[0],
+        "start": first_day.isoformat(),
+        "end": last_day.isoformat(),
+        **report,
+    })
+
+
 @api_router.patch("/pedidos/{pedido_id}/entregador")
 async def assign_entregador_to_pedido(pedido_id: str, entregador_id: str, current_user: User = Depends(get_current_user)):
     """Atribui um entregador a um pedido e muda status para na_bag"""
@@ -3143,6 +3495,7 @@ async def assign_entregador_to_pedido(pedido_id: str, entregador_id: str, curren
     if entregador.get('telefone'):
         whatsapp_notifications.schedule_entregador_notification(pedido_id, entregador['telefone'])
     
+    publish_pedido_event("entregador", pedido)
     return pedido
 
 
@@ -3389,19 +3742,121 @@ async def get_price_history(ingredient_id: str, current_user: User = Depends(get
 
 @api_router.get("/reports/dashboard", response_model=DashboardStats)
 async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
-    total_ingredients = await db_call(sqlite_db.count_ingredients)
-    total_products = await db_call(sqlite_db.count_products)
-    total_purchases = await db_call(sqlite_db.count_purchases)
-    
-    products = await db_call(sqlite_db.get_all_products)
-    avg_cmv = sum(p.get("cmv", 0) for p in products) / len(products) if products else 0
-    
-    return DashboardStats(
-        total_ingredients=total_ingredients,
-        total_products=total_products,
-        total_purchases=total_purchases,
-        avg_cmv=avg_cmv
-    )
+    stats = await db_call(stats_cache.get, "dashboard")
+    return DashboardStats(**stats)
+
+
+# Relatório de vendas agregado no SQLite (ver database.get_sales_report)
+SALES_REPORT_MAX_DAYS = 3 * 366
+WEEKDAY_LABELS = ["Dom", "Seg", "Ter", "Qua", "Qui", "Sex", "Sáb"]
+SALES_SERIES_FIELDS = {
+    "order": ("pedidos", "faturamento", "ticket_medio", "taxa_entrega"),
+    "product": ("pedidos", "quantidade", "faturamento"),
+    # Sem pedidos distintos por categoria (ver database._item_row)
+    "category": ("quantidade", "faturamento"),
+}
+
+
+def report_window(start: Optional[str], end: Optional[str], default_days: int = 30):
+    """
+    Converte datas locais (YYYY-MM-DD, inclusive) nos limites UTC usados no
+    banco. Retorna (primeiro_dia, ultimo_dia, inicio_utc, fim_utc) ou 400.
+    """
+    offset = timedelta(minutes=sqlite_db.REPORT_UTC_OFFSET_MINUTES)
+    today = (datetime.now(timezone.utc) + offset).date()
+    try:
+        last_day = datetime.strptime(end, "%Y-%m-%d").date() if end else today
+        first_day = datetime.strptime(start, "%Y-%m-%d").date() if start else last_day - timedelta(days=default_days - 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Datas devem estar no formato YYYY-MM-DD")
+    if first_day > last_day:
+        raise HTTPException(status_code=400, detail="start deve ser anterior ou igual a end")
+    if (last_day - first_day).days >= SALES_REPORT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Intervalo máximo: {SALES_REPORT_MAX_DAYS} dias")
+
+    # Meia-noite local -> UTC (formato igual ao created_at gravado)
+    def to_utc(day):
+        return (datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc) - offset).isoformat()
+
+    return first_day, last_day, to_utc(first_day), to_utc(last_day + timedelta(days=1))
+
+
+def _sales_series(rows: List[Dict], group_by: str, first_day, last_day) -> Dict[str, list]:
+    """
+    Série compacta (colunas paralelas) a partir das linhas agregadas.
+    Dias, horas e dias da semana sem vendas entram com zero para os gráficos.
+    """
+    fields = SALES_SERIES_FIELDS.get(group_by, SALES_SERIES_FIELDS["order"])
+    by_key = {row["key"]: row for row in rows}
+
+    if group_by == "day":
+        keys = [(first_day + timedelta(days=i)).isoformat() for i in range((last_day - first_day).days + 1)]
+        labels = [datetime.strptime(k, "%Y-%m-%d").strftime("%d/%m") for k in keys]
+    elif group_by == "hour":
+        keys = list(range(24))
+        labels = [f"{h:02d}h" for h in keys]
+    elif group_by == "weekday":
+        keys = list(range(7))
+        labels = WEEKDAY_LABELS[:]
+    else:
+        keys = [row["key"] for row in rows]
+        labels = [row["label"] for row in rows]
+
+    series = {"keys": keys, "labels": labels}
+    for field in fields:
+        series[field] = [by_key[k][field] if k in by_key else 0 for k in keys]
+    return series
+
+
+@api_router.get("/reports/sales")
+async def get_sales_report(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    group_by: str = "day",
+    include_canceled: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Vendas agregadas no servidor por day, hour, weekday, product, category,
+    bairro, payment ou modulo. `start`/`end` são datas locais (YYYY-MM-DD,
+    inclusive); padrão: últimos 30 dias.
+    """
+    check_role(current_user, ["proprietario", "administrador"])
+    if group_by not in sqlite_db.SALES_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by deve ser um de: {', '.join(sqlite_db.SALES_GROUPS)}")
+
+    first_day, last_day, start_utc, end_utc = report_window(start, end)
+    report = await db_call(sqlite_db.get_sales_report, start_utc, end_utc, group_by, include_canceled)
+    return FastJSONResponse({
+        "start": first_day.isoformat(),
+        "end": last_day.isoformat(),
+        "group_by": group_by,
+        "tz_offset_minutes": sqlite_db.REPORT_UTC_OFFSET_MINUTES,
+        "source": report["source"],
+        "summary": report["summary"],
+        "series": _sales_series(report["rows"], group_by, first_day, last_day),
+    })
+
+
+@api_router.get("/reports/entregas")
+async def get_delivery_report(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Entregas concluídas, taxas e tempo médio de cada entregador ativo no período"""
+    check_role(current_user, ["proprietario", "administrador"])
+    first_day, last_day, start_utc, end_utc = report_window(start, end)
+    entregadores = await db_call(sqlite_db.get_entregas_por_entregador, start_utc, end_utc)
+    return FastJSONResponse({
+        "start": first_day.isoformat(),
+        "end": last_day.isoformat(),
+        "entregadores": entregadores,
+        "total": {
+            "entregas": sum(e["entregas"] for e in entregadores),
+            "taxa_entrega": round(sum(e["taxa_entrega"] for e in entregadores), 2),
+        },
+    })
 
 
 # Endpoint para verificar status do banco
@@ -3423,28 +3878,47 @@ async def get_backup_status(current_user: User = Depends(get_current_user)):
     }
 
 
-# Endpoint para forçar backup manual (agora retorna apenas status)
-@api_router.post("/backup/sync")
+# Endpoint para forçar backup manual em Excel (executado em segundo plano)
+@api_router.post("/backup/sync", status_code=202)
 async def force_backup_sync(current_user: User = Depends(get_current_user)):
-    """SQLite é persistente automaticamente"""
+    """Agenda a exportação do SQLite para o Excel de backup"""
     check_role(current_user, ["proprietario"])
-    return {"message": "SQLite é persistente por padrão - não necessita sincronização manual"}
+    run = await db_call(job_manager.submit, "backup_excel", trigger="manual")
+    return {"message": "Backup agendado", "job": run}
 
 
 # ==================== ENDPOINTS DE BUGS E SISTEMA ====================
 
 @api_router.get("/system/bugs")
-async def get_bugs(limit: int = 100, current_user: User = Depends(get_current_user)):
-    """Retorna lista de bugs registrados"""
+async def get_bugs(
+    limit: int = 100,
+    offset: int = 0,
+    status: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Retorna lista paginada de bugs registrados (agrupados por fingerprint)"""
     check_role(current_user, ["proprietario", "administrador"])
-    bugs = bug_tracker.get_all_bugs(limit=limit)
-    return {"bugs": bugs, "total": len(bugs)}
+    limit = max(1, min(limit, 500))
+    offset = max(0, offset)
+    bugs = await db_call(bug_tracker.get_all_bugs, limit=limit, offset=offset, status=status)
+    total = await db_call(bug_tracker.count_bugs, status=status)
+    return {"bugs": bugs, "total": total, "limit": limit, "offset": offset}
 
 @api_router.get("/system/requests-log")
-async def get_requests_log(limit: int = 200, current_user: User = Depends(get_current_user)):
-    """Retorna logs de requisições"""
+async def get_requests_log(
+    limit: int = 200,
+    endpoint: Optional[str] = None,
+    status: Optional[str] = None,
+    min_duration_ms: Optional[float] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Retorna logs de requisições (mais recentes primeiro, com filtros opcionais)"""
     check_role(current_user, ["proprietario", "administrador"])
-    logs = bug_tracker.get_request_logs(limit=limit)
+    limit = max(1, min(limit, 2000))
+    logs = await run_in_threadpool(
+        bug_tracker.get_request_logs,
+        limit=limit, endpoint=endpoint, status=status, min_duration_ms=min_duration_ms
+    )
     return {"logs": logs, "total": len(logs)}
 
 @api_router.get("/system/info")
@@ -3452,6 +3926,11 @@ async def get_system_info(current_user: User = Depends(get_current_user)):
     """Retorna informações do sistema"""
     check_role(current_user, ["proprietario", "administrador"])
     info = bug_tracker.get_system_info()
+    info['image_cache'] = {
+        'products': product_images.get_stats(),
+        'company': company_images.get_stats()
+    }
+    info['stats_cache'] = stats_cache.get_stats()
     
     # Adicionar info do banco
     info['database'] = {
@@ -3468,7 +3947,7 @@ async def get_system_info(current_user: User = Depends(get_current_user)):
 async def clear_all_bugs(current_user: User = Depends(get_current_user)):
     """Limpa todos os bugs"""
     check_role(current_user, ["proprietario"])
-    bug_tracker.clear_bugs()
+    await db_call(bug_tracker.clear_bugs)
     return {"message": "Todos os bugs foram limpos"}
 
 @api_router.post("/system/bugs/{bug_id}/status")
@@ -3477,7 +3956,8 @@ async def update_bug_status(bug_id: str, new_status: str, current_user: User = D
     check_role(current_user, ["proprietario", "administrador"])
     if new_status not in ['new', 'investigating', 'fixed', 'ignored']:
         raise HTTPException(status_code=400, detail="Status inválido")
-    bug_tracker.update_bug_status(bug_id, new_status)
+    if not await db_call(bug_tracker.update_bug_status, bug_id, new_status):
+        raise HTTPException(status_code=404, detail="Bug não encontrado")
     return {"message": f"Bug {bug_id} atualizado para {new_status}"}
 
 @api_router.post("/system/report-bug")
@@ -3497,6 +3977,230 @@ async def report_bug_manually(
     return {"message": "Bug reportado com sucesso", "bug_id": bug.id}
 
 
+# ==================== JOBS EM SEGUNDO PLANO ====================
+
+def _job_recalcular_estatisticas_clientes(ctx: JobContext):
+    return {"clientes": sqlite_db.recalculate_all_cliente_stats()}
+
+
+def _job_recalcular_custos_receitas(ctx: JobContext):
+    return {"receitas": recalculate_recipe_costs(ctx.params.get("ingredient_id"))}
+
+
+def _job_backup_excel(ctx: JobContext):
+    # pandas/openpyxl só são carregados quando o backup roda
+    from excel_backup import sync_sqlite_to_excel
+    if not sync_sqlite_to_excel():
+        raise RuntimeError("Falha ao sincronizar o backup Excel")
+    return {"ok": True}
+
+
+def _job_gerar_variantes_imagens(ctx: JobContext):
+    return backfill_variants(PRODUCT_UPLOAD_DIR, ctx)
+
+
+def _job_migrar_uploads(ctx: JobContext):
+    result = {
+        "products": migrate_directory(PRODUCT_UPLOAD_DIR, "/uploads/products/", sqlite_db.replace_upload_url, ctx),
+        "company": migrate_directory(COMPANY_UPLOAD_DIR, "/uploads/company/", sqlite_db.replace_upload_url, ctx),
+    }
+    # Variantes das fotos (já com os nomes novos)
+    job_manager.submit("gerar_variantes_imagens", trigger="migrar_uploads")
+    return result
+
+
+def _job_limpar_uploads_orfaos(ctx: JobContext):
+    urls = sqlite_db.get_upload_references()
+    dry_run = bool(ctx.params.get("dry_run"))
+    return {
+        "products": collect_garbage(PRODUCT_UPLOAD_DIR, referenced_names(urls, "/uploads/products/"), dry_run=dry_run),
+        "company": collect_garbage(COMPANY_UPLOAD_DIR, referenced_names(urls, "/uploads/company/"), dry_run=dry_run),
+    }
+
+
+def _job_limpar_historico_jobs(ctx: JobContext):
+    return {"removidos": sqlite_db.cleanup_job_runs(keep_days=30)}
+
+
+def _job_reconstruir_rollups_vendas(ctx: JobContext):
+    return sqlite_db.rebuild_sales_rollups()
+
+
+job_manager.register(
+    "recalcular_estatisticas_clientes", _job_recalcular_estatisticas_clientes,
+    description="Recalcula pedidos, total gasto e recorrência dos clientes a partir dos pedidos",
+    priority=Priority.LOW, schedule="*/15 * * * *"
+)
+job_manager.register(
+    "recalcular_custos_receitas", _job_recalcular_custos_receitas,
+    description="Recalcula o CMV das receitas (params: ingredient_id opcional)",
+    priority=Priority.MEDIUM, retry_backoff=5.0
+)
+job_manager.register(
+    "backup_excel", _job_backup_excel,
+    description="Exporta o banco SQLite para o Excel de backup",
+    priority=Priority.BACKGROUND, max_retries=1, retry_backoff=300.0, schedule="0 3 * * *"
+)
+job_manager.register(
+    "gerar_variantes_imagens", _job_gerar_variantes_imagens,
+    description="Gera as variantes thumb/medium/WebP das fotos de produtos existentes",
+    priority=Priority.BACKGROUND, max_retries=0
+)
+job_manager.register(
+    "migrar_uploads", _job_migrar_uploads,
+    description="Renomeia uploads antigos para o hash do conteúdo, unindo duplicatas",
+    priority=Priority.BACKGROUND, max_retries=0
+)
+job_manager.register(
+    "limpar_uploads_orfaos", _job_limpar_uploads_orfaos,
+    description="Remove fotos e logos sem referência (params: dry_run)",
+    priority=Priority.BACKGROUND, max_retries=0, schedule="0 4 * * *"
+)
+job_manager.register(
+    "limpar_historico_jobs", _job_limpar_historico_jobs,
+    description="Remove o histórico de execuções com mais de 30 dias",
+    priority=Priority.BACKGROUND, max_retries=0, schedule="30 4 * * *"
+)
+job_manager.register(
+    "reconstruir_rollups_vendas", _job_reconstruir_rollups_vendas,
+    description="Recalcula os totais de vendas por hora a partir de todos os pedidos",
+    priority=Priority.BACKGROUND, max_retries=0
+)
+
+
+class JobRunRequest(BaseModel):
+    params: Dict[str, Any] = {}
+
+
+@api_router.get("/system/jobs")
+async def list_jobs(current_user: User = Depends(get_current_user)):
+    """Jobs registrados, agendamentos e última execução"""
+    check_role(current_user, ["proprietario", "administrador"])
+    jobs = await db_call(job_manager.list_jobs)
+    return {"jobs": jobs, "stats": job_manager.get_stats()}
+
+
+@api_router.get("/system/jobs/runs")
+async def list_job_runs(
+    job_name: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user)
+):
+    """Histórico de execuções de jobs"""
+    check_role(current_user, ["proprietario", "administrador"])
+    limit = max(1, min(limit, 500))
+    runs = await db_call(sqlite_db.get_job_runs, job_name, status, limit)
+    return {"runs": runs, "total": len(runs)}
+
+
+@api_router.get("/system/jobs/runs/{run_id}")
+async def get_job_run(run_id: str, current_user: User = Depends(get_current_user)):
+    """Status de uma execução"""
+    check_role(current_user, ["proprietario", "administrador"])
+    run = await db_call(sqlite_db.get_job_run, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Execução não encontrada")
+    return run
+
+
+@api_router.post("/system/jobs/{job_name}/run", status_code=202)
+async def run_job(job_name: str, data: Optional[JobRunRequest] = None, current_user: User = Depends(get_current_user)):
+    """Enfileira uma execução do job e retorna imediatamente"""
+    check_role(current_user, ["proprietario", "administrador"])
+    if job_name not in job_manager.jobs:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    params = data.params if data else {}
+    run = await db_call(job_manager.submit, job_name, params, trigger=f"user:{current_user.username}")
+    return run
+
+
+@api_router.post("/system/jobs/runs/{run_id}/cancel")
+async def cancel_job_run(run_id: str, current_user: User = Depends(get_current_user)):
+    """Cancela uma execução pendente ou sinaliza o cancelamento de uma em andamento"""
+    check_role(current_user, ["proprietario", "administrador"])
+    run = await db_call(job_manager.cancel, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Execução não encontrada")
+    return run
+
+
+# ==================== CONTROLE DE ADMISSÃO ====================
+# Limites do servidor todo; com NUCLEO_WORKERS=N cada worker aplica 1/N (ver rate_limit)
+# Limites por IP aplicados pelo middleware (rotas públicas)
+pedidos_ip_limiter = TokenBucketLimiter("pedidos_ip", rate_per_minute=30, burst=10)
+public_clientes_ip_limiter = TokenBucketLimiter("public_clientes_ip", rate_per_minute=10, burst=5)
+check_login_ip_limiter = TokenBucketLimiter("check_login_ip", rate_per_minute=30, burst=10)
+
+# Limites por chave do corpo (verificados dentro dos endpoints)
+pedidos_cliente_limiter = TokenBucketLimiter("pedidos_cliente", rate_per_minute=6, burst=3)
+public_clientes_phone_limiter = TokenBucketLimiter("public_clientes_telefone", rate_per_minute=3, burst=3)
+chatbot_phone_limiter = TokenBucketLimiter("chatbot_telefone", rate_per_minute=20, burst=8)
+
+# Rotas caras: poucas execuções simultâneas, o resto espera na fila até o timeout (503)
+check_login_gate = ConcurrencyGate("check_login", limit=4, queue_timeout=2.0)
+chatbot_gate = ConcurrencyGate("chatbot_process", limit=8, queue_timeout=10.0)
+
+
+app.add_middleware(
+    AdmissionMiddleware,
+    rules=[
+        AdmissionRule("POST", "/api/pedidos", limiter=pedidos_ip_limiter),
+        AdmissionRule("POST", "/api/public/clientes", limiter=public_clientes_ip_limiter),
+        AdmissionRule("POST", "/api/auth/check-login", limiter=check_login_ip_limiter, gate=check_login_gate),
+        # Chamado pelo serviço WhatsApp local: sem limite por IP, só concorrência
+        AdmissionRule("POST", "/api/chatbot/process", gate=chatbot_gate, exempt_staff=False),
+    ],
+    is_staff=is_staff_token
+)
+
+
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Assinantes do canal de eventos coletados no momento do scrape
+metrics.SSE_SUBSCRIBERS.set_function(lambda: event_hub.subscriber_count)
+
+METRICS_TOKEN = os.environ.get("NUCLEO_METRICS_TOKEN", "")
+
+
+@api_router.get("/metrics")
+async def get_metrics(request: Request):
+    """
+    Métricas em formato texto do Prometheus.
+    Se NUCLEO_METRICS_TOKEN estiver definido, exige Authorization: Bearer <token>;
+    sem token configurado, exige login de proprietário/administrador.
+    """
+    if METRICS_TOKEN:
+        if request.headers.get("authorization", "") != f"Bearer {METRICS_TOKEN}":
+            raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    else:
+        current_user = await get_current_user(await security(request))
+        check_role(current_user, ["proprietario", "administrador"])
+    metrics.collect_threadpool_stats()
+    return Response(
+        content=metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@api_router.get("/system/rate-limits")
+async def get_rate_limit_stats(current_user: User = Depends(get_current_user)):
+    """
+    Requisições rejeitadas pelo controle de admissão (por regra e motivo).
+    Com vários workers, os números são só do worker que atendeu.
+    """
+    check_role(current_user, ["proprietario", "administrador"])
+    return {
+        "worker_pid": os.getpid(),
+        "workers": get_worker_count(),
+        "rejections": get_rejection_stats(),
+        "in_flight": {
+            check_login_gate.name: check_login_gate.in_flight,
+            chatbot_gate.name: chatbot_gate.in_flight
+        }
+    }
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -3562,10 +4266,13 @@ def get_frontend_path():
 # Frontend path global
 FRONTEND_PATH = None
 
+# Manifesto em memória dos arquivos do build (montado em setup_static_files)
+static_manifest: Optional[StaticAssetManifest] = None
+
 
 def setup_static_files():
     """Configura servir arquivos estáticos do React build"""
-    global FRONTEND_PATH
+    global FRONTEND_PATH, static_manifest
     
     FRONTEND_PATH = get_frontend_path()
     
@@ -3575,11 +4282,9 @@ def setup_static_files():
     
     logger.info(f"[STATIC] Servindo React de: {FRONTEND_PATH}")
     
-    # Montar /static
-    static_dir = FRONTEND_PATH / "static"
-    if static_dir.exists():
-        app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
-        logger.info(f"[STATIC] /static montado de: {static_dir}")
+    # Manifesto dos arquivos do build (/static é servido pelo serve_spa)
+    static_manifest = StaticAssetManifest(FRONTEND_PATH)
+    logger.info(f"[STATIC] Manifesto: {static_manifest.get_stats()}")
     
     return True
 
@@ -3596,11 +4301,41 @@ async def startup_event():
     
     upload_dir.mkdir(parents=True, exist_ok=True)
     
-    # Inicializar banco SQLite
-    await db_call(sqlite_db.init_database)
+    # Monitor de atraso do event loop (métricas)
+    app.state.loop_lag_task = asyncio.create_task(metrics.monitor_event_loop_lag())
+    
+    # Inicializar banco SQLite (já feito no import do database - aqui só garante)
+    with startup_timeline.step("init_database"):
+        await db_call(sqlite_db.init_database)
+    
+    # Produtos gravados antes dos defaults aninhados (ex.: recipe sem item_type);
+    # depois da primeira vez é só a leitura da versão aplicada
+    with startup_timeline.step("normalize_products"):
+        await db_call(sqlite_db.normalize_json_columns, "products", PRODUCT_JSON_NORMALIZERS,
+                      PRODUCT_JSON_NORMALIZATION_VERSION)
+    
+    # Com vários workers (uvicorn workers=N), só o processo primário agenda
+    # jobs e sobe o serviço do WhatsApp; o processo supervisor não roda o startup
+    primary = acquire_primary_role(Path(sqlite_db.DB_PATH).with_name("nucleo-primary.lock"))
+    app.state.primary = primary
+    
+    # Workers da fila e agendador de jobs
+    with startup_timeline.step("job_manager"):
+        await db_call(job_manager.start, primary)
+    
+    if primary:
+        # Iniciar serviço WhatsApp junto com o backend
+        with startup_timeline.step("servico whatsapp"):
+            await run_in_threadpool(start_whatsapp_service)
+        
+        # Uploads antigos -> nomes por hash do conteúdo, depois variantes das fotos
+        await db_call(job_manager.submit, "migrar_uploads", trigger="startup")
+    else:
+        logger.info(f"[STARTUP] Worker {os.getpid()} secundário: agendador e WhatsApp ficam com o primário")
     
     # Configurar arquivos estáticos
-    setup_static_files()
+    with startup_timeline.step("static_files"):
+        setup_static_files()
     
     # Log status
     ing_count = await db_call(sqlite_db.count_ingredients)
@@ -3610,10 +4345,20 @@ async def startup_event():
     db_path = os.environ.get("NUCLEO_DB_PATH", "/app/backend/data_backup/nucleo.db")
     logger.info(f"[STARTUP] SQLite inicializado em: {db_path}")
     logger.info(f"[STARTUP] Ingredientes: {ing_count}, Produtos: {prod_count}, Usuários: {user_count}")
+    startup_timeline.mark_ready()
+    log_startup = logger.warning if startup_timeline.over_budget else logger.info
+    log_startup(f"[STARTUP] Cold start: {startup_timeline.summary_line()}")
     logger.info("[STARTUP] Sistema iniciado com sucesso - 100% SQLite")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    task = getattr(app.state, "loop_lag_task", None)
+    if task:
+        task.cancel()
+    job_manager.stop()
+    shutdown_image_executor()
+    # Gravar o que ainda estiver no buffer do log de requisições
+    bug_tracker.request_logger.flush()
     logger.info("[SHUTDOWN] Sistema encerrado")
 
 
@@ -3624,11 +4369,38 @@ class SystemSettingsUpdate(BaseModel):
     theme: Optional[str] = None
     delivery_auto_accept: Optional[bool] = None
 
-@api_router.get("/health")
-async def health_check():
-    """Endpoint de healthcheck para o Electron verificar se o backend está rodando"""
+# Health checks em três níveis:
+# - /health/live: processo respondendo (memória apenas, tempo constante)
+# - /health/ready: banco inicializado e respondendo (SELECT 1 em conexão própria)
+# - /health/diagnostics: payload completo (caminho, tamanho, contagens), em cache
+HEALTH_DIAGNOSTICS_TTL = float(os.environ.get("NUCLEO_HEALTH_DIAGNOSTICS_TTL", "10"))
+_health_diagnostics_cache: Dict[str, Any] = {"payload": None, "expires": 0.0}
+_health_diagnostics_lock = asyncio.Lock()
+
+
+@api_router.get("/health/live")
+async def health_live():
+    """Liveness: não toca no banco nem em locks"""
+    return {
+        "status": "alive",
+        "uptime_seconds": round(time.time() - startup_timeline.started_at, 1),
+        "ready": startup_timeline.ready_ms is not None
+    }
+
+
+@api_router.get("/health/ready")
+async def health_ready():
+    """Readiness: banco inicializado e aceitando consultas (503 se não)"""
+    ready = startup_timeline.ready_ms is not None and await run_in_threadpool(sqlite_db.check_database_ready)
+    return Response(
+        content=fast_dumps({"status": "ready" if ready else "not_ready"}),
+        status_code=200 if ready else 503,
+        media_type="application/json"
+    )
+
+
+async def _health_diagnostics_payload() -> Dict[str, Any]:
     try:
-        # Verificar conexão com banco
         db_info = await db_call(sqlite_db.get_database_info)
         return {
             "status": "healthy",
@@ -3646,22 +4418,44 @@ async def health_check():
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
 
+
+@api_router.get("/health/diagnostics")
+async def health_diagnostics():
+    """Diagnóstico completo do banco, recalculado no máximo a cada HEALTH_DIAGNOSTICS_TTL segundos"""
+    async with _health_diagnostics_lock:
+        now = time.monotonic()
+        if _health_diagnostics_cache["payload"] is None or now >= _health_diagnostics_cache["expires"]:
+            payload = await _health_diagnostics_payload()
+            # Falhas não ficam em cache: o próximo poll tenta de novo
+            ttl = HEALTH_DIAGNOSTICS_TTL if payload["status"] == "healthy" else 0
+            _health_diagnostics_cache.update(payload=payload, expires=now + ttl)
+        return _health_diagnostics_cache["payload"]
+
+
+@api_router.get("/health")
+async def health_check():
+    """Compatibilidade: versões antigas do Electron/launcher consultam /api/health"""
+    return await health_diagnostics()
+
 @api_router.get("/desktop/system-info")
 async def get_desktop_system_info():
     """Retorna informações do sistema para diagnóstico desktop"""
     db_info = await db_call(sqlite_db.get_database_info)
     settings = await db_call(sqlite_db.get_all_settings)
+    schema = await db_call(sqlite_db.get_schema_info)
     
     return {
         "version": "1.0.0",
         "database": db_info,
+        "schema": schema,
         "settings": settings,
         "environment": {
             "data_path": os.environ.get("NUCLEO_DATA_PATH", "N/A"),
             "db_path": os.environ.get("NUCLEO_DB_PATH", "N/A"),
             "logs_path": os.environ.get("NUCLEO_LOGS_PATH", "N/A"),
             "port": os.environ.get("NUCLEO_PORT", "8001")
-        }
+        },
+        "startup": startup_timeline.get_report()
     }
 
 @api_router.get("/system/settings")
@@ -3828,6 +4622,7 @@ async def force_change_password(password_data: ChangePassword, current_user: Use
         "password": password_data.new_password,
         "must_change_password": 0
     })
+    auth_user_cache.invalidate_user(current_user.id)
     
     return {"message": "Senha alterada com sucesso", "must_change_password": False}
 
@@ -3845,6 +4640,7 @@ WHATSAPP_SERVICE_URL = "http://localhost:3002"
 @api_router.get("/whatsapp/status")
 async def whatsapp_status():
     """Retorna status da conexão WhatsApp"""
+    httpx = lazy_import("httpx")
     try:
         async with httpx.AsyncClient(timeout=10.0) as client:
             response = await client.get(f"{WHATSAPP_SERVICE_URL}/status")
@@ -3857,6 +4653,7 @@ async def whatsapp_status():
 @api_router.get("/whatsapp/qr")
 async def whatsapp_qr():
     """Retorna QR Code para conexão WhatsApp"""
+    httpx = lazy_import("httpx")
     try:
         async with httpx.AsyncClient(timeout=10.0) as client:
             response = await client.get(f"{WHATSAPP_SERVICE_URL}/qr")
@@ -3873,12 +4670,14 @@ class WhatsAppSendMessage(BaseModel):
 @api_router.post("/whatsapp/send")
 async def whatsapp_send(data: WhatsAppSendMessage, current_user: User = Depends(get_current_user)):
     """Envia mensagem via WhatsApp"""
+    httpx = lazy_import("httpx")
     try:
         async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{WHATSAPP_SERVICE_URL}/send",
-                json={"phone": data.phone, "message": data.message}
-            )
+            with metrics.track_external_call("whatsapp"):
+                response = await client.post(
+                    f"{WHATSAPP_SERVICE_URL}/send",
+                    json={"phone": data.phone, "message": data.message}
+                )
             return response.json()
     except httpx.ConnectError:
         return {"success": False, "message": "Serviço WhatsApp não está rodando"}
@@ -3888,6 +4687,7 @@ async def whatsapp_send(data: WhatsAppSendMessage, current_user: User = Depends(
 @api_router.post("/whatsapp/disconnect")
 async def whatsapp_disconnect(current_user: User = Depends(get_current_user)):
     """Desconecta do WhatsApp"""
+    httpx = lazy_import("httpx")
     try:
         async with httpx.AsyncClient(timeout=10.0) as client:
             response = await client.post(f"{WHATSAPP_SERVICE_URL}/disconnect")
@@ -3900,6 +4700,7 @@ async def whatsapp_disconnect(current_user: User = Depends(get_current_user)):
 @api_router.get("/whatsapp/messages")
 async def whatsapp_messages(limit: int = 20, current_user: User = Depends(get_current_user)):
     """Retorna mensagens recebidas"""
+    httpx = lazy_import("httpx")
     try:
         async with httpx.AsyncClient(timeout=10.0) as client:
             response = await client.get(f"{WHATSAPP_SERVICE_URL}/messages", params={"limit": limit})
@@ -3912,6 +4713,7 @@ async def whatsapp_messages(limit: int = 20, current_user: User = Depends(get_cu
 @api_router.post("/whatsapp/toggle-auto-reply")
 async def whatsapp_toggle_auto_reply(current_user: User = Depends(get_current_user)):
     """Toggle resposta automática do chatbot"""
+    httpx = lazy_import("httpx")
     try:
         async with httpx.AsyncClient(timeout=10.0) as client:
             response = await client.post(f"{WHATSAPP_SERVICE_URL}/toggle-auto-reply")
@@ -3923,8 +4725,9 @@ async def whatsapp_toggle_auto_reply(current_user: User = Depends(get_current_us
 
 
 # ==================== CHATBOT AI PROCESSING ====================
-import chatbot_ai
-import audio_service
+with startup_timeline.step("chatbot_ai, audio_service", "import"):
+    import chatbot_ai
+    import audio_service
 
 class ChatbotProcessMessage(BaseModel):
     phone: str
@@ -3941,6 +4744,10 @@ MEDIA_TYPES_FOR_PAUSE = ["text", "audio", "image", "video", "gif", "sticker", "d
 @api_router.post("/chatbot/process")
 async def chatbot_process_message(data: ChatbotProcessMessage):
     """Processa mensagem do WhatsApp com IA"""
+    # Mensagens do atendente humano não entram no limite por telefone
+    if not data.is_from_human_agent:
+        check_rate_limit(chatbot_phone_limiter, data.phone)
+    
     try:
         # Se é mensagem de atendente humano (qualquer tipo de mídia), pausar o bot
         if data.is_from_human_agent:
@@ -4331,7 +5138,7 @@ async def clear_waiting_queue(current_user: User = Depends(get_current_user)):
     if current_user.role not in ["proprietario", "administrador"]:
         raise HTTPException(status_code=403, detail="Sem permissão")
     
-    chatbot_ai.waiting_for_human.clear()
+    chatbot_ai.clear_waiting_queue()
     return {"success": True}
 
 
@@ -4920,23 +5727,18 @@ async def upload_company_logo(file: UploadFile = File(...), current_user: User =
         raise HTTPException(status_code=400, detail="Arquivo deve ser uma imagem")
     
     # Criar diretório de uploads se não existir
-    uploads_dir = Path(__file__).parent / "uploads" / "company"
-    uploads_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Gerar nome único para o arquivo
-    extension = file.filename.split(".")[-1] if "." in file.filename else "png"
-    filename = f"logo_{uuid.uuid4().hex[:8]}.{extension}"
-    filepath = uploads_dir / filename
+    COMPANY_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
     
-    # Salvar arquivo temporariamente
-    temp_path = uploads_dir / f"temp_{filename}"
-    with open(temp_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    # Gravada com nome provisório; o nome final é o hash do JPEG gravado
+    # (reenviar a mesma logo reaproveita o arquivo)
+    content = await file.read()
+    staged = staging_name("jpg")
+    filepath = COMPANY_UPLOAD_DIR / staged
     
-    try:
+    def render_logo():
+        Image = lazy_import("PIL.Image")
         # Redimensionar para 1080x1080 se necessário
-        with Image.open(temp_path) as img:
+        with Image.open(io.BytesIO(content)) as img:
             # Converter para RGB se necessário
             if img.mode in ("RGBA", "P"):
                 img = img.convert("RGB")
@@ -4951,20 +5753,12 @@ async def upload_company_logo(file: UploadFile = File(...), current_user: User =
             img = img.crop((left, top, right, bottom))
             img = img.resize((1080, 1080), Image.LANCZOS)
             img.save(filepath, "JPEG", quality=90)
+        return adopt_content_name(COMPANY_UPLOAD_DIR, staged)
+    
+    try:
+        filename = await run_in_threadpool(render_logo)
         
-        # Remover arquivo temporário
-        temp_path.unlink()
-        
-        # Remover logo antiga se existir
-        settings = await db_call(sqlite_db.get_all_settings)
-        old_logo = settings.get("logo_url")
-        if old_logo:
-            # Remove o prefixo /api se existir para encontrar o arquivo
-            old_logo_path = old_logo.replace("/api/", "/").lstrip("/")
-            old_path = Path(__file__).parent / old_logo_path
-            if old_path.exists():
-                old_path.unlink()
-        
+        # A logo antiga deixa de ser referenciada e é removida pelo job limpar_uploads_orfaos
         # Salvar URL da nova logo com prefixo /api
         logo_url = f"/api/uploads/company/{filename}"
         await db_call(sqlite_db.set_setting, "logo_url", logo_url)
@@ -4972,8 +5766,6 @@ async def upload_company_logo(file: UploadFile = File(...), current_user: User =
         return {"success": True, "logo_url": logo_url}
     
     except Exception as e:
-        if temp_path.exists():
-            temp_path.unlink()
         raise HTTPException(status_code=500, detail=f"Erro ao processar imagem: {str(e)}")
 
 @api_router.delete("/company/logo")
@@ -4986,9 +5778,7 @@ async def delete_company_logo(current_user: User = Depends(get_current_user)):
     logo_url = settings.get("logo_url")
     
     if logo_url:
-        logo_path = Path(__file__).parent / logo_url.lstrip("/")
-        if logo_path.exists():
-            logo_path.unlink()
+        # O arquivo é removido pelo job limpar_uploads_orfaos
         await db_call(sqlite_db.set_setting, "logo_url", "")
     
     return {"success": True, "message": "Logo removida"}
@@ -5029,37 +5819,40 @@ class PrintConfig(BaseModel):
     template_cozinha: str = "padrao"  # padrao, simplificado, detalhado
     template_caixa: str = "padrao"
 
+def build_print_config(settings: Dict[str, str]) -> Dict[str, Any]:
+    """Configuração de impressão salva mesclada com os padrões e os dados da empresa"""
+    # Configurações padrão
+    default_config = PrintConfig().model_dump()
+    
+    # Carregar configurações salvas
+    print_config_str = settings.get("print_config", "{}")
+    try:
+        import json
+        saved_config = json.loads(print_config_str) if print_config_str else {}
+    except:
+        saved_config = {}
+    
+    # Mesclar com padrões
+    config = {**default_config, **saved_config}
+    
+    # Adicionar dados da empresa das settings gerais se não estiverem configurados
+    if not config.get("empresa_nome"):
+        config["empresa_nome"] = settings.get("nome_empresa", "")
+    if not config.get("empresa_endereco"):
+        config["empresa_endereco"] = settings.get("endereco_empresa", "")
+    if not config.get("empresa_telefone"):
+        config["empresa_telefone"] = settings.get("telefone_empresa", "")
+    if not config.get("empresa_cnpj"):
+        config["empresa_cnpj"] = settings.get("cnpj_empresa", "")
+    
+    return config
+
 @api_router.get("/print-config")
 async def get_print_config():
     """Retorna as configurações de impressão"""
     try:
         settings = await db_call(sqlite_db.get_all_settings)
-        
-        # Configurações padrão
-        default_config = PrintConfig().model_dump()
-        
-        # Carregar configurações salvas
-        print_config_str = settings.get("print_config", "{}")
-        try:
-            import json
-            saved_config = json.loads(print_config_str) if print_config_str else {}
-        except:
-            saved_config = {}
-        
-        # Mesclar com padrões
-        config = {**default_config, **saved_config}
-        
-        # Adicionar dados da empresa das settings gerais se não estiverem configurados
-        if not config.get("empresa_nome"):
-            config["empresa_nome"] = settings.get("nome_empresa", "")
-        if not config.get("empresa_endereco"):
-            config["empresa_endereco"] = settings.get("endereco_empresa", "")
-        if not config.get("empresa_telefone"):
-            config["empresa_telefone"] = settings.get("telefone_empresa", "")
-        if not config.get("empresa_cnpj"):
-            config["empresa_cnpj"] = settings.get("cnpj_empresa", "")
-        
-        return config
+        return build_print_config(settings)
     except Exception as e:
         logger.error(f"Erro ao carregar print config: {e}")
         return PrintConfig().model_dump()
@@ -5087,6 +5880,66 @@ async def save_print_config(config: PrintConfig, current_user: User = Depends(ge
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ==================== BOOTSTRAP DAS TELAS ====================
+# Uma requisição por tela no carregamento: todas as listas vêm do mesmo
+# snapshot do banco (database.read_snapshot), com uma autenticação e uma
+# passagem pelo db_call em vez de uma por recurso.
+# BOOTSTRAP_VERSION muda quando o formato do payload muda.
+BOOTSTRAP_VERSION = 1
+
+
+def _bootstrap_delivery() -> Dict[str, Any]:
+    snapshot = sqlite_db.read_snapshot({
+        "pedidos": lambda: sqlite_db.get_all_pedidos(raw_json=True),
+        "entregadores": sqlite_db.get_all_entregadores,
+        "bairros": sqlite_db.get_all_bairros,
+        "settings": sqlite_db.get_all_settings,
+    })
+    # Fila de espera fica fora do snapshot: a leitura limpa entradas expiradas
+    queue = chatbot_ai.get_waiting_queue()
+    return {
+        "pedidos": trusted_rows(snapshot["pedidos"], PedidoResponse),
+        "entregadores": trusted_rows(snapshot["entregadores"], EntregadorResponse),
+        "bairros": trusted_rows(snapshot["bairros"], BairroResponse),
+        "settings": snapshot["settings"],
+        "print_config": build_print_config(snapshot["settings"]),
+        "waiting_queue": {"queue": queue, "count": len(queue), "has_waiting": len(queue) > 0},
+    }
+
+
+def _bootstrap_balcao() -> Dict[str, Any]:
+    snapshot = sqlite_db.read_snapshot({
+        "products": lambda: sqlite_db.get_all_products(raw_json=True),
+        "categories": sqlite_db.get_all_categories,
+    })
+    products = [p for p in snapshot["products"] if not p.get("is_insumo")]
+    return {
+        "products": trusted_rows(products, Product),
+        "categories": trusted_rows(snapshot["categories"], Category),
+    }
+
+
+BOOTSTRAP_SCREENS = {
+    "delivery": _bootstrap_delivery,
+    "balcao": _bootstrap_balcao,
+}
+
+
+@api_router.get("/bootstrap/{screen}")
+async def get_screen_bootstrap(screen: str, current_user: User = Depends(get_current_user)):
+    """Dados iniciais de uma tela (delivery, balcao) em um único payload"""
+    builder = BOOTSTRAP_SCREENS.get(screen)
+    if builder is None:
+        raise HTTPException(status_code=404, detail=f"Tela desconhecida: {screen}")
+    data = await db_call(builder)
+    return FastJSONResponse({
+        "version": BOOTSTRAP_VERSION,
+        "screen": screen,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "data": data,
+    })
+
+
 # ==================== LIMPAR DADOS ====================
 class ClearDataRequest(BaseModel):
     confirmation_word: str
@@ -5290,42 +6143,48 @@ app.include_router(api_router)
 # Definidas APÓS api_router para não conflitar
 
 @app.get("/", include_in_schema=False)
-async def serve_root():
+async def serve_root(request: Request):
     """Serve o index.html do React"""
-    if FRONTEND_PATH and (FRONTEND_PATH / "index.html").exists():
-        return FileResponse(str(FRONTEND_PATH / "index.html"))
+    if static_manifest and static_manifest.index:
+        return await static_manifest.response(request, "index.html", static_manifest.index)
     return {"message": "Núcleo API", "health": "/api/health", "docs": "/docs"}
 
 
 # Esta rota DEVE vir por último para ser catch-all
 @app.get("/{full_path:path}", include_in_schema=False)
-async def serve_spa(full_path: str):
+async def serve_spa(full_path: str, request: Request):
     """Serve arquivos estáticos ou index.html para rotas do React (SPA)"""
     # Ignorar rotas da API (já tratadas pelo api_router)
     if full_path.startswith("api"):
         raise HTTPException(status_code=404, detail="Endpoint não encontrado")
     
-    # Verificar se é rota de uploads (servir diretamente)
+    # Verificar se é rota de uploads (mesma entrega do /api/uploads)
+    if full_path.startswith("uploads/products/"):
+        return await serve_product_image(full_path.rsplit("/", 1)[1], request)
+    if full_path.startswith("uploads/company/"):
+        return await serve_company_image(full_path.rsplit("/", 1)[1], request)
     if full_path.startswith("uploads/"):
-        uploads_dir = Path(__file__).parent / "uploads"
-        file_path = uploads_dir / full_path.replace("uploads/", "", 1)
-        if file_path.exists() and file_path.is_file():
-            return FileResponse(str(file_path))
         raise HTTPException(status_code=404, detail="Arquivo não encontrado")
     
     # Se frontend não configurado
-    if not FRONTEND_PATH:
+    if not static_manifest:
         raise HTTPException(status_code=404, detail="Frontend não disponível")
     
-    # Verificar se é arquivo estático
-    file_path = FRONTEND_PATH / full_path
-    if file_path.exists() and file_path.is_file():
-        return FileResponse(str(file_path))
+    # Verificar se é arquivo estático (manifesto em memória)
+    asset = static_manifest.get(full_path)
+    if asset is None and full_path.startswith("static/"):
+        # Build refeito com o servidor rodando: novos nomes com hash
+        if await run_in_threadpool(static_manifest.reload_if_rebuilt):
+            asset = static_manifest.get(full_path)
+        if asset is None:
+            # Nunca responder index.html no lugar de um JS/CSS inexistente
+            raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    if asset is not None:
+        return await static_manifest.response(request, full_path, asset)
     
     # Retornar index.html para rotas do React (SPA)
-    index_path = FRONTEND_PATH / "index.html"
-    if index_path.exists():
-        return FileResponse(str(index_path))
+    if static_manifest.index:
+        return await static_manifest.response(request, "index.html", static_manifest.index)
     
     raise HTTPException(status_code=404, detail="Página não encontrada")
 
@@ -5340,12 +6199,16 @@ if __name__ == "__main__":
     port = int(os.environ.get("NUCLEO_PORT", 8001))
     host = os.environ.get("NUCLEO_HOST", "0.0.0.0")
     
-    logger.info(f"[MAIN] Iniciando servidor em {host}:{port}")
+    # Vários workers exigem estado compartilhado (ver state_store.py)
+    workers = get_worker_count()
+    
+    logger.info(f"[MAIN] Iniciando servidor em {host}:{port} ({workers} worker(s))")
     
     uvicorn.run(
-        app,
+        "server:app" if workers > 1 else app,
         host=host,
         port=port,
+        workers=workers if workers > 1 else None,
         log_level="info",
         access_log=True
     )
@@ -0,0 +1,126 @@
+"""
+Perfil de Inicialização do Backend (cold start)
+Registra a linha do tempo da subida do servidor - cada grupo de imports e
+cada etapa de inicialização (banco, jobs, build do frontend) - para
+diagnosticar aberturas lentas do aplicativo desktop.
+
+- Orçamento: NUCLEO_COLD_START_BUDGET_MS (padrão 1500 ms), medido do
+  primeiro import deste módulo até o fim do evento de startup
+- Exposto em /api/desktop/system-info e registrado no log ao final
+- Módulos pesados (PIL, httpx, jwt, emergentintegrations) são importados
+  no primeiro uso; `lazy_import_stats()` mostra quando cada um foi carregado
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+COLD_START_BUDGET_MS = float(os.environ.get("NUCLEO_COLD_START_BUDGET_MS", "1500"))
+
+
+class StartupTimeline:
+    """Linha do tempo das etapas de inicialização"""
+
+    def __init__(self, budget_ms: float = COLD_START_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.steps: List[Dict] = []
+        self.ready_ms: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    @contextmanager
+    def step(self, name: str, kind: str = "init"):
+        """Mede uma etapa (kind: 'import' ou 'init')"""
+        start = self._elapsed_ms()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            end = self._elapsed_ms()
+            entry = {
+                "name": name,
+                "kind": kind,
+                "start_ms": round(start, 1),
+                "duration_ms": round(end - start, 1),
+            }
+            if error:
+                entry["error"] = error
+            with self._lock:
+                self.steps.append(entry)
+
+    def mark_ready(self) -> float:
+        """Fim da inicialização (chamado ao final do evento de startup)"""
+        self.ready_ms = round(self._elapsed_ms(), 1)
+        return self.ready_ms
+
+    @property
+    def over_budget(self) -> bool:
+        return self.ready_ms is not None and self.ready_ms > self.budget_ms
+
+    def slowest(self, count: int = 5) -> List[Dict]:
+        with self._lock:
+            return sorted(self.steps, key=lambda s: s["duration_ms"], reverse=True)[:count]
+
+    def summary_line(self) -> str:
+        """Resumo para o log: tempo total e as etapas mais lentas"""
+        slow = ", ".join(f"{s['name']}={s['duration_ms']:.0f}ms" for s in self.slowest(3))
+        status = "ACIMA do orçamento" if self.over_budget else "dentro do orçamento"
+        return f"pronto em {self.ready_ms:.0f}ms ({status} de {self.budget_ms:.0f}ms) - {slow}"
+
+    def get_report(self) -> Dict:
+        with self._lock:
+            steps = list(self.steps)
+        return {
+            "started_at": self.started_at,
+            "ready_ms": self.ready_ms,
+            "budget_ms": self.budget_ms,
+            "over_budget": self.over_budget,
+            "import_ms": round(sum(s["duration_ms"] for s in steps if s["kind"] == "import"), 1),
+            "init_ms": round(sum(s["duration_ms"] for s in steps if s["kind"] == "init"), 1),
+            "steps": steps,
+            "lazy_imports": lazy_import_stats(),
+        }
+
+
+startup_timeline = StartupTimeline()
+
+
+# ==================== IMPORTS SOB DEMANDA ====================
+
+_lazy_loaded: Dict[str, Dict] = {}
+_lazy_lock = threading.Lock()
+
+
+def lazy_import(module_name: str):
+    """
+    Importa um módulo no primeiro uso e registra quanto tempo levou
+    (e quanto tempo após o início do processo isso aconteceu).
+    """
+    module = sys.modules.get(module_name)
+    if module is not None and module_name in _lazy_loaded:
+        return module
+    with _lazy_lock:
+        if module_name in _lazy_loaded:
+            return sys.modules[module_name]
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        _lazy_loaded[module_name] = {
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "loaded_at_ms": round(startup_timeline._elapsed_ms(), 1),
+        }
+        return module
+
+
+def lazy_import_stats() -> Dict[str, Dict]:
+    with _lazy_lock:
+        return dict(_lazy_loaded)
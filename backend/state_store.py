@@ -0,0 +1,245 @@
+"""
+Armazenamento de Estado Compartilhado (com TTL)
+Guarda o estado volátil do chatbot (fila de espera por atendente, pausas do
+bot por telefone) atrás de uma interface única, para que o backend possa
+rodar com vários workers/processos sem estado divergente.
+
+Backends:
+- memory: dicionário em processo (padrão, um único worker)
+- sqlite: tabela chatbot_state no banco principal, compartilhada entre processos
+
+Seleção via NUCLEO_STATE_BACKEND=memory|sqlite. Com NUCLEO_WORKERS > 1 o
+backend sqlite é usado automaticamente.
+
+Com vários workers, acquire_primary_role() elege um único processo para o
+que não pode rodar em dobro (agendador de jobs, serviço do WhatsApp) e
+file_lock() serializa trechos entre processos (rotação do log de requisições).
+"""
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class StateStore(ABC):
+    """Interface de armazenamento chave/valor por namespace com expiração"""
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        ...
+
+    @abstractmethod
+    def clear(self, namespace: str):
+        ...
+
+    def contains(self, namespace: str, key: str) -> bool:
+        return self.get(namespace, key) is not None
+
+
+class MemoryStateStore(StateStore):
+    """Estado em memória do processo (equivalente aos dicts antigos)"""
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Tuple[Any, Optional[float]]]] = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, expires_at: Optional[float]) -> bool:
+        return expires_at is None or expires_at > time.time()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(namespace, {}).get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if not self._alive(expires_at):
+                del self._data[namespace][key]
+                return None
+            return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        expires_at = time.time() + ttl_seconds if ttl_seconds is not None else None
+        with self._lock:
+            self._data.setdefault(namespace, {})[key] = (value, expires_at)
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            return self._data.get(namespace, {}).pop(key, None) is not None
+
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        with self._lock:
+            bucket = self._data.get(namespace, {})
+            expired = [k for k, (_, exp) in bucket.items() if not self._alive(exp)]
+            for k in expired:
+                del bucket[k]
+            return [(k, v) for k, (v, _) in bucket.items()]
+
+    def clear(self, namespace: str):
+        with self._lock:
+            self._data.pop(namespace, None)
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Estado na tabela chatbot_state do banco principal.
+    Todos os workers abrem o mesmo arquivo (WAL), então enxergam o mesmo estado.
+    Valores são serializados em JSON.
+    """
+
+    def __init__(self):
+        import database
+        self._db = database
+
+    def _execute(self, sql: str, params: tuple = (), fetch: bool = False, commit: bool = False):
+        with self._db.db_lock:
+            conn = self._db.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall() if fetch else None
+            if commit:
+                conn.commit()
+            return rows if fetch else cursor.rowcount
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        rows = self._execute(
+            "SELECT value FROM chatbot_state WHERE namespace = ? AND key = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()), fetch=True
+        )
+        if not rows:
+            return None
+        try:
+            return json.loads(rows[0][0])
+        except (json.JSONDecodeError, TypeError):
+            return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        expires_at = time.time() + ttl_seconds if ttl_seconds is not None else None
+        self._execute(
+            "INSERT OR REPLACE INTO chatbot_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, ensure_ascii=False), expires_at), commit=True
+        )
+
+    def delete(self, namespace: str, key: str) -> bool:
+        return self._execute(
+            "DELETE FROM chatbot_state WHERE namespace = ? AND key = ?",
+            (namespace, key), commit=True
+        ) > 0
+
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        now = time.time()
+        # Limpeza oportunista das entradas expiradas do namespace
+        self._execute(
+            "DELETE FROM chatbot_state WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (namespace, now), commit=True
+        )
+        rows = self._execute(
+            "SELECT key, value FROM chatbot_state WHERE namespace = ?",
+            (namespace,), fetch=True
+        )
+        result = []
+        for key, value in rows:
+            try:
+                result.append((key, json.loads(value)))
+            except (json.JSONDecodeError, TypeError):
+                continue
+        return result
+
+    def clear(self, namespace: str):
+        self._execute("DELETE FROM chatbot_state WHERE namespace = ?", (namespace,), commit=True)
+
+
+def get_worker_count() -> int:
+    """Número de workers configurado (NUCLEO_WORKERS)"""
+    try:
+        return max(1, int(os.environ.get("NUCLEO_WORKERS", "1")))
+    except ValueError:
+        return 1
+
+
+def _lock_handle(handle, blocking: bool):
+    """Lock exclusivo do arquivo aberto (OSError se não bloqueante e ocupado)"""
+    if os.name == "nt":
+        import msvcrt
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+@contextmanager
+def file_lock(lock_path: Path):
+    """Seção crítica entre processos (lock exclusivo bloqueante em lock_path)"""
+    with open(lock_path, "a+") as handle:
+        _lock_handle(handle, blocking=True)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                import msvcrt
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+_primary_lock_file = None
+
+
+def acquire_primary_role(lock_path: Path) -> bool:
+    """
+    True se este processo é o primário. Com um único worker é sempre True;
+    com vários, o primeiro a obter o lock exclusivo do arquivo (mantido aberto
+    enquanto o processo viver) vence. Se o primário morrer, o lock é liberado
+    e o worker que o uvicorn subir no lugar assume.
+    """
+    global _primary_lock_file
+    if get_worker_count() == 1 or _primary_lock_file is not None:
+        return True
+    handle = open(lock_path, "a+")
+    try:
+        _lock_handle(handle, blocking=False)
+    except OSError:
+        handle.close()
+        return False
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    _primary_lock_file = handle
+    return True
+
+
+def create_state_store() -> StateStore:
+    """Cria o backend configurado por ambiente"""
+    backend = os.environ.get("NUCLEO_STATE_BACKEND", "").lower().strip()
+    if not backend:
+        backend = "sqlite" if get_worker_count() > 1 else "memory"
+    if backend == "memory" and get_worker_count() > 1:
+        print("[STATE] Backend memory não é compartilhado entre workers - usando sqlite")
+        backend = "sqlite"
+    if backend == "sqlite":
+        return SQLiteStateStore()
+    return MemoryStateStore()
+
+
+# Instância global
+state_store = create_state_store()
@@ -0,0 +1,257 @@
+"""
+Arquivos Estáticos do Frontend (React build)
+Serve o build a partir de um manifesto em memória, montado uma vez no
+startup, em vez de consultar o sistema de arquivos a cada requisição.
+
+- Arquivos com hash no nome (static/js/main.1a2b3c4d.js): Cache-Control
+  immutable por 1 ano
+- index.html e demais arquivos: no-cache + ETag (revalidação com 304);
+  cada encoding tem seu ETag ("abc", "abc-gz", "abc-br") e Vary: Accept-Encoding
+- Variantes .br/.gz: usadas se existirem ao lado do arquivo (geradas no build
+  com `python static_assets.py <pasta do build>`); senão são comprimidas na
+  primeira requisição e mantidas em memória
+
+Brotli é opcional (pacote `brotli`); sem ele apenas gzip é gerado.
+"""
+import gzip
+import hashlib
+import mimetypes
+import re
+import sys
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Nomes gerados pelo webpack/CRA: main.1a2b3c4d.js, 123.abcd1234.chunk.css, logo.5d5d9eef.svg
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.")
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+COMPRESSIBLE_SUFFIXES = {".js", ".css", ".html", ".json", ".svg", ".map", ".txt", ".ico", ".xml", ".webmanifest"}
+MIN_COMPRESS_SIZE = 1024
+
+# Limite de memória para variantes comprimidas sob demanda
+MAX_COMPRESSED_CACHE_BYTES = 64 * 1024 * 1024
+
+# (sufixo do arquivo, Content-Encoding), na ordem de preferência
+ENCODINGS = ((".br", "br"), (".gz", "gzip"))
+
+
+@dataclass
+class StaticAsset:
+    """Entrada do manifesto"""
+    path: Path
+    size: int
+    etag: str
+    media_type: str
+    immutable: bool
+    compressible: bool
+    # Variantes pré-comprimidas em disco: encoding -> caminho
+    variants: Dict[str, Path] = field(default_factory=dict)
+
+    @property
+    def cache_control(self) -> str:
+        return IMMUTABLE_CACHE if self.immutable else REVALIDATE_CACHE
+
+
+def _media_type(path: Path) -> str:
+    media_type, _ = mimetypes.guess_type(path.name)
+    if path.suffix == ".js":
+        return "application/javascript"
+    return media_type or "application/octet-stream"
+
+
+def _is_variant(path: Path) -> bool:
+    return any(path.name.endswith(suffix) and path.with_name(path.name[:-len(suffix)]).exists()
+               for suffix, _ in ENCODINGS)
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag da representação comprimida ("abc" -> "abc-gz"); corpos diferentes, tags diferentes"""
+    if not encoding:
+        return etag
+    suffix = "gz" if encoding == "gzip" else encoding
+    return f'{etag[:-1]}-{suffix}"'
+
+
+def parse_accept_encoding(header: str) -> set:
+    """Encodings aceitos pelo cliente (ignora os marcados com q=0)"""
+    accepted = set()
+    for item in (header or "").split(","):
+        parts = [p.strip() for p in item.split(";")]
+        if not parts[0]:
+            continue
+        if any(p.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000") for p in parts[1:]):
+            continue
+        accepted.add(parts[0].lower())
+    return accepted
+
+
+class StaticAssetManifest:
+    """Índice em memória do build do frontend"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.assets: Dict[str, StaticAsset] = {}
+        self.index: Optional[StaticAsset] = None
+        self._index_mtime: Optional[float] = None
+        self._compressed: Dict[Tuple[str, str], bytes] = {}
+        self._compressed_bytes = 0
+        self._lock = threading.Lock()
+        self.scan()
+
+    def scan(self):
+        """(Re)constrói o manifesto percorrendo a pasta do build"""
+        assets: Dict[str, StaticAsset] = {}
+        for path in self.root.rglob("*"):
+            if not path.is_file() or _is_variant(path):
+                continue
+            stat = path.stat()
+            rel = path.relative_to(self.root).as_posix()
+            etag = '"' + hashlib.md5(f"{rel}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16] + '"'
+            variants = {}
+            for suffix, encoding in ENCODINGS:
+                variant = path.with_name(path.name + suffix)
+                if variant.exists():
+                    variants[encoding] = variant
+            assets[rel] = StaticAsset(
+                path=path,
+                size=stat.st_size,
+                etag=etag,
+                media_type=_media_type(path),
+                immutable=rel.startswith("static/") and bool(HASHED_NAME.search(path.name)),
+                compressible=path.suffix.lower() in COMPRESSIBLE_SUFFIXES and stat.st_size >= MIN_COMPRESS_SIZE,
+                variants=variants
+            )
+        with self._lock:
+            self.assets = assets
+            self.index = assets.get("index.html")
+            self._index_mtime = self._current_index_mtime()
+            self._compressed.clear()
+            self._compressed_bytes = 0
+
+    def _current_index_mtime(self) -> Optional[float]:
+        try:
+            return (self.root / "index.html").stat().st_mtime
+        except OSError:
+            return None
+
+    def reload_if_rebuilt(self) -> bool:
+        """Relê o manifesto se o build foi refeito (index.html alterado)"""
+        if self._current_index_mtime() != self._index_mtime:
+            self.scan()
+            return True
+        return False
+
+    def get(self, rel_path: str) -> Optional[StaticAsset]:
+        return self.assets.get(rel_path)
+
+    def _cached_variant(self, rel_path: str, encoding: str) -> Optional[bytes]:
+        with self._lock:
+            return self._compressed.get((rel_path, encoding))
+
+    def _compress_variant(self, rel_path: str, asset: StaticAsset, encoding: str) -> Optional[bytes]:
+        """Comprime o arquivo e guarda em memória (primeira requisição)"""
+        key = (rel_path, encoding)
+        try:
+            raw = asset.path.read_bytes()
+        except OSError:
+            return None
+        if encoding == "br":
+            data = brotli.compress(raw, quality=11 if asset.immutable else 5)
+        else:
+            data = gzip.compress(raw, compresslevel=9 if asset.immutable else 6, mtime=0)
+        if len(data) >= len(raw):
+            return None
+        with self._lock:
+            if self._compressed_bytes + len(data) <= MAX_COMPRESSED_CACHE_BYTES:
+                self._compressed[key] = data
+                self._compressed_bytes += len(data)
+        return data
+
+    async def response(self, request: Request, rel_path: str, asset: StaticAsset) -> Response:
+        """Resposta com cache, 304 e a melhor variante comprimida aceita"""
+        headers = {"Cache-Control": asset.cache_control, "ETag": asset.etag}
+        if asset.variants or asset.compressible:
+            headers["Vary"] = "Accept-Encoding"
+        accepted = parse_accept_encoding(request.headers.get("accept-encoding", ""))
+
+        # 304 se o cliente tem a versão sem compressão ou uma comprimida que ainda aceita
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            for encoding in [None] + [e for _, e in ENCODINGS if e in accepted]:
+                etag = encoded_etag(asset.etag, encoding)
+                if etag in tags:
+                    headers["ETag"] = etag
+                    return Response(status_code=304, headers=headers)
+
+        for _, encoding in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            headers["Content-Encoding"] = encoding
+            headers["ETag"] = encoded_etag(asset.etag, encoding)
+            variant = asset.variants.get(encoding)
+            if variant is not None:
+                return FileResponse(str(variant), media_type=asset.media_type, headers=headers)
+            if asset.compressible and (encoding != "br" or BROTLI_AVAILABLE):
+                data = self._cached_variant(rel_path, encoding)
+                if data is None:
+                    data = await run_in_threadpool(self._compress_variant, rel_path, asset, encoding)
+                if data is not None:
+                    return Response(content=data, media_type=asset.media_type, headers=headers)
+            del headers["Content-Encoding"]
+            headers["ETag"] = asset.etag
+
+        return FileResponse(str(asset.path), media_type=asset.media_type, headers=headers)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "root": str(self.root),
+                "assets": len(self.assets),
+                "immutable": sum(1 for a in self.assets.values() if a.immutable),
+                "precompressed": sum(1 for a in self.assets.values() if a.variants),
+                "compressed_in_memory": len(self._compressed),
+                "compressed_bytes": self._compressed_bytes,
+                "brotli": BROTLI_AVAILABLE
+            }
+
+
+def precompress_build(root: Path) -> int:
+    """Gera .gz (e .br, se disponível) ao lado dos arquivos compressíveis do build"""
+    count = 0
+    for path in root.rglob("*"):
+        if (not path.is_file() or _is_variant(path)
+                or path.suffix.lower() not in COMPRESSIBLE_SUFFIXES
+                or path.stat().st_size < MIN_COMPRESS_SIZE):
+            continue
+        raw = path.read_bytes()
+        outputs = [(".gz", gzip.compress(raw, compresslevel=9, mtime=0))]
+        if BROTLI_AVAILABLE:
+            outputs.append((".br", brotli.compress(raw, quality=11)))
+        for suffix, data in outputs:
+            if len(data) < len(raw):
+                path.with_name(path.name + suffix).write_bytes(data)
+                count += 1
+    return count
+
+
+if __name__ == "__main__":
+    # Uso no build: python static_assets.py ../frontend/build
+    build_dir = Path(sys.argv[1] if len(sys.argv) > 1 else Path(__file__).parent.parent / "frontend" / "build")
+    total = precompress_build(build_dir)
+    print(f"[STATIC] {total} variantes comprimidas geradas em {build_dir}"
+          + ("" if BROTLI_AVAILABLE else " (brotli não instalado - apenas gzip)"))
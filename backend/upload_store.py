@@ -0,0 +1,189 @@
+"""
+Armazenamento de Uploads Endereçado por Conteúdo
+Fotos de produtos e logos da empresa são gravadas com o hash SHA-256 do
+conteúdo no nome ({hash}.jpg), então reenviar a mesma foto reaproveita o
+arquivo existente em vez de criar outra cópia.
+
+- Referências: produtos (photo_url, simple_photo_url, combo_photo_url),
+  itens de pedidos e a configuração logo_url (database.get_upload_references)
+- Coleta de lixo: remove arquivos sem referência mais antigos que o período
+  de carência (upload feito mas produto ainda não salvo)
+- Migração: renomeia os arquivos antigos (UUID/logo_*) para o hash do
+  conteúdo, unindo duplicatas e atualizando as URLs no banco
+
+O hash é sempre do arquivo base gravado (o JPEG já processado), tanto no
+upload quanto na migração: o upload grava com um nome provisório
+(staging-*) e depois renomeia com adopt_content_name.
+
+As variantes do image_pipeline (nome_thumb.webp, ...) seguem o nome base e
+são renomeadas/removidas junto com ele.
+"""
+import hashlib
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from image_pipeline import VARIANT_NAME
+
+# Nome endereçado por conteúdo: 32 hex (128 bits do SHA-256) + extensão
+HASH_LENGTH = 32
+CONTENT_NAME = re.compile(r"^[0-9a-f]{%d}\.[a-z0-9]+$" % HASH_LENGTH)
+
+# Nome provisório de um upload em processamento (a migração ignora)
+STAGING_PREFIX = "staging-"
+
+# Carência antes de apagar um arquivo sem referência
+GC_GRACE_SECONDS = float(os.environ.get("NUCLEO_UPLOAD_GC_GRACE_HOURS", "24")) * 3600
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def content_name(data: bytes, extension: str) -> str:
+    """Nome do arquivo para o conteúdo (ex: 3f2a...9c.jpg)"""
+    return f"{content_hash(data)}.{extension.lower().lstrip('.')}"
+
+
+def staging_name(extension: str) -> str:
+    """Nome provisório para gravar um upload antes de conhecer o hash"""
+    return f"{STAGING_PREFIX}{uuid.uuid4().hex}.{extension.lower().lstrip('.')}"
+
+
+def adopt_content_name(directory: Path, staged: str) -> str:
+    """
+    Renomeia um upload gravado como `staged` (e suas variantes) para o hash
+    do arquivo base. Se o nome já existe, descarta a cópia nova e reaproveita
+    o arquivo existente. Retorna o nome final.
+    """
+    new_name = content_name((directory / staged).read_bytes(), Path(staged).suffix)
+    stem, new_stem = Path(staged).stem, Path(new_name).stem
+    for f in directory.glob(f"{stem}*"):
+        target = directory / (new_name if f.name == staged else f.name.replace(stem, new_stem, 1))
+        if target.exists():
+            f.unlink()
+            touch(target)
+        else:
+            os.replace(f, target)
+    return new_name
+
+
+def is_content_addressed(name: str) -> bool:
+    return bool(CONTENT_NAME.match(name))
+
+
+def base_stem(name: str) -> str:
+    """Stem do arquivo base de uma variante (abc_thumb.webp -> abc, abc.webp -> abc)"""
+    match = VARIANT_NAME.match(name)
+    if match:
+        return match.group("stem")
+    return Path(name).stem
+
+
+def touch(path: Path):
+    """Reinicia a carência do GC para um arquivo reaproveitado"""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _group_files(directory: Path) -> Dict[str, List[Path]]:
+    """Arquivos do diretório agrupados pelo stem do arquivo base"""
+    groups: Dict[str, List[Path]] = {}
+    for path in directory.iterdir():
+        if path.is_file():
+            groups.setdefault(base_stem(path.name), []).append(path)
+    return groups
+
+
+def collect_garbage(directory: Path, referenced: Iterable[str], grace_seconds: float = GC_GRACE_SECONDS,
+                    dry_run: bool = False) -> Dict:
+    """
+    Remove arquivos (e variantes) cujo arquivo base não é referenciado e que
+    não foram modificados dentro do período de carência.
+    """
+    stats = {"kept": 0, "deleted": 0, "bytes_freed": 0, "in_grace": 0}
+    if not directory.exists():
+        return stats
+    referenced_stems = {Path(name).stem for name in referenced}
+    cutoff = time.time() - grace_seconds
+
+    for stem, files in _group_files(directory).items():
+        if stem in referenced_stems:
+            stats["kept"] += len(files)
+            continue
+        if any(f.stat().st_mtime > cutoff for f in files):
+            stats["in_grace"] += len(files)
+            continue
+        for f in files:
+            size = f.stat().st_size
+            if not dry_run:
+                try:
+                    f.unlink()
+                except OSError:
+                    continue
+            stats["deleted"] += 1
+            stats["bytes_freed"] += size
+    return stats
+
+
+def migrate_directory(directory: Path, url_prefix: str,
+                      replace_url: Callable[[str, str], int], ctx=None) -> Dict:
+    """
+    Renomeia os arquivos base que ainda não estão endereçados por conteúdo.
+    Duplicatas (mesmo hash) são unidas: as referências passam a apontar para
+    o arquivo existente e a cópia é removida.
+    `replace_url(url_antiga, url_nova)` atualiza as referências no banco.
+    """
+    stats = {"renamed": 0, "deduplicated": 0, "references_updated": 0, "failed": 0}
+    if not directory.exists():
+        return stats
+
+    for stem, files in _group_files(directory).items():
+        if ctx is not None:
+            ctx.check_cancelled()
+        base = _find_base(files)
+        if (base is None or is_content_addressed(base.name) or base.name.endswith(".tmp")
+                or base.name.startswith(STAGING_PREFIX)):
+            continue
+        try:
+            new_name = content_name(base.read_bytes(), base.suffix)
+            new_stem = Path(new_name).stem
+            duplicate = (directory / new_name).exists()
+
+            # Atualizar referências antes de mexer nos arquivos: se o processo
+            # parar no meio, o arquivo antigo continua existindo
+            stats["references_updated"] += replace_url(f"{url_prefix}{base.name}", f"{url_prefix}{new_name}")
+
+            for f in files:
+                target = directory / (new_name if f == base else f.name.replace(stem, new_stem, 1))
+                if target.exists():
+                    f.unlink()
+                else:
+                    f.rename(target)
+            stats["deduplicated" if duplicate else "renamed"] += 1
+        except Exception as e:
+            print(f"[UPLOADS] Erro ao migrar {base.name}: {e}")
+            stats["failed"] += 1
+    return stats
+
+
+def _find_base(files: List[Path]) -> Optional[Path]:
+    """Arquivo base do grupo (não é variante nem o .webp full)"""
+    for f in files:
+        if not VARIANT_NAME.match(f.name) and f.suffix.lower() != ".webp":
+            return f
+    return None
+
+
+def referenced_names(urls: Iterable[str], url_prefix: str) -> Set[str]:
+    """Nomes de arquivo das URLs que apontam para o diretório (url_prefix)"""
+    names = set()
+    for url in urls:
+        if url and url_prefix in url:
+            names.add(url.split(url_prefix, 1)[1].split("?", 1)[0])
+    return names
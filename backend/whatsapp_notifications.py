@@ -4,11 +4,12 @@ Envia mensagens automáticas para clientes sobre status de pedidos
 """
 import os
 import asyncio
-import httpx
 import re
 from datetime import datetime, timezone
 from typing import Optional
 import database as db
+from metrics import track_external_call
+from startup_profile import lazy_import
 
 # URL do serviço WhatsApp
 WHATSAPP_SERVICE_URL = "http://localhost:3002"
@@ -306,6 +307,7 @@ def get_order_delay_from_templates(tipo_entrega: str, status: str) -> int:
 
 async def send_whatsapp_message(phone: str, message: str) -> bool:
     """Envia mensagem via WhatsApp"""
+    httpx = lazy_import("httpx")
     try:
         formatted_phone = format_phone(phone)
         if not formatted_phone:
@@ -315,13 +317,14 @@ async def send_whatsapp_message(phone: str, message: str) -> bool:
         print(f"[WhatsApp Notify] Enviando para {formatted_phone}...")
         
         async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{WHATSAPP_SERVICE_URL}/send",
-                json={
-                    "phone": formatted_phone,
-                    "message": message
-                }
-            )
+            with track_external_call("whatsapp"):
+                response = await client.post(
+                    f"{WHATSAPP_SERVICE_URL}/send",
+                    json={
+                        "phone": formatted_phone,
+                        "message": message
+                    }
+                )
             
             print(f"[WhatsApp Notify] Resposta: {response.status_code} - {response.text}")
             
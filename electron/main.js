@@ -130,9 +130,11 @@ function killProcessOnPort(port) {
 }
 
 // ==================== HEALTH CHECK ====================
-function checkBackendHealth(port) {
+// /api/health/ready é barato (SELECT 1 em conexão própria) e serve para o
+// polling; /api/health/diagnostics (caminho do banco, contagens) é lido uma vez.
+function checkBackendHealth(port, path = '/api/health/ready') {
   return new Promise((resolve) => {
-    const req = http.get(`http://127.0.0.1:${port}/api/health`, { timeout: 2000 }, (res) => {
+    const req = http.get(`http://127.0.0.1:${port}${path}`, { timeout: 2000 }, (res) => {
       let data = '';
       res.on('data', chunk => data += chunk);
       res.on('end', () => {
@@ -156,8 +158,10 @@ async function waitForBackend(port) {
   log('info', `Aguardando backend na porta ${port}...`);
   
   for (let i = 0; i < HEALTH_CHECK_RETRIES; i++) {
-    const result = await checkBackendHealth(port);
-    if (result.ok) {
+    const ready = await checkBackendHealth(port);
+    if (ready.ok) {
+      const diagnostics = await checkBackendHealth(port, '/api/health/diagnostics');
+      const result = { ok: true, data: diagnostics.data || ready.data };
       log('info', `Backend OK! DB: ${result.data?.database?.path || 'N/A'}`);
       
       // VALIDAÇÃO CRÍTICA: verificar se DB está no userData
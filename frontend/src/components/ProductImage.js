@@ -0,0 +1,49 @@
+// Foto de produto com variantes responsivas (thumb/medium/full, WebP e JPEG)
+// geradas pelo backend em /uploads/products/{nome}_thumb.webp etc.
+// URLs externas ou fora de /uploads/products/ são exibidas como estão.
+
+const VARIANT_WIDTHS = { thumb: 240, medium: 540, full: 1080 };
+
+const variantUrl = (url, variant, format) => {
+  const slash = url.lastIndexOf("/");
+  const prefix = url.slice(0, slash + 1);
+  const fileName = url.slice(slash + 1);
+  const dot = fileName.lastIndexOf(".");
+  const stem = dot > 0 ? fileName.slice(0, dot) : fileName;
+  if (variant === "full") {
+    return format === "jpg" ? url : `${prefix}${stem}.webp`;
+  }
+  return `${prefix}${stem}_${variant}.${format}`;
+};
+
+export const getImageSrcSet = (url, format = "jpg") => {
+  if (!url || !url.startsWith("/uploads/products/")) return undefined;
+  return Object.entries(VARIANT_WIDTHS)
+    .map(([variant, width]) => `/api${variantUrl(url, variant, format)} ${width}w`)
+    .join(", ");
+};
+
+export default function ProductImage({ src, sizes = "(min-width: 1024px) 25vw, 50vw", alt = "", ...props }) {
+  if (!src) return null;
+  const isLocal = src.startsWith("/uploads/products/");
+  const fullUrl = isLocal ? `/api${src}` : src;
+
+  if (!isLocal) {
+    return <img src={fullUrl} alt={alt} loading="lazy" {...props} />;
+  }
+
+  return (
+    <picture className="contents">
+      <source type="image/webp" srcSet={getImageSrcSet(src, "webp")} sizes={sizes} />
+      <img
+        src={fullUrl}
+        srcSet={getImageSrcSet(src, "jpg")}
+        sizes={sizes}
+        alt={alt}
+        loading="lazy"
+        decoding="async"
+        {...props}
+      />
+    </picture>
+  );
+}
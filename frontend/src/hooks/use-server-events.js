@@ -0,0 +1,49 @@
+import { useEffect, useRef, useState } from "react";
+
+const API_URL = process.env.REACT_APP_BACKEND_URL || "";
+
+/**
+ * Assina o canal de eventos do backend (SSE em /api/events/stream).
+ *
+ * O EventSource reconecta sozinho enviando o último id recebido, e o backend
+ * reenvia os eventos perdidos. Um evento "reset" indica que o histórico se
+ * perdeu e a tela deve recarregar tudo.
+ *
+ * Retorna true enquanto a conexão estiver aberta, para que as telas reduzam
+ * o polling a um fallback lento.
+ *
+ * @param {string[]} topics - ex: ["pedidos", "waiting_queue"]
+ * @param {(event: {id: number, topic: string, type: string, data: object}) => void} onEvent
+ */
+export function useServerEvents(topics, onEvent) {
+  const [connected, setConnected] = useState(false);
+  const handlerRef = useRef(onEvent);
+  handlerRef.current = onEvent;
+  const topicsKey = topics.join(",");
+
+  useEffect(() => {
+    if (typeof window === "undefined" || !window.EventSource) return undefined;
+
+    const source = new EventSource(
+      `${API_URL}/api/events/stream?topics=${encodeURIComponent(topicsKey)}`
+    );
+    source.onopen = () => setConnected(true);
+    source.onerror = () => setConnected(false);
+    source.onmessage = (message) => {
+      try {
+        handlerRef.current(JSON.parse(message.data));
+      } catch (error) {
+        // Evento malformado - ignorar
+      }
+    };
+
+    return () => {
+      source.close();
+      setConnected(false);
+    };
+  }, [topicsKey]);
+
+  return connected;
+}
+
+export default useServerEvents;
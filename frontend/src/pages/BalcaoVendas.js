@@ -234,15 +234,16 @@ export default function BalcaoVendas() {
   const [productPopupOpen, setProductPopupOpen] = useState(false);
 
   useEffect(() => {
-    fetchProducts();
-    fetchCategories();
+    fetchBootstrap();
   }, []);
 
-  const fetchProducts = async () => {
+  // Produtos à venda e categorias em uma única requisição
+  const fetchBootstrap = async () => {
     try {
       setLoading(true);
-      const response = await axios.get(`${API}/products/for-sale`, getAuthHeader());
-      setProducts(response.data);
+      const response = await axios.get(`${API}/bootstrap/balcao`, getAuthHeader());
+      setProducts(response.data.data.products);
+      setCategories(response.data.data.categories);
     } catch (error) {
       console.error("Erro ao carregar produtos:", error);
       toast.error("Erro ao carregar produtos");
@@ -251,15 +252,6 @@ export default function BalcaoVendas() {
     }
   };
 
-  const fetchCategories = async () => {
-    try {
-      const response = await axios.get(`${API}/categories`, getAuthHeader());
-      setCategories(response.data);
-    } catch (error) {
-      console.error("Erro ao carregar categorias:", error);
-    }
-  };
-
   const filteredProducts = selectedCategory === "all"
     ? products
     : products.filter(p => p.category === selectedCategory);
@@ -128,6 +128,9 @@ export default function BugsPage() {
         content += `Tipo: ${bug.error_type}\n`;
         content += `Endpoint: ${bug.endpoint}\n`;
         content += `Status: ${bug.status}\n`;
+        if (bug.occurrences > 1) {
+          content += `Ocorrências: ${bug.occurrences} (primeira em ${new Date(bug.first_seen).toLocaleString("pt-BR")})\n`;
+        }
         content += `Mensagem: ${bug.message}\n`;
         if (bug.stack_trace) {
           content += `Stack Trace:\n${bug.stack_trace}\n`;
@@ -319,6 +322,11 @@ export default function BugsPage() {
                               <span className="text-xs text-muted-foreground">
                                 {new Date(bug.timestamp).toLocaleString("pt-BR")}
                               </span>
+                              {bug.occurrences > 1 && (
+                                <span className="px-2 py-1 rounded text-xs font-medium bg-gray-100 text-gray-700 dark:bg-gray-800 dark:text-gray-300">
+                                  {bug.occurrences}x
+                                </span>
+                              )}
                             </div>
                             <p className="font-medium text-red-600 dark:text-red-400">
                               {bug.error_type}: {bug.message}
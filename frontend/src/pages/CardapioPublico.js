@@ -9,9 +9,13 @@ import { Dialog, DialogContent } from "../components/ui/dialog";
 import { toast } from "sonner";
 import LoginModal from "../components/LoginModal";
 import ProfileMenu from "../components/ProfileMenu";
+import ProductImage from "../components/ProductImage";
 
 const API = '/api';
 
+// Status em que o pedido não muda mais (acompanhamento encerra)
+const STATUS_FINAIS = ['concluido', 'entregue', 'retirado', 'cancelado'];
+
 // Ícone de Moto para a BAG
 const MotoIcon = ({ className }) => (
   <svg className={className} viewBox="0 0 24 24" fill="currentColor">
@@ -37,28 +41,43 @@ function OrderTrackingScreen({ pedido: pedidoInicial, onClose, darkMode, company
     return `https://wa.me/${phoneWithCountry}?text=${message}`;
   };
   
-  // Polling para atualizar status do pedido a cada 5 segundos
+  // Acompanhar status do pedido via long-poll (o servidor segura a requisição até o status mudar).
+  // Para em status final ou se o pedido não existir mais (404)
   useEffect(() => {
     if (!pedidoInicial?.id) return;
     
+    let active = true;
+    let etag = null;
+    const wait = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+    
     const fetchPedidoStatus = async () => {
-      try {
-        const res = await axios.get(`${API}/pedidos/${pedidoInicial.id}`);
-        if (res.data) {
-          setPedido(res.data);
+      while (active) {
+        try {
+          const res = await axios.get(`${API}/public/pedidos/${pedidoInicial.id}/status`, {
+            params: etag ? { wait: 25 } : {},
+            headers: etag ? { "If-None-Match": etag } : {},
+            validateStatus: (status) => status === 200 || status === 304,
+          });
+          if (!active) return;
+          if (res.status === 200 && res.data) {
+            etag = res.data.etag;
+            setPedido((prev) => ({ ...prev, ...res.data }));
+            if (STATUS_FINAIS.includes(res.data.status)) return;
+          }
+        } catch (error) {
+          if (error.response?.status === 404) return;
+          console.log("Erro ao buscar status do pedido:", error);
+          // Aguardar antes de tentar novamente
+          await wait(5000);
         }
-      } catch (error) {
-        console.log("Erro ao buscar status do pedido:", error);
       }
     };
     
-    // Buscar imediatamente
     fetchPedidoStatus();
     
-    // Polling a cada 5 segundos
-    const interval = setInterval(fetchPedidoStatus, 5000);
-    
-    return () => clearInterval(interval);
+    return () => {
+      active = false;
+    };
   }, [pedidoInicial?.id]);
   
   // Verificar se é retirada no local
@@ -1101,9 +1120,10 @@ function ProductPopup({ product, open, onClose, onAddToCart, darkMode, allProduc
         {/* Imagem Quadrada no Topo */}
         <div className={`relative w-full aspect-square ${darkMode ? 'bg-gradient-to-b from-zinc-800 to-zinc-900' : 'bg-gradient-to-b from-orange-100 to-orange-50'}`}>
           {product.photo_url && !imageError ? (
-            <img
-              src={getImageUrl(product.photo_url)}
+            <ProductImage
+              src={product.photo_url}
               alt={product.name}
+              sizes="(min-width: 640px) 448px, 92vw"
               className="w-full h-full object-contain"
               onError={() => setImageError(true)}
             />
@@ -3067,9 +3087,10 @@ export default function CardapioPublico({ onAdminLogin }) {
                             {/* Imagem */}
                             <div className={`aspect-square lg:aspect-[4/3] ${t.bgMuted} relative overflow-hidden`}>
                               {product.photo_url ? (
-                                <img 
-                                  src={getImageUrl(product.photo_url)} 
-                                  alt={product.name} 
+                                <ProductImage
+                                  src={product.photo_url}
+                                  alt={product.name}
+                                  sizes="(min-width: 1024px) 20vw, 45vw"
                                   className={`w-full h-full object-cover ${isUnavailable ? 'grayscale' : ''}`}
                                 />
                               ) : (
@@ -3419,7 +3440,7 @@ export default function CardapioPublico({ onAdminLogin }) {
                         <div className="flex gap-2">
                           <div className={`w-12 h-12 ${t.bgMuted} rounded-lg flex-shrink-0 overflow-hidden`}>
                             {item.photo_url ? (
-                              <img src={getImageUrl(item.photo_url)} alt="" className="w-full h-full object-cover" />
+                              <ProductImage src={item.photo_url} sizes="48px" className="w-full h-full object-cover" />
                             ) : (
                               <div className="w-full h-full flex items-center justify-center text-lg">🍽️</div>
                             )}
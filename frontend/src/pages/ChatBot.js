@@ -37,6 +37,7 @@ import {
   AlertDialogTitle,
 } from "../components/ui/alert-dialog";
 import { useToast } from "../hooks/use-toast";
+import { useServerEvents } from "../hooks/use-server-events";
 
 const API_URL = process.env.REACT_APP_BACKEND_URL || "";
 
@@ -2107,6 +2108,14 @@ function RespostasAutomaticasTab({ toast }) {
   const [waitingQueue, setWaitingQueue] = useState([]);
   const [isAlertPlaying, setIsAlertPlaying] = useState(false);
   const alertAudioRef = useRef(null);
+  const waitingQueueRefreshRef = useRef(null);
+  const eventsConnectedRef = useRef(false);
+  const lastQueueCheckRef = useRef(0);
+  
+  // Canal de eventos do backend: verifica a fila assim que ela muda
+  eventsConnectedRef.current = useServerEvents(["waiting_queue"], () => {
+    waitingQueueRefreshRef.current && waitingQueueRefreshRef.current();
+  });
   
   // Monitorar fila de clientes aguardando atendimento humano
   useEffect(() => {
@@ -2114,6 +2123,7 @@ function RespostasAutomaticasTab({ toast }) {
     
     const checkWaitingQueue = async () => {
       if (!isMounted) return;
+      lastQueueCheckRef.current = Date.now();
       
       try {
         const res = await fetch(`${API_URL}/api/chatbot/waiting-queue`);
@@ -2138,9 +2148,13 @@ function RespostasAutomaticasTab({ toast }) {
       }
     };
     
-    // Verificar a cada 3 segundos
+    // Verificar a cada 3 segundos (30s com o canal de eventos ativo)
+    waitingQueueRefreshRef.current = checkWaitingQueue;
     checkWaitingQueue();
-    const interval = setInterval(checkWaitingQueue, 3000);
+    const interval = setInterval(() => {
+      if (eventsConnectedRef.current && Date.now() - lastQueueCheckRef.current < 30000) return;
+      checkWaitingQueue();
+    }, 3000);
     
     return () => {
       isMounted = false;
@@ -2,6 +2,7 @@ import { useState, useEffect, useCallback, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import axios from "axios";
 import { toast } from "sonner";
+import { useServerEvents } from "../hooks/use-server-events";
 import { 
   Plus, Minus, Check, Clock, ChefHat, Package, Truck, User, Phone, MapPin,
   ArrowLeft, X, RefreshCw, ToggleLeft, ToggleRight, Bike, ShoppingBag,
@@ -72,6 +73,18 @@ export default function Delivery() {
   // State para clientes aguardando atendimento humano (WhatsApp)
   const [waitingQueueCount, setWaitingQueueCount] = useState(0);
   const [waitingQueueList, setWaitingQueueList] = useState([]);
+  const waitingQueueRefreshRef = useRef(null);
+  const fetchDataRef = useRef(null);
+  
+  // Canal de eventos do backend: recarrega só quando algo muda
+  const eventsConnected = useServerEvents(["pedidos", "waiting_queue"], (event) => {
+    if (event.topic === "pedidos" || event.type === "reset") {
+      fetchDataRef.current && fetchDataRef.current();
+    }
+    if (event.topic === "waiting_queue" || event.type === "reset") {
+      waitingQueueRefreshRef.current && waitingQueueRefreshRef.current();
+    }
+  });
   
   // Monitorar fila de clientes aguardando atendimento
   useEffect(() => {
@@ -90,14 +103,16 @@ export default function Delivery() {
       }
     };
     
+    waitingQueueRefreshRef.current = checkWaitingQueue;
     checkWaitingQueue();
-    const interval = setInterval(checkWaitingQueue, 3000);
+    // Com o canal de eventos ativo, o polling vira apenas fallback
+    const interval = setInterval(checkWaitingQueue, eventsConnected ? 30000 : 3000);
     
     return () => {
       isMounted = false;
       clearInterval(interval);
     };
-  }, []);
+  }, [eventsConnected]);
   
   // Inicializar áudio de notificação
   useEffect(() => {
@@ -209,13 +224,13 @@ export default function Delivery() {
   // Carregar dados
   const fetchData = useCallback(async () => {
     try {
-      const [pedidosRes, entregadoresRes, settingsRes] = await Promise.all([
-        axios.get(`${API}/pedidos`),
-        axios.get(`${API}/entregadores`),
-        axios.get(`${API}/settings`)
-      ]);
+      // Pedidos, entregadores, configurações e fila de espera em uma única
+      // requisição, todos do mesmo snapshot do banco
+      const bootstrapRes = await axios.get(`${API}/bootstrap/delivery`, getAuthHeader());
+      const boot = bootstrapRes.data.data;
+      const settingsRes = { data: boot.settings };
       
-      const novosPedidos = pedidosRes.data;
+      const novosPedidos = boot.pedidos;
       
       // Verificar se há novos pedidos aguardando aceite
       const pedidosAguardandoAceiteAtuais = novosPedidos.filter(p => p.status === 'aguardando_aceite');
@@ -241,7 +256,9 @@ export default function Delivery() {
       previousPedidosRef.current = novosPedidos;
       
       setPedidos(novosPedidos);
-      setEntregadores(entregadoresRes.data);
+      setEntregadores(boot.entregadores);
+      setWaitingQueueCount(boot.waiting_queue.count || 0);
+      setWaitingQueueList(boot.waiting_queue.queue || []);
       setAutoAccept(settingsRes.data.delivery_auto_accept || false);
       
       // Carregar configurações de impressão
@@ -277,12 +294,13 @@ export default function Delivery() {
   }, [playNotificationSound]);
 
   useEffect(() => {
+    fetchDataRef.current = fetchData;
     fetchData();
     
-    // Auto-refresh a cada 5 segundos
-    const interval = setInterval(fetchData, 5000);
+    // Auto-refresh a cada 5 segundos (30s quando o canal de eventos está ativo)
+    const interval = setInterval(fetchData, eventsConnected ? 30000 : 5000);
     return () => clearInterval(interval);
-  }, [fetchData]);
+  }, [fetchData, eventsConnected]);
 
   // Processar aceite automático
   useEffect(() => {
@@ -26,15 +26,14 @@ export default function EntregadorDetalhe() {
 
   const fetchData = useCallback(async () => {
     try {
-      const [entregadorRes, pedidosRes] = await Promise.all([
-        axios.get(`${API}/entregadores/${entregadorId}`),
-        axios.get(`${API}/entregadores/${entregadorId}/pedidos`)
-      ]);
+      // Entregador + pedidos em aberto numa única consulta
+      const res = await axios.get(`${API}/entregadores/${entregadorId}/abertos`);
+      const abertos = res.data.abertos;
       
-      setEntregador(entregadorRes.data);
+      setEntregador(res.data.entregador);
       setPedidos({
-        na_bag: pedidosRes.data.filter(p => p.status === 'na_bag'),
-        em_rota: pedidosRes.data.filter(p => p.status === 'em_rota')
+        na_bag: abertos.filter(p => p.status === 'na_bag'),
+        em_rota: abertos.filter(p => p.status === 'em_rota')
       });
     } catch (error) {
       console.error("Erro ao carregar dados:", error);
@@ -246,7 +245,7 @@ export default function EntregadorDetalhe() {
                       {/* Footer do Card */}
                       <div className="flex items-center justify-between pt-3 border-t">
                         <div>
-                          <p className="text-xs text-muted-foreground">{pedido.items?.length || 0} item(s)</p>
+                          <p className="text-xs text-muted-foreground">{pedido.itens_count || 0} item(s)</p>
                           <p className="font-bold text-xl text-primary flex items-center gap-1">
                             <DollarSign className="w-4 h-4" />
                             {(pedido.total || 0).toFixed(2)}
@@ -341,7 +340,7 @@ export default function EntregadorDetalhe() {
                       {/* Footer do Card */}
                       <div className="flex items-center justify-between pt-3 border-t">
                         <div>
-                          <p className="text-xs text-muted-foreground">{pedido.items?.length || 0} item(s)</p>
+                          <p className="text-xs text-muted-foreground">{pedido.itens_count || 0} item(s)</p>
                           <p className="font-bold text-xl text-primary flex items-center gap-1">
                             <DollarSign className="w-4 h-4" />
                             {(pedido.total || 0).toFixed(2)}
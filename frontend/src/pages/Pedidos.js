@@ -1,6 +1,7 @@
 import { useState, useEffect, useMemo } from "react";
 import { toast } from "sonner";
 import axios from "axios";
+import { useServerEvents } from "../hooks/use-server-events";
 import { 
   Search, Grid3X3, List, Clock, Truck, CheckCircle, XCircle, 
   Package, User, Phone, MapPin, CreditCard, Banknote, QrCode,
@@ -126,6 +127,9 @@ export default function Pedidos() {
   const [currentPage, setCurrentPage] = useState(1);
   const [itemsPerPage, setItemsPerPage] = useState(10);
 
+  // Canal de eventos do backend: recarrega quando algum pedido muda
+  const eventsConnected = useServerEvents(["pedidos"], () => fetchPedidos());
+
   useEffect(() => {
     fetchPedidos();
     
@@ -136,14 +140,14 @@ export default function Pedidos() {
     
     window.addEventListener('pedidosUpdated', handlePedidosUpdate);
     
-    // Verificar a cada 5 segundos se há novos pedidos
-    const interval = setInterval(fetchPedidos, 5000);
+    // Verificar a cada 5 segundos se há novos pedidos (30s com o canal de eventos ativo)
+    const interval = setInterval(fetchPedidos, eventsConnected ? 30000 : 5000);
     
     return () => {
       window.removeEventListener('pedidosUpdated', handlePedidosUpdate);
       clearInterval(interval);
     };
-  }, []);
+  }, [eventsConnected]);
 
   const fetchPedidos = async () => {
     try {
@@ -15,8 +15,7 @@ const getAuthHeader = () => ({
 });
 
 export default function RelatorioEntregas() {
-  const [entregadores, setEntregadores] = useState([]);
-  const [pedidos, setPedidos] = useState([]);
+  const [relatorio, setRelatorio] = useState({ entregadores: [], total: { entregas: 0, taxa_entrega: 0 } });
   const [loading, setLoading] = useState(true);
   
   // Filtros de data
@@ -28,69 +27,39 @@ export default function RelatorioEntregas() {
   const [dataFim, setDataFim] = useState(() => {
     return new Date().toISOString().split('T')[0];
   });
-  const [bairros, setBairros] = useState([]);
 
+  // Totais calculados no servidor (pedidos concluídos por entregador no período)
   const fetchData = useCallback(async () => {
-    setLoading(true);
     try {
-      const [entregadoresRes, pedidosRes, bairrosRes] = await Promise.all([
-        axios.get(`${API}/entregadores`, getAuthHeader()),
-        axios.get(`${API}/pedidos`, getAuthHeader()),
-        axios.get(`${API}/bairros`, getAuthHeader())
-      ]);
-      setEntregadores(entregadoresRes.data.filter(e => e.ativo));
-      setPedidos(pedidosRes.data);
-      setBairros(bairrosRes.data);
+      const res = await axios.get(`${API}/reports/entregas`, {
+        ...getAuthHeader(),
+        params: { start: dataInicio, end: dataFim }
+      });
+      setRelatorio(res.data);
     } catch (error) {
       console.error("Erro ao carregar dados:", error);
       toast.error("Erro ao carregar dados");
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [dataInicio, dataFim]);
 
   useEffect(() => {
     fetchData();
   }, [fetchData]);
 
-  // Filtrar pedidos por período e status concluído
-  const pedidosFiltrados = pedidos.filter(p => {
-    if (p.status !== 'concluido') return false;
-    if (p.tipo_entrega !== 'delivery') return false;
-    if (!p.entregador_id) return false;
-    
-    const dataPedido = new Date(p.created_at).toISOString().split('T')[0];
-    return dataPedido >= dataInicio && dataPedido <= dataFim;
-  });
-
-  // Calcular estatísticas por entregador
-  const estatisticasEntregadores = entregadores.map(entregador => {
-    const entregas = pedidosFiltrados.filter(p => p.entregador_id === entregador.id);
-    const totalEntregas = entregas.length;
-    
-    // Calcular valor total das entregas (soma dos valores de entrega dos pedidos ou bairros)
-    const valorTotal = entregas.reduce((acc, p) => {
-      // Primeiro tentar usar o valor de entrega salvo no pedido
-      let valorEntrega = p.valor_entrega;
-      if (valorEntrega === undefined || valorEntrega === null) {
-        // Buscar valor do bairro se não tiver no pedido
-        const bairro = bairros.find(b => b.nome === p.endereco_bairro);
-        valorEntrega = bairro?.valor_entrega || 0;
-      }
-      return acc + (valorEntrega || 0);
-    }, 0);
+  const entregadores = relatorio.entregadores;
 
-    return {
-      ...entregador,
-      totalEntregas,
-      valorTotal
-    };
-  }).sort((a, b) => b.totalEntregas - a.totalEntregas);
+  const estatisticasEntregadores = entregadores.map(entregador => ({
+    ...entregador,
+    totalEntregas: entregador.entregas,
+    valorTotal: entregador.taxa_entrega
+  }));
 
   // Totais gerais
   const totalGeral = {
-    entregas: estatisticasEntregadores.reduce((acc, e) => acc + e.totalEntregas, 0),
-    valor: estatisticasEntregadores.reduce((acc, e) => acc + e.valorTotal, 0)
+    entregas: relatorio.total.entregas,
+    valor: relatorio.total.taxa_entrega
   };
 
   if (loading) {